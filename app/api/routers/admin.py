@@ -1,18 +1,87 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
 from app.api.deps import get_db_session
-from app.services.geo_solver import update_access_point_positions
+from app.db.models.admin_job import AdminJob
+from app.schemas.admin_job import AdminJobOut
+from app.services.admin_jobs import create_recompute_job, start_job, request_cancel, job_progress
 from app.services.security import get_current_active_user
 from app.db.models.user import User
 
 router = APIRouter(prefix="/v1/admin", tags=["admin"])
 
+def _require_superuser(current_user: User) -> None:
+    if not getattr(current_user, "is_superuser", False):
+        raise HTTPException(status_code=403, detail="Требуются права администратора")
+
+def _job_out(job: AdminJob) -> AdminJobOut:
+    return AdminJobOut(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        params=job.params or {},
+        total=job.total,
+        processed=job.processed,
+        solved=job.solved,
+        failed=job.failed,
+        cancel_requested=job.cancel_requested,
+        summary=job.summary,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        **job_progress(job),
+    )
+
 @router.post("/recalculate-aps", status_code=status.HTTP_202_ACCEPTED)
 async def recalculate_all_aps(
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_active_user),
 ):
-    if not getattr(current_user, "is_superuser", False):
-        raise HTTPException(status_code=403, detail="Требуются права администратора")
-    await update_access_point_positions(db)
-    return {"detail": "Массовый пересчёт координат AP запущен"}
+    _require_superuser(current_user)
+    # Ручной запуск — полный пересчёт, включая AP со сошедшейся онлайн-оценкой.
+    # Выполняется фоновым заданием: ответ сразу, прогресс — GET /v1/admin/jobs/{job_id}
+    job = await create_recompute_job(db, full=True, user_id=current_user.id)
+    start_job(job.id)
+    return {"detail": "Массовый пересчёт координат AP запущен", "job_id": job.id, "status": job.status}
+
+@router.get("/jobs/{job_id}", response_model=AdminJobOut)
+async def get_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_active_user),
+):
+    _require_superuser(current_user)
+    job = await db.get(AdminJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    return _job_out(job)
+
+@router.post("/jobs/{job_id}/cancel", response_model=AdminJobOut)
+async def cancel_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_active_user),
+):
+    _require_superuser(current_user)
+    job = await request_cancel(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    return _job_out(job)
+
+@router.get("/jobs/{job_id}/log")
+async def get_job_log(
+    job_id: int,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Лог пересчёта по AP: NDJSON (gzip), строка на AP — [ap_id, статус s/n/f, старая accuracy, новая accuracy, сдвиг, м].
+    """
+    _require_superuser(current_user)
+    job = await db.get(AdminJob, job_id, options=[undefer(AdminJob.log)])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    if job.log is None:
+        raise HTTPException(status_code=409, detail="Лог появится после завершения задания")
+    return Response(content=job.log, media_type="application/x-ndjson", headers={"Content-Encoding": "gzip"})
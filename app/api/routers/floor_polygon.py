@@ -1,26 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_db_session
 from app.schemas.map import FloorPolygonCreate, FloorPolygonUpdate, FloorPolygonOut
 from app.services import floor_polygon as fp_service
+from app.utils.geometry import polygon_for_lod
 from typing import List
 
 router = APIRouter(prefix="/v1/floor-polygons", tags=["FloorPolygon"])
 
+LOD_QUERY = Query(0, ge=0, description="Уровень детализации контура: 0 — исходный, 1.. — всё более упрощённый")
+
+def _with_lod(polygon, lod: int) -> FloorPolygonOut:
+    out = FloorPolygonOut.model_validate(polygon, from_attributes=True)
+    if lod:
+        out.polygon = polygon_for_lod(polygon.polygon, polygon.polygon_lods, lod)
+    return out
+
 @router.get(
     "/",
     response_model=List[FloorPolygonOut],
     summary="Получить список полигонов этажей",
-    description="Возвращает список всех полигонов этажей. Можно фильтровать по building_id."
+    description="Возвращает список всех полигонов этажей. Можно фильтровать по building_id; lod — упрощённые контуры."
 )
 async def list_floor_polygons(
     building_id: int | None = None,
+    lod: int = LOD_QUERY,
     db: AsyncSession = Depends(get_db_session)
 ):
     """Список всех полигонов этажей (опционально по building_id)"""
     polygons = await fp_service.list_floor_polygons(db, building_id)
-    return polygons
+    return [_with_lod(polygon, lod) for polygon in polygons]
 
 @router.get(
     "/{polygon_id}",
@@ -30,12 +40,28 @@ async def list_floor_polygons(
 )
 async def get_floor_polygon(
     polygon_id: int,
+    lod: int = LOD_QUERY,
     db: AsyncSession = Depends(get_db_session)
 ):
     polygon = await fp_service.get_floor_polygon(db, polygon_id)
     if not polygon:
         raise HTTPException(status_code=404, detail="FloorPolygon not found")
-    return polygon
+    return _with_lod(polygon, lod)
+
+@router.get(
+    "/{polygon_id}/points",
+    response_class=Response,
+    summary="Контур этажа в двоичном виде",
+    description="Точки контура как little-endian float64, по три числа (x, y, z) на точку, без разбора JSON."
+)
+async def get_floor_polygon_points(
+    polygon_id: int,
+    db: AsyncSession = Depends(get_db_session)
+):
+    data = await fp_service.get_floor_polygon_points(db, polygon_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="FloorPolygon not found")
+    return Response(content=data, media_type="application/octet-stream", headers={"X-Point-Format": "float64le;x,y,z"})
 
 @router.post(
     "/",
@@ -48,7 +74,10 @@ async def create_floor_polygon(
     data: FloorPolygonCreate,
     db: AsyncSession = Depends(get_db_session)
 ):
-    polygon = await fp_service.create_floor_polygon(db, data)
+    try:
+        polygon = await fp_service.create_floor_polygon(db, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return polygon
 
 @router.put(
@@ -65,6 +94,8 @@ async def update_floor_polygon(
     try:
         polygon = await fp_service.update_floor_polygon(db, polygon_id, data)
         return polygon
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except NoResultFound:
         raise HTTPException(status_code=404, detail="FloorPolygon not found")
 
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
 from app.api.deps import get_db_session
+from app.services.solver_executor import solver_executor
 
 router = APIRouter(
     prefix="/v1",
@@ -12,4 +13,5 @@ router = APIRouter(
 @router.get("/health", summary="Health check")
 async def health_check(db: AsyncSession = Depends(get_db_session)):
     result = await db.execute(text("SELECT 1"))
-    return {"db_ok": bool(result.scalar())}
+    # solver — глубина очереди и загрузка пула численных расчётов
+    return {"db_ok": bool(result.scalar()), "solver": solver_executor.stats()}
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db_session
-from app.db.models.building import Building
-from app.db.models.floor_polygon import FloorPolygon
-from app.db.models.access_point import AccessPoint
-from app.schemas.map import MapResponse, FloorSchema
+from app.core.config import settings
+from app.schemas.map import MapChangesResponse, MapResponse
+from app.services.map_cache import (
+    build_map_response,
+    choose_encoding,
+    etag_matches,
+    get_map_version,
+    map_cache,
+    map_etag,
+)
+from app.services.map_sync import load_map_changes
+from app.services.vector_tiles import TILE_MEDIA_TYPE, get_tile, tile_in_range
 
 router = APIRouter(
     prefix="/v1",
@@ -16,61 +23,107 @@ router = APIRouter(
 @router.get("/map/{building_id}", response_model=MapResponse)
 async def get_building_map(
     building_id: int,
+    request: Request,
+    lod: int = Query(0, ge=0, description="Уровень детализации контуров этажей: 0 — исходный, 1.. — всё более упрощённый"),
     db: AsyncSession = Depends(get_db_session),
-) -> MapResponse:
+) -> Response:
     """
-    1) Ищем здание по ID, иначе 404.
-    2) Загружаем все полигоны этажей из floor_polygons.
-    3) Для каждого этажа достаём все точки доступа (access_points) по building_id и floor.
-    4) Формируем список FloorSchema и возвращаем MapResponse.
+    1) Читаем версию карты здания (buildings.map_version), иначе 404.
+    2) If-None-Match совпал с ETag версии — 304 без тела.
+    3) Берём сериализованную карту этой версии и уровня детализации lod из кэша процесса; при промахе собираем её
+       (полигоны этажей и AP всех этажей одним запросом), одновременные промахи ждут одну сборку.
+    4) Отдаём заранее сжатый вариант по Accept-Encoding (br/gzip/identity).
     """
-    # 1) Получаем здание
-    result = await db.execute(
-        select(Building).where(Building.id == building_id)
+    not_found = HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Building with id={building_id} not found"
     )
-    building = result.scalars().first()
-    if not building:
+    # Уровни грубее самого грубого дают тот же ответ — один ключ кэша
+    lod = min(lod, len(settings.MAP_POLYGON_LOD_TOLERANCES_M))
+    # 1) Версия карты — один дешёвый запрос по первичному ключу
+    version = await get_map_version(db, building_id)
+    if version is None:
+        raise not_found
+
+    # 2) Условный запрос
+    etag = map_etag(building_id, version, lod)
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # 3) Кэш по (building_id, lod, version)
+    async def build() -> bytes | None:
+        response = await build_map_response(db, building_id, lod)
+        return response.model_dump_json().encode() if response is not None else None
+
+    entry = await map_cache.get(building_id, version, build, lod)
+    if entry is None:
+        raise not_found
+
+    # 4) Сжатый вариант
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=entry.body_for(encoding), media_type="application/json", headers=headers)
+
+
+@router.get("/map/{building_id}/changes", response_model=MapChangesResponse)
+async def get_building_map_changes(
+    building_id: int,
+    since: int = Query(..., ge=0, description="Версия карты, которая уже есть у клиента (MapResponse.version или прошлый ответ)"),
+    db: AsyncSession = Depends(get_db_session),
+) -> MapChangesResponse:
+    """
+    Дельта-синхронизация карты: AP, полигоны этажей и POI, добавленные или изменённые после
+    версии since, и ID удалённых (tombstones). Клиент применяет удаления, затем изменения
+    и запоминает version. reset=true — дельта недоступна, нужна полная карта /v1/map/{building_id}.
+    """
+    changes = await load_map_changes(db, building_id, since)
+    if changes is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Building with id={building_id} not found"
         )
+    return changes
 
-    # 2) Получаем полигоны этажей, упорядоченные по номеру этажа
-    result = await db.execute(
-        select(FloorPolygon)
-        .where(FloorPolygon.building_id == building_id)
-        .order_by(FloorPolygon.floor)
-    )
-    polygons = result.scalars().all()
 
-    floors: list[FloorSchema] = []
-    for poly in polygons:
-        # 3) Получаем все точки доступа на этом этаже
-        aps_result = await db.execute(
-            select(AccessPoint)
-            .where(
-                AccessPoint.building_id == building_id,
-                AccessPoint.floor == poly.floor
-            )
-            .order_by(AccessPoint.id)
+@router.get("/map/{building_id}/{floor}/tiles/{z}/{x}/{y}", response_class=Response)
+async def get_floor_tile(
+    building_id: int,
+    floor: int,
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db_session),
+) -> Response:
+    """
+    Векторный тайл (Mapbox Vector Tile) этажа в локальной метрической сетке здания
+    со слоями floor, access_points и pois (схема сетки — в app/services/vector_tiles.py).
+    Тайл генерируется при первом запросе и кэшируется на диске по версии карты; ETag — по версии.
+    Пустой тайл — 204 без тела; этаж без объектов — 404.
+    """
+    if not tile_in_range(z, x, y):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tile {z}/{x}/{y} is out of range"
         )
-        aps_on_floor = aps_result.scalars().all()
-
-        # 4) Формируем FloorSchema
-        floors.append(
-            FloorSchema(
-                floor=poly.floor,
-                polygon=poly.polygon,
-                access_points=aps_on_floor,
-            )
+    version = await get_map_version(db, building_id)
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Building with id={building_id} not found"
         )
-
-    # 5) Возвращаем готовый ответ
-    return MapResponse(
-        building_id=building.id,
-        building_name=building.name,
-        address=building.address or "",
-        lat=building.lat,
-        lon=building.lon,
-        floors=floors,
-    )
\ No newline at end of file
+    etag = f'W/"tile-{building_id}-{version}-{floor}-{z}-{x}-{y}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    data = await get_tile(db, building_id, version, floor, z, x, y)
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Floor {floor} of building id={building_id} not found"
+        )
+    if not data:
+        return Response(status_code=status.HTTP_204_NO_CONTENT, headers=headers)
+    return Response(content=data, media_type=TILE_MEDIA_TYPE, headers=headers)
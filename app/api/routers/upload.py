@@ -1,19 +1,20 @@
-import math
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from pydantic import ValidationError
 
+from app.core.config import settings
 from app.db.models import access_point as ap_model
-from app.db.models import wifi_snapshot as ws_model
-from app.db.models import wifi_obs as wo_model
-from app.db.models import building as building_model
-from app.schemas.scan import ScanUpload
+from app.schemas.scan import ScanUpload, BatchItemResult, BatchUploadResponse
 from app.db.session import get_db
-from app.services import geo_solver
-from app.utils.geo_utils import reverse_geocode_osm
+from app.services import scan_ingest
+from app.services.job_queue import enqueue_ap_recalc
 from app.schemas.ap import AccessPointAdminOut
+from app.tasks.recalc_queue import recalc_queue
+from app.utils.json_stream import iter_json_items, JSONStreamError
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/v1",
@@ -22,158 +23,143 @@ router = APIRouter(
 @router.post("/upload", status_code=status.HTTP_201_CREATED)
 async def upload_scan(
     scan: ScanUpload,
+    wait: bool = Query(False, description="Дождаться пересчёта координат AP перед ответом"),
     db: AsyncSession = Depends(get_db)
 ):
-    # 1. Проверка/создание здания (как раньше)
-    result = await db.execute(
-        select(building_model.Building).where(building_model.Building.id == scan.building_id)
-    )
-    building = result.scalars().first()
-    if not building and scan.lat is not None and scan.lon is not None:
-        osm = await reverse_geocode_osm(scan.lat, scan.lon)
-        osm_id = osm.get("osm_id")
-        address = osm.get("display_name", "Unknown address")
-        name = osm.get("name") or osm.get("address", {}).get("building") or f"Unknown building {osm_id or ''}"  # <--- fix: make name unique
-        building = None
-        if osm_id is not None:
-            result = await db.execute(
-                select(building_model.Building).where(building_model.Building.osm_id == osm_id)
-            )
-            building = result.scalars().first()
-        if not building:
-            # fix: check for existing building with same name
-            result = await db.execute(
-                select(building_model.Building).where(building_model.Building.name == name)
-            )
-            building = result.scalars().first()
-        if not building:
-            building = building_model.Building(
-                name=name,
-                address=address,
-                osm_id=osm_id,
-                lat=scan.lat,
-                lon=scan.lon
-            )
-            db.add(building)
-            await db.flush()
-    if not building:
-        raise HTTPException(status_code=404, detail="Здание не найдено и не может быть определено по координатам")
-    scan.building_id = building.id
+    # 1-3. Здание, снимок, AP и наблюдения — фиксированным числом запросов
+    result = (await scan_ingest.ingest_scans(db, [scan]))[0]
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    # С общей очередью задания пересчёта фиксируются в той же транзакции, что и скан
+    # (wait=true по-прежнему идёт через очередь процесса — ответ ждёт пересчёта)
+    to_recalc = result["bssids"] - result["estimated"]
+    queued = settings.JOB_QUEUE_ENABLED and not wait
+    if queued:
+        await enqueue_ap_recalc(db, to_recalc)
+    try:
+        await db.commit()
+    except ValidationError as ve:
+        await db.rollback()
+        raise HTTPException(status_code=422, detail=f"Ошибка валидации: {ve.errors()}")
 
-    # --- Новое: вычисляем локальные x, y из lat/lon если x и y не заданы ---
-    if scan.x is None or scan.y is None:
-        if scan.lat is not None and scan.lon is not None and building.lat is not None and building.lon is not None:
-            # перевод широта/долгота в локальные метры
-            scan.x = (scan.lon - building.lon) * math.cos(math.radians(building.lat)) * 111320
-            scan.y = (scan.lat - building.lat) * 110574
-    # else:
-        # logger.warning(f"CLIENT XY: x={scan.x}, y={scan.y}")
+    # 4. Пересчёт координат затронутых AP — в фоновой очереди (повторные попадания сливаются).
+    # AP со сошедшейся онлайн-оценкой уже обновлены и в очередь не ставятся.
+    # С wait=true ждём завершения пересчёта (не дольше RECALC_WAIT_TIMEOUT).
+    bssid_set = result["bssids"]
+    futures = {} if queued else recalc_queue.mark_dirty(to_recalc, urgent=wait)
+    recalculated = await recalc_queue.wait_for(futures) if wait else False
 
-    # 2. Создаём WiFiSnapshot (x, y уже могут быть вычислены)
-    snapshot = ws_model.WiFiSnapshot(
-        building_id=scan.building_id,
-        floor=scan.floor,
-        x=scan.x,
-        y=scan.y,
-        z=scan.z,
-        yaw=scan.yaw,
-        pitch=scan.pitch,
-        roll=scan.roll,
-        user_id=None,
-        lat=scan.lat,
-        lon=scan.lon,
-        accuracy=scan.accuracy
+    # Возвращаем текущие координаты AP клиенту
+    ap_result = await db.execute(
+        select(ap_model.AccessPoint)
+        .where(ap_model.AccessPoint.bssid.in_(bssid_set))
+        .execution_options(populate_existing=True)
     )
-    db.add(snapshot)
-    await db.flush()
+    updated_aps = [AccessPointAdminOut.from_orm(ap_obj) for ap_obj in ap_result.scalars().all()]
+    return {"updated_aps": [ap.dict() for ap in updated_aps], "recalculated": recalculated}
 
-    # 3. Для каждого WiFi-наблюдения:
-    for obs in scan.observations:
-        result = await db.execute(
-            select(ap_model.AccessPoint).where(ap_model.AccessPoint.bssid == obs.bssid)
-        )
-        ap_obj = result.scalars().first()
-        # --- Гарантируем вычисление x/y для AP, если есть lat/lon и координаты здания ---
-        # Используем lat/lon из scan, snapshot, либо из последнего wifi_obs (если есть)
-        ap_x, ap_y, ap_z = scan.x, scan.y, scan.z
-        lat = scan.lat if scan.lat is not None else snapshot.lat
-        lon = scan.lon if scan.lon is not None else snapshot.lon
-        # Если всё ещё нет lat/lon, пробуем взять из последнего wifi_obs (если есть)
-        if (lat is None or lon is None):
-            last_obs = await db.execute(
-                select(ws_model.WiFiSnapshot).order_by(ws_model.WiFiSnapshot.id.desc())
-            )
-            last_snap = last_obs.scalars().first()
-            if last_snap is not None:
-                lat = last_snap.lat
-                lon = last_snap.lon
-        if (ap_x is None or ap_y is None) and lat is not None and lon is not None and building.lat is not None and building.lon is not None:
-            ap_x = (lon - building.lon) * math.cos(math.radians(building.lat)) * 111320
-            ap_y = (lat - building.lat) * 110574
-        if not ap_obj:
-            if ap_x is None or ap_y is None or (ap_x == 0 and ap_y == 0):
-                continue
-            ap_obj = ap_model.AccessPoint(
-                bssid=obs.bssid,
-                ssid=obs.ssid,
-                building_id=scan.building_id,
-                floor=scan.floor,
-                x=ap_x,
-                y=ap_y,
-                z=ap_z,
-                accuracy=9999.0,
-                is_mobile=False
-            )
-            db.add(ap_obj)
-            await db.flush()
-        else:
-            # Если AP была в другом здании — помечаем мобильной только если здания далеко друг от друга
-            if ap_obj.building_id != scan.building_id:
-                # Получаем координаты обоих зданий
-                b1 = await db.execute(select(building_model.Building).where(building_model.Building.id == ap_obj.building_id))
-                b2 = await db.execute(select(building_model.Building).where(building_model.Building.id == scan.building_id))
-                b1 = b1.scalars().first()
-                b2 = b2.scalars().first()
-                if b1 and b2 and b1.lat is not None and b1.lon is not None and b2.lat is not None and b2.lon is not None:
-                    # Вычисляем расстояние между зданиями (в метрах)
-                    from math import radians, cos, sin, sqrt, atan2
-                    R = 6371000  # радиус Земли в метрах
-                    dlat = radians(b2.lat - b1.lat)
-                    dlon = radians(b2.lon - b1.lon)
-                    a = sin(dlat/2)**2 + cos(radians(b1.lat)) * cos(radians(b2.lat)) * sin(dlon/2)**2
-                    c = 2 * atan2(sqrt(a), sqrt(1-a))
-                    distance = R * c
-                    if distance > 500:
-                        ap_obj.is_mobile = True
-                else:
-                    # Если координаты зданий неизвестны, по-прежнему помечаем мобильной
-                    ap_obj.is_mobile = True
-        # Создаём наблюдение
-        wifi_obs = wo_model.WiFiObs(
-            snapshot_id=snapshot.id,
-            access_point_id=ap_obj.id,
-            ssid=obs.ssid,
-            bssid=obs.bssid,
-            rssi=obs.rssi,
-            frequency=obs.frequency
-        )
-        db.add(wifi_obs)
-    await db.flush()
 
-    # 4. После добавления всех наблюдений уточняем координаты AP
-    bssid_set = {obs.bssid for obs in scan.observations}
-    updated_aps = []
-    for bssid in bssid_set:
-        await geo_solver.recalculate_access_point_coords(bssid, db)
-        # Получаем обновлённые координаты AP
-        ap_result = await db.execute(select(ap_model.AccessPoint).where(ap_model.AccessPoint.bssid == bssid))
-        ap_obj = ap_result.scalars().first()
-        if ap_obj:
-            updated_aps.append(AccessPointAdminOut.from_orm(ap_obj))
+async def _ingest_chunk(db: AsyncSession, chunk: list[tuple[int, ScanUpload]]) -> list[BatchItemResult]:
+    """
+    Записывает кусок пакета одной транзакцией и ставит затронутые AP в очередь пересчёта
+    (общую в Postgres при JOB_QUEUE_ENABLED — в той же транзакции).
+    """
     try:
+        results = await scan_ingest.ingest_scans(db, [scan for _, scan in chunk])
+        if settings.JOB_QUEUE_ENABLED:
+            await enqueue_ap_recalc(db, {
+                bssid for result in results if "error" not in result
+                for bssid in result["bssids"] - result["estimated"]
+            })
         await db.commit()
-    except ValidationError as ve:
+    except Exception as e:
         await db.rollback()
-        raise HTTPException(status_code=422, detail=f"Ошибка валидации: {ve.errors()}")
-    # Возвращаем новые координаты AP клиенту
-    return {"updated_aps": [ap.dict() for ap in updated_aps]}
+        logger.warning(f"Ошибка записи куска пакета из {len(chunk)} сканов: {e}")
+        return [
+            BatchItemResult(index=index, status="error", detail="Ошибка записи в БД")
+            for index, _ in chunk
+        ]
+    items = []
+    touched = set()
+    for (index, _), result in zip(chunk, results):
+        if "error" in result:
+            items.append(BatchItemResult(index=index, status="error", detail=result["error"]))
+            continue
+        touched |= result["bssids"] - result["estimated"]
+        items.append(BatchItemResult(
+            index=index,
+            status="success",
+            snapshot_id=result["snapshot_id"],
+            building_id=result["building_id"],
+            observations=result["observations"],
+        ))
+    if not settings.JOB_QUEUE_ENABLED:
+        recalc_queue.mark_dirty(touched)
+    return items
+
+
+@router.post(
+    "/upload/batch",
+    response_model=BatchUploadResponse,
+    summary="Пакетная загрузка сканов",
+    description=(
+        "Принимает JSON-массив ScanUpload или NDJSON-поток (Content-Type: application/x-ndjson). "
+        "Сканы разбираются инкрементально и пишутся кусками по UPLOAD_BATCH_CHUNK_SIZE; "
+        "результат возвращается по каждому элементу. Превышение UPLOAD_BATCH_MAX_ITEMS или "
+        "нечитаемый хвост тела после уже записанных кусков не отменяют их: хвост возвращается "
+        "одним элементом со status=error и index первого незаписанного скана. "
+        "Если ошибка случилась до записи первого куска — 400/413, ничего не записывается."
+    ),
+)
+async def upload_scan_batch(
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    content_type = request.headers.get("content-type", "")
+    ndjson = "ndjson" in content_type or "jsonlines" in content_type
+    items: list[BatchItemResult] = []
+    chunk: list[tuple[int, ScanUpload]] = []
+    index = 0
+    written = False
+    # Записанные куски уже закоммичены: ошибка в хвосте пакета возвращается отдельным элементом,
+    # чтобы клиент повторил только незаписанную часть (повтор всего пакета задвоил бы сканы)
+    try:
+        async for obj, error in iter_json_items(request.stream(), ndjson=ndjson):
+            if index >= settings.UPLOAD_BATCH_MAX_ITEMS:
+                if not written:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Слишком много сканов в пакете (максимум {settings.UPLOAD_BATCH_MAX_ITEMS})",
+                    )
+                items.append(BatchItemResult(
+                    index=index,
+                    status="error",
+                    detail=(
+                        f"Слишком много сканов в пакете (максимум {settings.UPLOAD_BATCH_MAX_ITEMS}): "
+                        f"сканы начиная с {index} не записаны"
+                    ),
+                ))
+                break
+            if error is not None:
+                items.append(BatchItemResult(index=index, status="error", detail=error))
+            else:
+                try:
+                    chunk.append((index, ScanUpload.model_validate(obj)))
+                except ValidationError as ve:
+                    items.append(BatchItemResult(index=index, status="error", detail=str(ve.errors())))
+            index += 1
+            if len(chunk) >= settings.UPLOAD_BATCH_CHUNK_SIZE:
+                items.extend(await _ingest_chunk(db, chunk))
+                chunk = []
+                written = True
+    except JSONStreamError as e:
+        if not written:
+            # Ничего ещё не записано — отклоняем пакет целиком, повтор безопасен
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        items.append(BatchItemResult(index=index, status="error", detail=f"{e}; сканы начиная с {index} не записаны"))
+    if chunk:
+        items.extend(await _ingest_chunk(db, chunk))
+
+    items.sort(key=lambda item: item.index)
+    succeeded = sum(1 for item in items if item.status == "success")
+    return BatchUploadResponse(total=len(items), succeeded=succeeded, failed=len(items) - succeeded, items=items)
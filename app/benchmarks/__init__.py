@@ -0,0 +1,3 @@
+# Бенчмарки решателей координат AP (python -m app.benchmarks)
+from .synthetic import generate_building, generate_scans
+from .solvers import run_benchmark
@@ -0,0 +1,3 @@
+from app.benchmarks.solvers import main
+
+main()
@@ -0,0 +1,215 @@
+"""
+Бенчмарк решателей координат AP на синтетическом здании:
+
+    python -m app.benchmarks --sizes 1000 10000 100000 --output bench.json
+
+Для каждого размера здания и каждого решателя измеряются пропускная способность (AP/с),
+задержка на одну AP (p50/p99) и ошибка положения относительно истинных координат.
+Пакетные стратегии (переопределяют solve_many, например engine:wls) решают все AP одним
+вызовом: задержки одной AP у них нет, поэтому p50/p99 пустые, а время пакета — в batch_ms.
+Результат — JSON, чтобы сравнивать прогоны между собой.
+"""
+import argparse
+import json
+import logging
+import platform
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.benchmarks.synthetic import generate_building, generate_scans
+from app.services.geo_solver import rssi_to_distance, weighted_least_squares_3d, robust_multilateration_3d
+from app.services.solver_engine import MAX_DISTANCE_M, SolverStrategy, available_strategies, get_strategy, solve_access_points
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "DEFAULT_SIZES",
+    "available_solvers",
+    "benchmark_solver",
+    "run_benchmark",
+]
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+# Поштучные решатели на 100k AP идут минутами: по умолчанию меряем на выборке
+DEFAULT_MAX_APS_PER_SOLVER = 20000
+
+
+def _legacy_problem(obs: np.ndarray):
+    positions = obs[:, :3]
+    distances = rssi_to_distance(obs[:, 3])
+    keep = (distances > 0) & (distances < MAX_DISTANCE_M)
+    if keep.sum() < 4:
+        return None
+    return positions[keep], distances[keep]
+
+
+def _run_legacy(solve, observations: dict[int, np.ndarray], ap_ids: np.ndarray):
+    """
+    Поштучный вызов функции из geo_solver. Возвращает (координаты [n, 3] | NaN, задержки мс [n]).
+    """
+    coords = np.full((len(ap_ids), 3), np.nan)
+    latency = np.zeros(len(ap_ids))
+    for i, ap_id in enumerate(ap_ids):
+        started = time.perf_counter()
+        problem = _legacy_problem(observations[int(ap_id)])
+        if problem is not None:
+            try:
+                coords[i] = np.asarray(solve(*problem), dtype=float)[:3]
+            except Exception as e:
+                logger.debug(f"{solve.__name__}: AP {ap_id} не решена: {e}")
+        latency[i] = (time.perf_counter() - started) * 1000
+    return coords, latency
+
+
+def _run_engine(name: str, observations: dict[int, np.ndarray], ap_ids: np.ndarray):
+    """
+    Стратегия solver_engine на всём наборе одним вызовом (без сглаживания: старых координат нет).
+    Возвращает (координаты [n, 3] | NaN, задержки мс [n] | None, время пакета мс | None):
+    у пакетной стратегии задержки одной AP нет — только время всего пакета.
+    """
+    strategy = get_strategy(name)
+    items = [(int(ap_id), None, (None, None, None), observations[int(ap_id)]) for ap_id in ap_ids]
+    started = time.perf_counter()
+    results = solve_access_points(items, strategy)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    coords = np.array([res.coords if res.solved else (np.nan,) * 3 for res in results], dtype=float)
+    # У 2D-решений z не определён
+    coords[[res.solved and res.dim == 2 for res in results], 2] = np.nan
+    if type(strategy).solve_many is not SolverStrategy.solve_many:
+        return coords, None, elapsed_ms
+    latency = np.array([res.elapsed_ms for res in results])
+    return coords, latency, None
+
+
+_LEGACY_SOLVERS = {
+    "weighted_least_squares_3d": weighted_least_squares_3d,
+    "robust_multilateration_3d": lambda positions, distances: robust_multilateration_3d(positions, distances)[0],
+}
+
+
+def available_solvers() -> list[str]:
+    """
+    Функции geo_solver и все зарегистрированные стратегии solver_engine (с префиксом engine:).
+    """
+    return list(_LEGACY_SOLVERS) + [f"engine:{name}" for name in available_strategies()]
+
+
+def benchmark_solver(name: str, truth: np.ndarray, observations: dict[int, np.ndarray], ap_ids: np.ndarray) -> dict:
+    """
+    Прогоняет один решатель на AP ap_ids и считает метрики.
+    Для пакетных стратегий latency_p50_ms/latency_p99_ms — None, время пакета — в batch_ms.
+    """
+    started = time.perf_counter()
+    batch_ms = None
+    if name in _LEGACY_SOLVERS:
+        coords, latency = _run_legacy(_LEGACY_SOLVERS[name], observations, ap_ids)
+    elif name.startswith("engine:"):
+        coords, latency, batch_ms = _run_engine(name.split(":", 1)[1], observations, ap_ids)
+    else:
+        raise ValueError(f"Неизвестный решатель: {name} (доступны: {', '.join(available_solvers())})")
+    seconds = time.perf_counter() - started
+
+    solved = np.isfinite(coords[:, :2]).all(axis=1)
+    error_2d = np.linalg.norm(coords[solved, :2] - truth[ap_ids[solved], :2], axis=1)
+    has_z = solved & np.isfinite(coords[:, 2])
+    error_3d = np.linalg.norm(coords[has_z] - truth[ap_ids[has_z]], axis=1)
+
+    def pct(values, q):
+        if values is None:
+            return None
+        return round(float(np.percentile(values, q)), 3) if len(values) else None
+
+    return {
+        "solver": name,
+        "measured_aps": int(len(ap_ids)),
+        "solved": int(solved.sum()),
+        "seconds": round(seconds, 3),
+        "aps_per_second": round(len(ap_ids) / seconds, 1) if seconds > 0 else None,
+        "latency_p50_ms": pct(latency, 50),
+        "latency_p99_ms": pct(latency, 99),
+        "batched": latency is None,
+        "batch_ms": round(batch_ms, 3) if batch_ms is not None else None,
+        "error_2d_p50_m": pct(error_2d, 50),
+        "error_2d_p90_m": pct(error_2d, 90),
+        "error_3d_p50_m": pct(error_3d, 50),
+        "error_3d_p90_m": pct(error_3d, 90),
+    }
+
+
+def run_benchmark(
+    sizes=DEFAULT_SIZES,
+    solvers: list[str] | None = None,
+    max_aps_per_solver: int | None = DEFAULT_MAX_APS_PER_SOLVER,
+    seed: int = 0,
+    scan_params: dict | None = None,
+) -> dict:
+    """
+    Для каждого размера строит здание и сканы, затем меряет все решатели.
+    max_aps_per_solver — мерить на случайной выборке AP такого размера (None — на всех).
+    """
+    solvers = solvers or available_solvers()
+    scan_params = scan_params or {}
+    runs = []
+    for size in sizes:
+        truth = generate_building(size, seed=seed)
+        observations = generate_scans(truth, seed=seed, **scan_params)
+        ap_ids = np.arange(size)
+        if max_aps_per_solver and size > max_aps_per_solver:
+            ap_ids = np.sort(np.random.default_rng(seed).choice(size, max_aps_per_solver, replace=False))
+        for name in solvers:
+            result = {"n_aps": size, **benchmark_solver(name, truth, observations, ap_ids)}
+            latency = (
+                f"пакет {result['batch_ms']} мс" if result["batched"] else f"p50 {result['latency_p50_ms']} мс"
+            )
+            logger.info(
+                f"{name} @ {size} AP: {result['aps_per_second']} AP/с, {latency}, "
+                f"ошибка 2D p50 {result['error_2d_p50_m']} м"
+            )
+            runs.append(result)
+    return {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "seed": seed,
+            "max_aps_per_solver": max_aps_per_solver,
+            "scan_params": scan_params,
+        },
+        "results": runs,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.benchmarks",
+        description="Бенчмарк решателей координат AP на синтетическом здании",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="число AP в здании")
+    parser.add_argument("--solver", action="append", dest="solvers", choices=available_solvers(), help="решатель (можно несколько раз)")
+    parser.add_argument(
+        "--max-aps-per-solver", type=int, default=DEFAULT_MAX_APS_PER_SOLVER,
+        help="мерить на выборке такого размера; 0 — на всех AP",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--noise-db", type=float, default=2.0, help="шум RSSI, дБ")
+    parser.add_argument("--outlier-rate", type=float, default=0.1, help="доля выбросов")
+    parser.add_argument("--output", default="-", help="файл для JSON (- — stdout)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    report = run_benchmark(
+        args.sizes,
+        args.solvers,
+        args.max_aps_per_solver or None,
+        args.seed,
+        {"noise_db": args.noise_db, "outlier_rate": args.outlier_rate},
+    )
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
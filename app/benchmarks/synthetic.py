@@ -0,0 +1,78 @@
+"""
+Синтетическое здание и сканы для бенчмарков решателей: истинные координаты AP на этажах
+и наблюдения в формате observation_loader (OBS_COLUMNS), RSSI — по той же модели,
+что rssi_to_distance, с шумом и выбросами.
+"""
+import numpy as np
+
+from app.services.geo_solver import DEFAULT_TX_POWER_DBM, DEFAULT_PATH_LOSS_EXPONENT
+
+__all__ = [
+    "distance_to_rssi",
+    "generate_building",
+    "generate_scans",
+]
+
+FLOOR_HEIGHT_M = 3.5
+# Площадь этажа на одну AP (м²): размер этажа растёт с числом AP, плотность постоянна
+AREA_PER_AP_M2 = 150.0
+# AP висят под потолком
+AP_HEIGHT_M = 2.8
+# Снимки делаются на высоте телефона в руке
+SCAN_HEIGHT_M = 1.2
+
+
+def distance_to_rssi(distance, tx_power: float = DEFAULT_TX_POWER_DBM, n: float = DEFAULT_PATH_LOSS_EXPONENT):
+    """
+    Обратная к rssi_to_distance: RSSI (дБм) на заданном расстоянии.
+    """
+    return tx_power - 10 * n * np.log10(np.clip(distance, 1e-3, None))
+
+
+def generate_building(n_aps: int, floors: int = 5, seed: int = 0) -> np.ndarray:
+    """
+    Истинные координаты n_aps точек доступа [n_aps, 3]: AP равномерно распределены
+    по floors квадратным этажам, z — этаж × FLOOR_HEIGHT_M + AP_HEIGHT_M.
+    """
+    rng = np.random.default_rng(seed)
+    side = float(np.sqrt(AREA_PER_AP_M2 * n_aps / floors))
+    floor = rng.integers(0, floors, n_aps)
+    return np.column_stack([
+        rng.uniform(0, side, n_aps),
+        rng.uniform(0, side, n_aps),
+        floor * FLOOR_HEIGHT_M + AP_HEIGHT_M,
+    ])
+
+
+def generate_scans(
+    truth: np.ndarray,
+    scans_per_ap: int = 15,
+    radius_m: float = 15.0,
+    noise_db: float = 2.0,
+    outlier_rate: float = 0.1,
+    outlier_db: float = 15.0,
+    snapshot_accuracy_m: float = 5.0,
+    seed: int = 0,
+) -> dict[int, np.ndarray]:
+    """
+    Наблюдения каждой AP: scans_per_ap снимков в радиусе radius_m по горизонтали на этаже AP
+    или соседнем, RSSI = distance_to_rssi(истинное расстояние) + N(0, noise_db);
+    доля outlier_rate наблюдений — выбросы (отражения/перекрытия) со смещением ±outlier_db.
+    Возвращает {ap_id: массив [scans_per_ap, 5]} со столбцами OBS_COLUMNS; ap_id — индекс в truth.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(truth)
+    angle = rng.uniform(0, 2 * np.pi, (n, scans_per_ap))
+    radius = radius_m * np.sqrt(rng.uniform(0, 1, (n, scans_per_ap)))
+    floor_shift = rng.choice([-1, 0, 0, 0, 1], (n, scans_per_ap)) * FLOOR_HEIGHT_M
+    positions = np.empty((n, scans_per_ap, 3))
+    positions[:, :, 0] = truth[:, None, 0] + radius * np.cos(angle)
+    positions[:, :, 1] = truth[:, None, 1] + radius * np.sin(angle)
+    positions[:, :, 2] = np.clip(truth[:, None, 2] - AP_HEIGHT_M + floor_shift, 0, None) + SCAN_HEIGHT_M
+    distances = np.linalg.norm(positions - truth[:, None, :], axis=2)
+    rssi = distance_to_rssi(distances) + rng.normal(0, noise_db, (n, scans_per_ap))
+    outliers = rng.uniform(0, 1, (n, scans_per_ap)) < outlier_rate
+    rssi += outliers * rng.choice([-1.0, 1.0], (n, scans_per_ap)) * outlier_db
+    accuracy = np.full((n, scans_per_ap), snapshot_accuracy_m)
+    data = np.concatenate([positions, rssi[:, :, None], accuracy[:, :, None]], axis=2)
+    return {i: data[i] for i in range(n)}
@@ -55,6 +55,262 @@ class Settings(BaseSettings):
         description="JWT secret key for token signing",
     )
 
+    # Фоновый пересчёт координат AP после загрузки сканов
+    RECALC_WORKERS: int = Field(
+        4,
+        env="RECALC_WORKERS",
+        description="Number of background workers draining the AP recalculation queue",
+    )
+    RECALC_COALESCE_SECONDS: float = Field(
+        2.0,
+        env="RECALC_COALESCE_SECONDS",
+        description="Window in which repeated hits on the same AP are merged into one solve",
+    )
+    RECALC_MAX_PENDING: int = Field(
+        50000,
+        env="RECALC_MAX_PENDING",
+        description="Maximum number of dirty APs waiting for recalculation",
+    )
+    RECALC_WAIT_TIMEOUT: float = Field(
+        10.0,
+        env="RECALC_WAIT_TIMEOUT",
+        description="Max seconds an upload with wait=true blocks for fresh AP coordinates",
+    )
+
+    # Непрерывный приоритетный пересчёт AP вместо ночного (app/services/recompute_priority.py)
+    RECOMPUTE_CONTINUOUS_ENABLED: bool = Field(
+        True,
+        env="RECOMPUTE_CONTINUOUS_ENABLED",
+        description="Recompute APs every minute by priority instead of one nightly burst at 03:00",
+    )
+    RECOMPUTE_BUDGET_SECONDS_PER_MINUTE: float = Field(
+        6.0,
+        env="RECOMPUTE_BUDGET_SECONDS_PER_MINUTE",
+        description="Time budget of each per-minute priority recompute run",
+    )
+    RECOMPUTE_PRIORITY_BATCH_SIZE: int = Field(
+        500,
+        env="RECOMPUTE_PRIORITY_BATCH_SIZE",
+        description="Max APs taken from the priority queue per batch",
+    )
+
+    # Выбор лидера планировщика (advisory lock Postgres), см. app/tasks/leader.py
+    SCHEDULER_LEADER_LOCK_KEY: int = Field(
+        7_300_001,
+        env="SCHEDULER_LEADER_LOCK_KEY",
+        description="Postgres advisory lock key held by the process that runs scheduled jobs",
+    )
+    SCHEDULER_LEADER_CHECK_SECONDS: float = Field(
+        15.0,
+        env="SCHEDULER_LEADER_CHECK_SECONDS",
+        description="How often followers try to take over leadership and the leader checks its lock connection",
+    )
+
+    # Кэш готовых ответов /v1/map и дельта-синхронизация (app/services/map_cache.py, map_sync.py)
+    MAP_CACHE_MAX_ENTRIES: int = Field(
+        256,
+        env="MAP_CACHE_MAX_ENTRIES",
+        description="Max buildings whose serialized and precompressed maps are kept in process memory",
+    )
+    MAP_TOMBSTONE_RETENTION_DAYS: float = Field(
+        30.0,
+        env="MAP_TOMBSTONE_RETENTION_DAYS",
+        description="How long deletions are kept for /v1/map/{id}/changes; older clients get reset and refetch the map",
+    )
+
+    # Уровни детализации контуров этажей (?lod= в /v1/map и /v1/floor-polygons)
+    MAP_POLYGON_LOD_TOLERANCES_M: list[float] = Field(
+        [0.1, 0.5, 2.0],
+        env="MAP_POLYGON_LOD_TOLERANCES_M",
+        description="Douglas-Peucker tolerances (m) of the precomputed floor polygon LODs; lod=1 is the finest",
+    )
+
+    # Векторные тайлы этажей (app/services/vector_tiles.py)
+    MAP_TILE_CACHE_DIR: str = Field(
+        "tiles_cache",
+        env="MAP_TILE_CACHE_DIR",
+        description="Directory for generated vector tiles, keyed by building map version",
+    )
+    MAP_TILE_ROOT_SIZE_M: float = Field(
+        2048.0,
+        env="MAP_TILE_ROOT_SIZE_M",
+        description="Side (m) of the zoom 0 tile, centered on the building local origin",
+    )
+    MAP_TILE_MAX_ZOOM: int = Field(
+        10,
+        env="MAP_TILE_MAX_ZOOM",
+        description="Deepest zoom level served by the tile endpoint (10 is a 2 m tile on the default 2048 m root)",
+    )
+
+    # Пакетная загрузка сканов
+    UPLOAD_BATCH_CHUNK_SIZE: int = Field(
+        200,
+        env="UPLOAD_BATCH_CHUNK_SIZE",
+        description="Scans written per bulk chunk (one transaction) in /upload/batch",
+    )
+    UPLOAD_BATCH_MAX_ITEMS: int = Field(
+        10000,
+        env="UPLOAD_BATCH_MAX_ITEMS",
+        description="Maximum number of scans accepted in one /upload/batch request",
+    )
+
+    # Обратное геокодирование (OSM Nominatim) и его кэш
+    NOMINATIM_URL: str = Field(
+        "https://nominatim.openstreetmap.org/reverse",
+        env="NOMINATIM_URL",
+        description="Nominatim reverse geocoding endpoint",
+    )
+    GEOCODE_HTTP_TIMEOUT: float = Field(
+        10.0,
+        env="GEOCODE_HTTP_TIMEOUT",
+        description="Timeout (seconds) for external geocoding requests",
+    )
+    GEOCODE_CELL_DEGREES: float = Field(
+        0.0002,
+        env="GEOCODE_CELL_DEGREES",
+        description="Lat/lon quantization step for the geocoding cache (~20 m)",
+    )
+    GEOCODE_CACHE_TTL_SECONDS: int = Field(
+        30 * 24 * 3600,
+        env="GEOCODE_CACHE_TTL_SECONDS",
+        description="Time to live of cached geocoding results (in-process and DB)",
+    )
+    GEOCODE_LRU_SIZE: int = Field(
+        10000,
+        env="GEOCODE_LRU_SIZE",
+        description="Max number of geocoding results kept in the in-process LRU",
+    )
+    GEOCODE_FOOTPRINTS_PATH: str | None = Field(
+        None,
+        env="GEOCODE_FOOTPRINTS_PATH",
+        description="OSM XML (.osm) or GeoJSON file with building footprints for offline geocoding",
+    )
+    GEOCODE_LOCAL_MAX_DISTANCE_M: float = Field(
+        30.0,
+        env="GEOCODE_LOCAL_MAX_DISTANCE_M",
+        description="Max distance (m) to the nearest footprint when the point is outside all buildings",
+    )
+    GEOCODE_NOMINATIM_FALLBACK: bool = Field(
+        True,
+        env="GEOCODE_NOMINATIM_FALLBACK",
+        description="Query Nominatim when the local footprint index has no match (disable for offline sites)",
+    )
+
+    # Кэш зданий в памяти процесса
+    BUILDING_REGISTRY_TTL_SECONDS: float = Field(
+        300.0,
+        env="BUILDING_REGISTRY_TTL_SECONDS",
+        description="How often the in-process building registry is fully reloaded from the DB",
+    )
+
+    # Пакетный решатель глобального пересчёта координат AP
+    GEO_SOLVER_BATCH_SIZE: int = Field(
+        5000,
+        env="GEO_SOLVER_BATCH_SIZE",
+        description="Number of APs solved together by the vectorized multilateration solver",
+    )
+    GEO_SOLVER_FETCH_CHUNK_ROWS: int = Field(
+        10000,
+        env="GEO_SOLVER_FETCH_CHUNK_ROWS",
+        description="Rows fetched per server-side cursor round trip when loading observations",
+    )
+    AP_WRITE_TOLERANCE_M: float = Field(
+        0.0,
+        env="AP_WRITE_TOLERANCE_M",
+        description="Skip rewriting recomputed APs that moved less than this (m); 0 writes every row",
+    )
+    AP_WRITE_ACCURACY_TOLERANCE_RATIO: float = Field(
+        0.1,
+        env="AP_WRITE_ACCURACY_TOLERANCE_RATIO",
+        description="With AP_WRITE_TOLERANCE_M, still rewrite APs whose accuracy changed by more than this fraction",
+    )
+
+    # Онлайн-оценка положения AP (фильтр Калмана по каждой загрузке)
+    AP_ESTIMATOR_ENABLED: bool = Field(
+        True,
+        env="AP_ESTIMATOR_ENABLED",
+        description="Update per-AP online position estimates on every upload",
+    )
+    AP_ESTIMATOR_PROCESS_NOISE_M2_PER_DAY: float = Field(
+        0.5,
+        env="AP_ESTIMATOR_PROCESS_NOISE_M2_PER_DAY",
+        description="Covariance growth per day without data (time decay of old observations)",
+    )
+    AP_ESTIMATOR_MIN_OBS: int = Field(
+        8,
+        env="AP_ESTIMATOR_MIN_OBS",
+        description="Observations required before an online estimate is trusted",
+    )
+    AP_ESTIMATOR_MAX_STD_M: float = Field(
+        3.0,
+        env="AP_ESTIMATOR_MAX_STD_M",
+        description="Max estimate uncertainty (m) for an online estimate to be trusted",
+    )
+
+    # Движок пересчёта координат AP (app/services/solver_engine.py)
+    SOLVER_STRATEGY: str = Field(
+        "wls",
+        env="SOLVER_STRATEGY",
+        description="Default AP solver strategy: wls, ransac, linear or incremental",
+    )
+    SOLVER_BUILDING_STRATEGIES: dict[str, dict] = Field(
+        {},
+        env="SOLVER_BUILDING_STRATEGIES",
+        description='Per-building overrides as JSON, e.g. {"12": {"strategy": "ransac", "params": {"threshold": 4.0}}}',
+    )
+    SOLVER_EXECUTOR_KIND: str = Field(
+        "thread",
+        env="SOLVER_EXECUTOR_KIND",
+        description="Executor for numerical solving off the event loop: thread or process",
+    )
+    SOLVER_EXECUTOR_WORKERS: int = Field(
+        2,
+        env="SOLVER_EXECUTOR_WORKERS",
+        description="Max concurrent solves per web process; further solves wait in the queue",
+    )
+
+    # Общая очередь заданий пересчёта в Postgres (app/services/job_queue.py, python -m app.tasks.worker)
+    JOB_QUEUE_ENABLED: bool = Field(
+        False,
+        env="JOB_QUEUE_ENABLED",
+        description="Send AP recompute work from uploads to the Postgres job table instead of the in-process queue",
+    )
+    JOB_QUEUE_BATCH_SIZE: int = Field(
+        50,
+        env="JOB_QUEUE_BATCH_SIZE",
+        description="Jobs claimed by a worker per dequeue",
+    )
+    JOB_QUEUE_POLL_SECONDS: float = Field(
+        1.0,
+        env="JOB_QUEUE_POLL_SECONDS",
+        description="Worker sleep between polls when the queue is empty",
+    )
+    JOB_QUEUE_MAX_ATTEMPTS: int = Field(
+        5,
+        env="JOB_QUEUE_MAX_ATTEMPTS",
+        description="Attempts before a job is marked failed",
+    )
+    JOB_QUEUE_RETRY_BASE_SECONDS: float = Field(
+        5.0,
+        env="JOB_QUEUE_RETRY_BASE_SECONDS",
+        description="First retry delay; doubles on every further attempt",
+    )
+    JOB_QUEUE_RETRY_MAX_SECONDS: float = Field(
+        600.0,
+        env="JOB_QUEUE_RETRY_MAX_SECONDS",
+        description="Upper bound for the retry delay",
+    )
+    JOB_QUEUE_LEASE_SECONDS: float = Field(
+        300.0,
+        env="JOB_QUEUE_LEASE_SECONDS",
+        description="Running jobs older than this are considered abandoned and requeued",
+    )
+    ADMIN_JOB_LEASE_SECONDS: float = Field(
+        1800.0,
+        env="ADMIN_JOB_LEASE_SECONDS",
+        description="Queued/running admin jobs without progress updates for this long are marked failed at startup",
+    )
+
     # Pydantic V2: вместо Config используем model_config
     model_config = {
         "env_file": ".env",
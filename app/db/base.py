@@ -9,4 +9,9 @@ from app.db.models import (
     wifi_snapshot,
     wifi_obs,
     floor_polygon,
+    geocode_cache,
+    ap_estimate,
+    recompute_job,
+    admin_job,
+    map_tombstone,
 )
@@ -6,3 +6,8 @@ from .wifi_snapshot import WiFiSnapshot
 from .wifi_obs import WiFiObs
 from .floor_polygon import FloorPolygon
 from .user import User
+from .geocode_cache import GeocodeCache
+from .ap_estimate import APEstimate
+from .recompute_job import RecomputeJob
+from .admin_job import AdminJob
+from .map_tombstone import MapTombstone
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Boolean, DateTime, BigInteger, Index, func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
 class AccessPoint(Base):
     __tablename__ = "access_points"
+    __table_args__ = (
+        # Дельта-синхронизация карты: изменения здания новее версии since
+        Index("ix_access_points_building_id_map_version", "building_id", "map_version"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     bssid = Column(String(32), unique=True, nullable=False)
@@ -15,6 +19,8 @@ class AccessPoint(Base):
     z = Column(Float, nullable=False)
     accuracy = Column(Float, nullable=False, default=9999.0)
     is_mobile = Column(Boolean, default=False, nullable=False)
+    map_version = Column(BigInteger, nullable=False, default=0, server_default="0", comment="Версия карты здания, в которой запись менялась последний раз")
+    solved_obs_id = Column(Integer, nullable=True, comment="Watermark: max id наблюдения на момент последнего пересчёта")
     last_update = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
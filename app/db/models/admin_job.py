@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Text, JSON, Boolean, LargeBinary, DateTime, ForeignKey, func
+from sqlalchemy.orm import deferred
+from app.db.base import Base
+
+
+class AdminJob(Base):
+    __tablename__ = "admin_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(32), nullable=False, comment="Тип задания, например recompute_aps")
+    status = Column(String(16), nullable=False, default="queued", comment="queued | running | done | failed | cancelled")
+    params = Column(JSON, nullable=False, default=dict)
+    total = Column(Integer, nullable=True, comment="Сколько AP нужно обработать (известно после выборки)")
+    processed = Column(Integer, nullable=False, default=0)
+    solved = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    summary = Column(JSON, nullable=True, comment="Итоговая сводка задания")
+    error = Column(Text, nullable=True)
+    # Компактный лог по AP: gzip NDJSON [ap_id, статус, старая accuracy, новая accuracy, сдвиг, м]
+    log = deferred(Column(LargeBinary, nullable=True))
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
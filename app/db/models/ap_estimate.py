@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, Float, JSON, DateTime, ForeignKey, func
+from sqlalchemy.orm import relationship
+from app.db.base import Base
+
+
+class APEstimate(Base):
+    __tablename__ = "ap_estimates"
+
+    access_point_id = Column(Integer, ForeignKey("access_points.id", ondelete="CASCADE"), primary_key=True)
+    x = Column(Float, nullable=False)
+    y = Column(Float, nullable=False)
+    z = Column(Float, nullable=False)
+    cov = Column(JSON, nullable=False, comment="Ковариация оценки: [xx, xy, xz, yy, yz, zz], м²")
+    std_m = Column(Float, nullable=False, comment="sqrt(trace(cov)) — неопределённость оценки, м")
+    n_obs = Column(Integer, nullable=False, default=0, comment="Число учтённых наблюдений")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    access_point = relationship("AccessPoint")
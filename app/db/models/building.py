@@ -11,6 +11,8 @@ class Building(Base):
     address = Column(String(255), nullable=True)
     lat = Column(Float, nullable=True)
     lon = Column(Float, nullable=True)
+    map_version = Column(BigInteger, nullable=False, default=0, server_default="0", comment="Версия карты: растёт при любом изменении AP, полигонов и POI здания")
+    map_compacted_version = Column(BigInteger, nullable=False, default=0, server_default="0", comment="Удаления до этой версии вычищены из map_tombstones: клиентам со since ниже нужна полная карта")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
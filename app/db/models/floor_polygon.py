@@ -1,11 +1,17 @@
-from sqlalchemy import Column, Integer, ForeignKey, JSON, DateTime, func
+import numpy as np
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, JSON, LargeBinary, DateTime, Index, func
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
+from app.utils.geometry import pack_points, unpack_points
 
 
 class FloorPolygon(Base):
     __tablename__ = "floor_polygons"
+    __table_args__ = (
+        # Дельта-синхронизация карты: изменения здания новее версии since
+        Index("ix_floor_polygons_building_id_map_version", "building_id", "map_version"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     building_id = Column(
@@ -15,16 +21,56 @@ class FloorPolygon(Base):
     )
     floor = Column(Integer, nullable=False, comment="Этаж, к которому привязан полигон")
 
-    polygon = Column(
+    # Старый формат (JSON [[x, y, z], …]); новые записи хранят контур в polygon_packed
+    polygon_json = Column(
+        "polygon",
+        JSON,
+        nullable=True,
+        comment="Список 3D-координат точек [[x, y, z], …] для карты этажа (старый формат)"
+    )
+    polygon_packed = Column(
+        LargeBinary,
+        nullable=True,
+        comment="Контур этажа: little-endian float64, N×3 (x, y, z)"
+    )
+
+    polygon_lods = Column(
         JSON,
-        nullable=False,
-        comment="Список 3D-координат точек [[x, y, z], …] для карты этажа"
+        nullable=True,
+        comment="Упрощённые контуры [{tolerance, polygon}, …] по возрастанию допуска (Дуглас — Пекер)"
     )
 
+    map_version = Column(BigInteger, nullable=False, default=0, server_default="0", comment="Версия карты здания, в которой запись менялась последний раз")
+
     created_at = Column(
         DateTime(timezone=True),
         server_default=func.now(),
         nullable=False
     )
 
-    building = relationship("Building", back_populates="floor_polygons")
\ No newline at end of file
+    building = relationship("Building", back_populates="floor_polygons")
+
+    @property
+    def points(self) -> np.ndarray:
+        """
+        Контур как массив N×3; для упакованного формата — без копирования.
+        """
+        if self.polygon_packed is not None:
+            return unpack_points(self.polygon_packed)
+        if not self.polygon_json:
+            return np.empty((0, 3))
+        return unpack_points(pack_points(self.polygon_json))
+
+    @property
+    def polygon(self) -> list[list[float]]:
+        """
+        Контур в прежнем виде [[x, y, z], …] — форма JSON API не меняется.
+        """
+        if self.polygon_packed is not None:
+            return unpack_points(self.polygon_packed).tolist()
+        return self.polygon_json
+
+    @polygon.setter
+    def polygon(self, value) -> None:
+        self.polygon_packed = pack_points(value)
+        self.polygon_json = None
\ No newline at end of file
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, JSON, DateTime, func
+from app.db.base import Base
+
+
+class GeocodeCache(Base):
+    __tablename__ = "geocode_cache"
+
+    cell = Column(String(64), primary_key=True, comment="Квантованные координаты lat,lon ячейки")
+    response = Column(JSON, nullable=False, comment="Ответ геокодера (osm_id, name, display_name, …)")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
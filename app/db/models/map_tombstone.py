@@ -0,0 +1,17 @@
+from sqlalchemy import Column, BigInteger, Integer, String, ForeignKey, DateTime, Index, func
+from app.db.base import Base
+
+
+class MapTombstone(Base):
+    __tablename__ = "map_tombstones"
+    __table_args__ = (
+        # Удаления здания новее версии since (GET /v1/map/{id}/changes)
+        Index("ix_map_tombstones_building_id_map_version", "building_id", "map_version"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    building_id = Column(Integer, ForeignKey("buildings.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(16), nullable=False, comment="access_point | floor_polygon | poi")
+    entity_id = Column(Integer, nullable=False, comment="ID удалённой записи")
+    map_version = Column(BigInteger, nullable=False, comment="Версия карты здания, в которой запись удалена")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, BigInteger, Index, func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
 class POI(Base):
     __tablename__ = "pois"
+    __table_args__ = (
+        # Дельта-синхронизация карты: изменения здания новее версии since
+        Index("ix_pois_building_id_map_version", "building_id", "map_version"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     building_id = Column(Integer, ForeignKey("buildings.id", ondelete="CASCADE"), nullable=False)
@@ -13,6 +17,7 @@ class POI(Base):
     z = Column(Float, nullable=True)
     type = Column(String(32), nullable=False, comment="Тип POI: вход, выход, лифт, лестница, туалет, и т.д.")
     name = Column(String(255), nullable=True, comment="Название/описание точки интереса")
+    map_version = Column(BigInteger, nullable=False, default=0, server_default="0", comment="Версия карты здания, в которой запись менялась последний раз")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     building = relationship("Building", back_populates="pois")
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, JSON, DateTime, Index, func, text
+from app.db.base import Base
+
+
+class RecomputeJob(Base):
+    __tablename__ = "recompute_jobs"
+    __table_args__ = (
+        # Очередь разбирается по (status, run_at): SELECT ... WHERE status = 'pending' AND run_at <= now()
+        Index("ix_recompute_jobs_status_run_at", "status", "run_at"),
+        # Дедупликация: не больше одного ожидающего задания на ключ (например, на AP)
+        Index(
+            "uq_recompute_jobs_pending_dedup_key",
+            "dedup_key",
+            unique=True,
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    kind = Column(String(32), nullable=False, comment="Тип задания (обработчик в app.tasks.worker)")
+    dedup_key = Column(String(128), nullable=True, comment="Ключ слияния одинаковых заданий, например ap:<bssid>")
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(String(16), nullable=False, default="pending", comment="pending | running | failed")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, comment="Не раньше этого времени (backoff)")
+    locked_by = Column(String(128), nullable=True, comment="Воркер, взявший задание")
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
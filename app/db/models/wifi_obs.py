@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, ForeignKey, String
+from sqlalchemy import Column, Integer, ForeignKey, String, Index
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
 class WiFiObs(Base):
     __tablename__ = "wifi_observations"
+    __table_args__ = (
+        # Поиск наблюдений AP новее watermark (ночной пересчёт)
+        Index("ix_wifi_observations_ap_id_id", "access_point_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     snapshot_id = Column(Integer, ForeignKey("wifi_snapshots.id", ondelete="CASCADE"), nullable=False)
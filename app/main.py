@@ -5,9 +5,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db_session
 from app.db.base import Base
-from app.db.session import async_engine
-from app.tasks.scheduler import start_scheduler
+from app.db.session import async_engine, AsyncSessionLocal
+from app.tasks.scheduler import start_scheduler, stop_scheduler
+from app.tasks.recalc_queue import recalc_queue
+from app.services.solver_executor import solver_executor
+from app.services.admin_jobs import cancel_running_jobs, fail_abandoned_jobs
 from app.core.logging_config import setup_logging
+from app.utils.geo_utils import close_http_client
+from app.services.geocoding import get_footprint_index
 
 from app.api.routers.health import router as health_router
 from app.api.routers.upload import router as upload_router
@@ -43,7 +48,20 @@ setup_logging()
 async def on_startup():
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # Задания, чей процесс умер посреди работы, иначе навсегда остались бы running
+    async with AsyncSessionLocal() as db:
+        await fail_abandoned_jobs(db)
     start_scheduler()
+    recalc_queue.start()
+    await get_footprint_index()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await stop_scheduler()
+    await cancel_running_jobs()
+    await recalc_queue.stop()
+    solver_executor.shutdown()
+    await close_http_client()
 
 # Подключаем роутеры
 app.include_router(health_router, tags=["health"])
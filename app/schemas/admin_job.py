@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class AdminJobOut(BaseModel):
+    id: int = Field(..., description="ID задания")
+    kind: str = Field(..., description="Тип задания")
+    status: str = Field(..., description="queued | running | done | failed | cancelled")
+    params: dict = Field(default_factory=dict, description="Параметры запуска")
+    total: Optional[int] = Field(None, description="Сколько AP нужно обработать")
+    processed: int = Field(0, description="Обработано AP")
+    solved: int = Field(0, description="Пересчитано AP")
+    failed: int = Field(0, description="Не пересчитано AP (мало данных или ошибка решателя)")
+    progress_percent: Optional[float] = Field(None, description="Прогресс, %")
+    aps_per_second: Optional[float] = Field(None, description="Скорость обработки, AP/с")
+    eta_seconds: Optional[float] = Field(None, description="Оценка оставшегося времени, с")
+    cancel_requested: bool = Field(False, description="Запрошена отмена")
+    summary: Optional[dict] = Field(None, description="Итоговая сводка")
+    error: Optional[str] = Field(None, description="Текст ошибки")
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
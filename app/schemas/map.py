@@ -6,6 +6,7 @@ from app.schemas.ap import AccessPointOut
 
 
 class FloorSchema(BaseModel):
+    id: Optional[int] = Field(None, description="ID полигона этажа (для применения изменений из /changes)")
     floor: int = Field(..., description="Номер этажа")
     polygon: List[List[float]] = Field(
         ...,
@@ -21,6 +22,7 @@ class FloorSchema(BaseModel):
 
 class MapResponse(BaseModel):
     building_id: int = Field(..., description="ID здания")
+    version: Optional[int] = Field(None, description="Версия карты: база для /v1/map/{building_id}/changes?since=")
     building_name: str = Field(..., description="Название здания")
     address: str = Field(..., description="Адрес или описание здания")
     lat: Optional[float] = Field(None, description="Широта центра здания")
@@ -47,7 +49,7 @@ class FloorPolygonUpdate(BaseModel):
 
 class FloorPolygonOut(FloorPolygonBase):
     id: int
-    created_at: str
+    created_at: datetime
 
     class Config:
         orm_mode = True
@@ -84,6 +86,36 @@ class POIOut(POIBase):
         orm_mode = True
 
 
+class FloorPolygonState(BaseModel):
+    id: int = Field(..., description="ID полигона этажа")
+    floor: int = Field(..., description="Номер этажа")
+    polygon: List[List[float]] = Field(..., description="Список 3D-точек [[x, y, z], …] для контура этажа")
+
+    class Config:
+        from_attributes = True
+
+
+class MapDeletions(BaseModel):
+    access_points: List[int] = Field(default_factory=list, description="ID удалённых AP")
+    floor_polygons: List[int] = Field(default_factory=list, description="ID удалённых полигонов этажей")
+    pois: List[int] = Field(default_factory=list, description="ID удалённых POI")
+
+
+class MapChangesResponse(BaseModel):
+    building_id: int = Field(..., description="ID здания")
+    since: int = Field(..., description="Версия, от которой посчитаны изменения")
+    version: int = Field(..., description="Текущая версия карты: since для следующего запроса")
+    reset: bool = Field(
+        False,
+        description="Изменения от since недоступны (журнал удалений очищен или версия неизвестна): "
+                    "загрузите карту заново через /v1/map/{building_id}",
+    )
+    access_points: List[AccessPointOut] = Field(default_factory=list, description="Добавленные и изменённые AP")
+    floor_polygons: List[FloorPolygonState] = Field(default_factory=list, description="Добавленные и изменённые полигоны этажей")
+    pois: List[POIOut] = Field(default_factory=list, description="Добавленные и изменённые POI")
+    deleted: MapDeletions = Field(default_factory=MapDeletions, description="Удаления (tombstones)")
+
+
 class RoutePoint(BaseModel):
     x: float
     y: float
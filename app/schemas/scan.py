@@ -38,3 +38,17 @@ class ScanResponseCoordinates(BaseModel):
 class ScanResponse(BaseModel):
     status: str = Field(..., example="success")
     coordinates: Optional[ScanResponseCoordinates]
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Порядковый номер скана в пакете", example=0)
+    status: str = Field(..., description="success или error", example="success")
+    snapshot_id: Optional[int] = Field(None, description="ID созданного снимка", example=101)
+    building_id: Optional[int] = Field(None, example=1)
+    observations: int = Field(0, description="Сохранено наблюдений", example=12)
+    detail: Optional[str] = Field(None, description="Причина ошибки")
+
+class BatchUploadResponse(BaseModel):
+    total: int = Field(..., example=2)
+    succeeded: int = Field(..., example=2)
+    failed: int = Field(..., example=0)
+    items: List[BatchItemResult]
@@ -1,13 +1,122 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update, values, column, or_, Integer, Float
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.db.models.access_point import AccessPoint
 from app.schemas.ap import AccessPointCreate, AccessPointUpdate
 from sqlalchemy.exc import NoResultFound, IntegrityError
+from app.core.config import settings
+from app.services.map_sync import KIND_ACCESS_POINT, record_map_deletions, touch_map_entity, touch_map_rows
+
+AP_INSERT_CHUNK_ROWS = 2000
+# Один параметр на BSSID в bssid IN (...)
+AP_LOOKUP_CHUNK_ROWS = 10000
+# 5 параметров на строку: 5000 строк — 25000 параметров, в пределах лимита asyncpg (32767)
+AP_UPDATE_CHUNK_ROWS = 5000
 
 async def get_access_point(db: AsyncSession, ap_id: int) -> AccessPoint | None:
     result = await db.execute(select(AccessPoint).where(AccessPoint.id == ap_id))
     return result.scalars().first()
 
+async def get_access_points_by_bssids(db: AsyncSession, bssids) -> dict[str, AccessPoint]:
+    """
+    Загружает все AP с указанными BSSID: bssid IN (...) кусками до AP_LOOKUP_CHUNK_ROWS
+    (asyncpg ограничивает запрос 32767 параметрами).
+    Возвращает словарь {bssid: AccessPoint}.
+    """
+    bssids = sorted(set(bssids))
+    found = {}
+    for i in range(0, len(bssids), AP_LOOKUP_CHUNK_ROWS):
+        result = await db.execute(select(AccessPoint).where(AccessPoint.bssid.in_(bssids[i:i + AP_LOOKUP_CHUNK_ROWS])))
+        found.update({ap.bssid: ap for ap in result.scalars().all()})
+    return found
+
+async def insert_access_points_ignore_existing(db: AsyncSession, rows: list[dict]) -> dict[str, int]:
+    """
+    Массово создаёт AP одним INSERT ... ON CONFLICT (bssid) DO NOTHING RETURNING.
+    Строки, которые параллельно успел вставить другой запрос, не возвращаются из INSERT —
+    их id добираются одним дополнительным SELECT, поэтому IntegrityError не возникает.
+    Новые AP отмечаются в версиях карт их зданий (touch_map_rows) — версии поднимаются при коммите.
+    Возвращает словарь {bssid: id} для всех переданных строк.
+    """
+    if not rows:
+        return {}
+    ids = {}
+    # asyncpg ограничивает запрос 32767 параметрами — режем на куски
+    for i in range(0, len(rows), AP_INSERT_CHUNK_ROWS):
+        stmt = (
+            pg_insert(AccessPoint)
+            .values(rows[i:i + AP_INSERT_CHUNK_ROWS])
+            .on_conflict_do_nothing(index_elements=[AccessPoint.bssid])
+            .returning(AccessPoint.id, AccessPoint.bssid, AccessPoint.building_id)
+        )
+        result = await db.execute(stmt)
+        inserted = result.all()
+        ids.update({bssid: ap_id for ap_id, bssid, _ in inserted})
+        touch_map_rows(db, AccessPoint, [(ap_id, building_id) for ap_id, _, building_id in inserted])
+    missing = [row["bssid"] for row in rows if row["bssid"] not in ids]
+    for i in range(0, len(missing), AP_LOOKUP_CHUNK_ROWS):
+        result = await db.execute(
+            select(AccessPoint.id, AccessPoint.bssid).where(AccessPoint.bssid.in_(missing[i:i + AP_LOOKUP_CHUNK_ROWS]))
+        )
+        ids.update({bssid: ap_id for ap_id, bssid in result.all()})
+    return ids
+
+def _coords_update_stmt(chunk: list[dict], tolerance_m: float, accuracy_ratio: float | None = None):
+    v = values(
+        column("id", Integer),
+        column("x", Float),
+        column("y", Float),
+        column("z", Float),
+        column("accuracy", Float),
+        name="new_coords",
+    ).data([(row["id"], row["x"], row["y"], row["z"], row["accuracy"]) for row in chunk])
+    table = AccessPoint.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == v.c.id)
+        .values(x=v.c.x, y=v.c.y, z=v.c.z, accuracy=v.c.accuracy)
+        .returning(table.c.id, table.c.building_id)
+    )
+    if tolerance_m > 0:
+        moved_sq = (
+            (table.c.x - v.c.x) * (table.c.x - v.c.x)
+            + (table.c.y - v.c.y) * (table.c.y - v.c.y)
+            + (table.c.z - v.c.z) * (table.c.z - v.c.z)
+        )
+        if accuracy_ratio is None:
+            accuracy_ratio = settings.AP_WRITE_ACCURACY_TOLERANCE_RATIO
+        # Допуск гасит только дрожание координат: заметно изменившаяся accuracy пишется всегда
+        # (иначе новая AP навсегда осталась бы с accuracy по умолчанию). Если одна из accuracy NULL,
+        # сравнение даёт NULL — тогда пишем, если они различаются
+        accuracy_changed = func.coalesce(
+            func.abs(table.c.accuracy - v.c.accuracy) > accuracy_ratio * v.c.accuracy,
+            table.c.accuracy.is_distinct_from(v.c.accuracy),
+        )
+        stmt = stmt.where(or_(moved_sq > tolerance_m * tolerance_m, accuracy_changed))
+    return stmt
+
+async def update_access_point_coords_bulk(db: AsyncSession, rows: list[dict], tolerance_m: float | None = None) -> int:
+    """
+    Массово записывает пересчитанные координаты AP: UPDATE access_points ... FROM (VALUES ...)
+    одним запросом на кусок до AP_UPDATE_CHUNK_ROWS строк.
+    rows: [{"id", "x", "y", "z", "accuracy"}, ...].
+    tolerance_m (по умолчанию AP_WRITE_TOLERANCE_M): строки, сместившиеся меньше чем на tolerance_m метров,
+    не перезаписываются (меньше WAL и «мёртвых» версий строк), если их accuracy изменилась не больше чем
+    на долю AP_WRITE_ACCURACY_TOLERANCE_RATIO; 0 — писать всё.
+    Изменённые AP отмечаются в версиях карт их зданий (touch_map_rows) — версии поднимаются при коммите.
+    Не коммитит и не синхронизирует объекты сессии. Возвращает число обновлённых строк.
+    """
+    if not rows:
+        return 0
+    if tolerance_m is None:
+        tolerance_m = settings.AP_WRITE_TOLERANCE_M
+    changed = []
+    for i in range(0, len(rows), AP_UPDATE_CHUNK_ROWS):
+        result = await db.execute(_coords_update_stmt(rows[i:i + AP_UPDATE_CHUNK_ROWS], tolerance_m))
+        changed.extend(result.tuples().all())
+    touch_map_rows(db, AccessPoint, changed)
+    return len(changed)
+
 async def list_access_points(
     db: AsyncSession,
     building_id: int | None = None,
@@ -78,6 +187,7 @@ async def list_access_points(
 
 async def create_access_point(db: AsyncSession, data: AccessPointCreate) -> AccessPoint:
     ap = AccessPoint(**data.dict())
+    touch_map_entity(db, ap)
     db.add(ap)
     try:
         await db.commit()
@@ -98,6 +208,7 @@ async def update_access_point(db: AsyncSession, ap_id: int, data: AccessPointUpd
         exists = await db.execute(select(AccessPoint).where(AccessPoint.bssid == data.bssid))
         if exists.scalars().first():
             raise ValueError("AccessPoint with this BSSID already exists")
+    touch_map_entity(db, ap)
     for k, v in data.dict(exclude_unset=True).items():
         setattr(ap, k, v)
     try:
@@ -114,5 +225,6 @@ async def delete_access_point(db: AsyncSession, ap_id: int) -> None:
     ap = await get_access_point(db, ap_id)
     if not ap:
         raise NoResultFound(f"AccessPoint id={ap_id} not found")
+    record_map_deletions(db, KIND_ACCESS_POINT, [(ap.id, ap.building_id)])
     await db.delete(ap)
     await db.commit()
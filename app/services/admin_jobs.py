@@ -0,0 +1,213 @@
+import asyncio
+import gzip
+import io
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.admin_job import AdminJob
+from app.db.session import AsyncSessionLocal
+from app.services.geo_solver import update_access_point_positions
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "KIND_RECOMPUTE_APS",
+    "CompactLog",
+    "JobCancelled",
+    "create_recompute_job",
+    "start_job",
+    "run_recompute_job",
+    "request_cancel",
+    "job_progress",
+    "cancel_running_jobs",
+    "fail_abandoned_jobs",
+]
+
+KIND_RECOMPUTE_APS = "recompute_aps"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# Ссылки на запущенные задачи, чтобы их не собрал сборщик мусора
+_running: set[asyncio.Task] = set()
+
+SHUTDOWN_ERROR = "Прервано остановкой приложения"
+ABANDONED_ERROR = "Процесс, выполнявший задание, остановлен или перезапущен"
+
+
+class JobCancelled(Exception):
+    """
+    Пересчёт прерван по запросу администратора.
+    """
+
+
+class CompactLog:
+    """
+    Лог пересчёта по AP в памяти в сжатом виде: gzip NDJSON, по строке-массиву на AP.
+    """
+
+    def __init__(self):
+        self._buffer = io.BytesIO()
+        self._gzip = gzip.GzipFile(fileobj=self._buffer, mode="wb")
+        self.entries = 0
+
+    def write(self, entries: list[list]) -> None:
+        for entry in entries:
+            self._gzip.write(json.dumps(entry, separators=(",", ":")).encode() + b"\n")
+        self.entries += len(entries)
+
+    def getvalue(self) -> bytes:
+        if not self._gzip.closed:
+            self._gzip.close()
+        return self._buffer.getvalue()
+
+
+async def create_recompute_job(db: AsyncSession, full: bool = True, user_id: int | None = None) -> AdminJob:
+    """
+    Создаёт запись задания массового пересчёта (status=queued) и коммитит её.
+    """
+    job = AdminJob(kind=KIND_RECOMPUTE_APS, status=QUEUED, params={"full": full}, created_by=user_id)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+def start_job(job_id: int) -> asyncio.Task:
+    """
+    Запускает задание фоновой задачей в текущем процессе; запрос, создавший задание, не ждёт.
+    """
+    task = asyncio.create_task(run_recompute_job(job_id), name=f"admin-job-{job_id}")
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    return task
+
+
+async def run_recompute_job(job_id: int) -> None:
+    """
+    Выполняет задание: update_access_point_positions в своей сессии, прогресс и флаг отмены —
+    через отдельную сессию после каждого пакета (видны из любого процесса).
+    """
+    log = CompactLog()
+    async with AsyncSessionLocal() as control:
+        job = await control.get(AdminJob, job_id)
+        if job is None or job.status != QUEUED:
+            return
+        if job.cancel_requested:
+            job.status, job.finished_at = CANCELLED, datetime.now(timezone.utc)
+            await control.commit()
+            return
+        job.status, job.started_at = RUNNING, datetime.now(timezone.utc)
+        await control.commit()
+
+        async def progress(stats: dict) -> None:
+            job = await control.get(AdminJob, job_id, populate_existing=True)
+            job.total, job.processed = stats["total"], stats["processed"]
+            job.solved, job.failed = stats["solved"], stats["failed"]
+            await control.commit()
+            if job.cancel_requested:
+                raise JobCancelled()
+
+        status, summary, error = DONE, None, None
+        try:
+            async with AsyncSessionLocal() as session:
+                summary = await update_access_point_positions(
+                    session, full=job.params.get("full", True), progress=progress, recalc_log=log
+                )
+        except JobCancelled:
+            status = CANCELLED
+            logger.info(f"Задание {job_id} отменено администратором")
+        except asyncio.CancelledError:
+            status, error = FAILED, SHUTDOWN_ERROR
+            logger.warning(f"Задание {job_id} прервано остановкой приложения")
+            raise
+        except Exception as e:
+            status, error = FAILED, f"{type(e).__name__}: {e}"
+            logger.exception(f"Задание {job_id} завершилось ошибкой")
+        finally:
+            # Итог пишется отдельной сессией: control мог быть прерван посреди коммита прогресса
+            async with AsyncSessionLocal() as db:
+                job = await db.get(AdminJob, job_id)
+                job.status, job.summary, job.error = status, summary, error
+                job.log = log.getvalue()
+                job.finished_at = datetime.now(timezone.utc)
+                await db.commit()
+            logger.info(f"Задание {job_id} ({job.kind}): {status}, записей в логе {log.entries}")
+
+
+async def cancel_running_jobs(timeout: float = 10.0) -> None:
+    """
+    Останавливает задания этого процесса при остановке приложения: задачи отменяются
+    и успевают записать статус failed (уже пересчитанные пакеты сохраняются).
+    """
+    tasks = list(_running)
+    if not tasks:
+        return
+    for task in tasks:
+        task.cancel()
+    await asyncio.wait(tasks, timeout=timeout)
+
+
+async def fail_abandoned_jobs(db: AsyncSession, lease_seconds: float | None = None) -> int:
+    """
+    Помечает failed задания queued/running без обновлений дольше ADMIN_JOB_LEASE_SECONDS:
+    выполнявший их процесс убит или перезапущен (прогресс коммитится после каждого пакета,
+    поэтому updated_at работает как heartbeat). Вызывается при старте приложения.
+    Возвращает число помеченных заданий.
+    """
+    lease_seconds = settings.ADMIN_JOB_LEASE_SECONDS if lease_seconds is None else lease_seconds
+    now = datetime.now(timezone.utc)
+    result = await db.execute(
+        update(AdminJob)
+        .where(AdminJob.status.in_((QUEUED, RUNNING)))
+        .where(AdminJob.updated_at < now - timedelta(seconds=lease_seconds))
+        .values(status=FAILED, error=ABANDONED_ERROR, finished_at=now)
+        .returning(AdminJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    ids = result.scalars().all()
+    await db.commit()
+    if ids:
+        logger.warning(f"Задания без прогресса дольше {lease_seconds:.0f} с помечены failed: {ids}")
+    return len(ids)
+
+
+async def request_cancel(db: AsyncSession, job_id: int) -> AdminJob | None:
+    """
+    Помечает задание на отмену; выполняющий процесс остановится после текущего пакета
+    (уже пересчитанные пакеты сохраняются).
+    """
+    job = await db.get(AdminJob, job_id)
+    if job is None:
+        return None
+    if job.status not in FINISHED:
+        job.cancel_requested = True
+        await db.commit()
+        await db.refresh(job)
+    return job
+
+
+def job_progress(job: AdminJob, now: datetime | None = None) -> dict:
+    """
+    Прогресс (%), скорость (AP/с) и ETA (с) по счётчикам задания.
+    """
+    now = now or datetime.now(timezone.utc)
+    percent = rate = eta = None
+    if job.total is not None:
+        percent = round(100.0 * job.processed / job.total, 1) if job.total else 100.0
+    if job.started_at is not None:
+        elapsed = ((job.finished_at or now) - job.started_at).total_seconds()
+        if elapsed > 0:
+            rate = round(job.processed / elapsed, 1)
+        if job.status == RUNNING and rate and job.total is not None:
+            eta = round((job.total - job.processed) / rate, 1)
+    return {"progress_percent": percent, "aps_per_second": rate, "eta_seconds": eta}
@@ -0,0 +1,204 @@
+import logging
+import math
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.access_point import AccessPoint
+from app.db.models.ap_estimate import APEstimate
+from app.services.access_point import update_access_point_coords_bulk
+from app.services.geo_solver import rssi_to_distance
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "EstimatorState",
+    "apply_observations",
+]
+
+# Шум дальномера по RSSI: sigma = база + доля от расстояния (+ точность позиции снимка)
+RANGE_NOISE_BASE_M = 1.0
+RANGE_NOISE_REL = 0.3
+# Порог Huber-гейтинга инновации (в сигмах): выбросы не отбрасываются, а получают меньший вес
+GATE_SIGMA = 3.0
+# Начальная неопределённость по каждой оси, м (из accuracy AP, в этих пределах)
+INIT_STD_MIN_M = 2.0
+INIT_STD_MAX_M = 20.0
+# Те же пределы расстояния, что в filter_observations
+MAX_DISTANCE_M = 50.0
+
+# 8 параметров на строку upsert
+UPSERT_CHUNK_ROWS = 2000
+
+_TRIU = np.triu_indices(3)
+
+
+class EstimatorState:
+    """
+    Состояние онлайн-оценки положения AP (расширенный фильтр Калмана по дальностям RSSI):
+    x — координаты [3], P — ковариация [3, 3], n_obs — число учтённых наблюдений,
+    updated_at — время последнего обновления (unix-время) для затухания старых данных.
+    """
+    __slots__ = ("x", "P", "n_obs", "updated_at")
+
+    def __init__(self, x, P, n_obs: int = 0, updated_at: float | None = None):
+        self.x = np.asarray(x, dtype=float)
+        self.P = np.asarray(P, dtype=float)
+        self.n_obs = n_obs
+        self.updated_at = time.time() if updated_at is None else updated_at
+
+    @classmethod
+    def initial(cls, x: float, y: float, z: float, accuracy: float | None) -> "EstimatorState":
+        std = min(max(accuracy if accuracy is not None else INIT_STD_MAX_M, INIT_STD_MIN_M), INIT_STD_MAX_M)
+        return cls((x, y, z), np.eye(3) * std * std)
+
+    @classmethod
+    def from_model(cls, row: APEstimate) -> "EstimatorState":
+        P = np.zeros((3, 3))
+        P[_TRIU] = row.cov
+        P = P + np.triu(P, 1).T
+        return cls((row.x, row.y, row.z), P, row.n_obs, row.updated_at.timestamp())
+
+    @property
+    def std_m(self) -> float:
+        return math.sqrt(max(float(np.trace(self.P)), 0.0))
+
+    @property
+    def converged(self) -> bool:
+        return self.n_obs >= settings.AP_ESTIMATOR_MIN_OBS and self.std_m <= settings.AP_ESTIMATOR_MAX_STD_M
+
+    def to_row(self, ap_id: int) -> dict:
+        return {
+            "access_point_id": ap_id,
+            "x": float(self.x[0]),
+            "y": float(self.x[1]),
+            "z": float(self.x[2]),
+            "cov": [float(v) for v in self.P[_TRIU]],
+            "std_m": self.std_m,
+            "n_obs": self.n_obs,
+            "updated_at": datetime.fromtimestamp(self.updated_at, timezone.utc),
+        }
+
+    def predict(self, now: float) -> None:
+        """
+        Затухание: ковариация растёт со временем (AP могли передвинуть), поэтому новые
+        наблюдения весят больше старых. Шум процесса — AP_ESTIMATOR_PROCESS_NOISE_M2_PER_DAY.
+        """
+        dt_days = max(0.0, now - self.updated_at) / 86400
+        if dt_days > 0:
+            self.P = self.P + np.eye(3) * settings.AP_ESTIMATOR_PROCESS_NOISE_M2_PER_DAY * dt_days
+        self.updated_at = max(self.updated_at, now)
+
+    def update(self, position, distance: float, accuracy: float | None = None) -> bool:
+        """
+        Учитывает одно наблюдение (позиция снимка, расстояние по RSSI) за O(1).
+        Возвращает False, если наблюдение неинформативно (снимок в точке текущей оценки).
+        """
+        diff = self.x - np.asarray(position, dtype=float)
+        r = float(np.linalg.norm(diff))
+        if r < 1e-3:
+            return False
+        H = diff / r
+        sigma = RANGE_NOISE_BASE_M + RANGE_NOISE_REL * distance + (accuracy or 0.0)
+        R = sigma * sigma
+        PH = self.P @ H
+        HPH = float(H @ PH)
+        innovation = distance - r
+        S = HPH + R
+        if innovation * innovation > GATE_SIGMA * GATE_SIGMA * S:
+            # Huber: за порогом вес падает как 1/|инновация|
+            R *= abs(innovation) / (GATE_SIGMA * math.sqrt(S))
+            S = HPH + R
+        K = PH / S
+        self.x = self.x + K * innovation
+        P = self.P - np.outer(K, PH)
+        self.P = (P + P.T) / 2
+        self.n_obs += 1
+        return True
+
+
+async def apply_observations(db: AsyncSession, observations: list[tuple]) -> set[int]:
+    """
+    Обновляет онлайн-оценки AP по новым наблюдениям, O(1) на наблюдение.
+    observations: [(ap_id, (x, y, z) снимка, rssi, accuracy снимка | None), ...] — только снимки
+    того же здания, что и AP, с заданными координатами.
+    Недостающие состояния сначала вставляются (текущие координаты AP, ON CONFLICT DO NOTHING),
+    затем все читаются одним SELECT ... FOR UPDATE — одновременные загрузки не теряют обновления,
+    даже когда обе впервые видят AP; всё записывается одним upsert.
+    AP со сошедшейся оценкой сразу получают новые координаты (accuracy = std оценки).
+    Не коммитит. Возвращает id AP, чьи координаты обновлены.
+    """
+    usable = []
+    for ap_id, position, rssi, accuracy in observations:
+        distance = rssi_to_distance(rssi)
+        if 0 < distance < MAX_DISTANCE_M:
+            usable.append((ap_id, position, distance, accuracy))
+    if not usable:
+        return set()
+    ap_ids = sorted({ap_id for ap_id, *_ in usable})
+
+    # Сначала заводим недостающие состояния (ON CONFLICT DO NOTHING), и только потом блокируем:
+    # SELECT ... FOR UPDATE не блокирует ещё не существующие строки, и две загрузки, впервые
+    # увидевшие AP, начали бы каждая с начального состояния — upsert второй затёр бы первую
+    result = await db.execute(
+        select(AccessPoint.id, AccessPoint.x, AccessPoint.y, AccessPoint.z, AccessPoint.accuracy)
+        .outerjoin(APEstimate, APEstimate.access_point_id == AccessPoint.id)
+        .where(AccessPoint.id.in_(ap_ids), APEstimate.access_point_id.is_(None))
+    )
+    seeds = [
+        EstimatorState.initial(row.x, row.y, row.z, row.accuracy).to_row(row.id)
+        for row in result.all()
+    ]
+    for i in range(0, len(seeds), UPSERT_CHUNK_ROWS):
+        await db.execute(
+            pg_insert(APEstimate)
+            .values(seeds[i:i + UPSERT_CHUNK_ROWS])
+            .on_conflict_do_nothing(index_elements=[APEstimate.access_point_id])
+        )
+    result = await db.execute(
+        select(APEstimate)
+        .where(APEstimate.access_point_id.in_(ap_ids))
+        .order_by(APEstimate.access_point_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    states = {row.access_point_id: EstimatorState.from_model(row) for row in result.scalars().all()}
+
+    now = time.time()
+    changed = set()
+    for ap_id, position, distance, accuracy in usable:
+        state = states.get(ap_id)
+        if state is None:
+            continue
+        state.predict(now)
+        if state.update(position, distance, accuracy):
+            changed.add(ap_id)
+    if not changed:
+        return set()
+
+    rows = [states[ap_id].to_row(ap_id) for ap_id in sorted(changed)]
+    for i in range(0, len(rows), UPSERT_CHUNK_ROWS):
+        stmt = pg_insert(APEstimate).values(rows[i:i + UPSERT_CHUNK_ROWS])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[APEstimate.access_point_id],
+            set_={name: stmt.excluded[name] for name in ("x", "y", "z", "cov", "std_m", "n_obs", "updated_at")},
+        )
+        await db.execute(stmt)
+
+    converged = [ap_id for ap_id in sorted(changed) if states[ap_id].converged]
+    await update_access_point_coords_bulk(db, [
+        {
+            "id": ap_id,
+            "x": float(states[ap_id].x[0]),
+            "y": float(states[ap_id].x[1]),
+            "z": float(states[ap_id].x[2]),
+            "accuracy": states[ap_id].std_m,
+        }
+        for ap_id in converged
+    ])
+    return set(converged)
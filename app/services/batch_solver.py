@@ -0,0 +1,151 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "pack_observations",
+    "solve_batch",
+    "residual_accuracy",
+]
+
+# Параметры Huber-потерь — те же, что у scipy least_squares в weighted_least_squares_3d/_2d
+DEFAULT_F_SCALE = 2.0
+DEFAULT_MAX_ITER = 50
+
+
+def pack_observations(groups: list[tuple[list, list, list | None]], max_obs: int | None = None):
+    """
+    Упаковывает наблюдения многих AP в выровненные массивы для пакетного решателя.
+    groups: [(positions, distances, weights|None), ...] — по элементу на AP;
+        positions — [(x, y, z), ...] или [(x, y), ...] (z дополняется нулём).
+    Возвращает (P[B, K, 3], D[B, K], W[B, K], M[B, K]); M — маска реальных (не дополненных) наблюдений.
+    Веса по умолчанию, как в weighted_least_squares_3d: 1 / max(d, 1).
+    """
+    n = len(groups)
+    k = max_obs or max((len(g[1]) for g in groups), default=0)
+    P = np.zeros((n, k, 3))
+    D = np.zeros((n, k))
+    W = np.zeros((n, k))
+    M = np.zeros((n, k), dtype=bool)
+    for i, (positions, distances, weights) in enumerate(groups):
+        m = min(len(distances), k)
+        if m == 0:
+            continue
+        pos = np.asarray(positions[:m], dtype=float)
+        P[i, :m, :pos.shape[1]] = pos
+        D[i, :m] = distances[:m]
+        W[i, :m] = weights[:m] if weights is not None else 1.0 / np.clip(D[i, :m], 1.0, None)
+        M[i, :m] = True
+    return P, D, W, M
+
+
+def _huber_cost(r: np.ndarray, f_scale: float) -> np.ndarray:
+    # ρ(r) как у scipy loss='huber' (с точностью до множителя f_scale²): r² внутри, 2c|r| − c² снаружи
+    a = np.abs(r)
+    return np.where(a <= f_scale, r * r, 2 * f_scale * a - f_scale * f_scale).sum(axis=1)
+
+
+def _residuals(X, P, D, W, M, dim_mask):
+    diff = (X[:, None, :] - P) * dim_mask[:, None, :]
+    dist = np.linalg.norm(diff, axis=2)
+    r = np.where(M, W * (dist - D), 0.0)
+    return diff, dist, r
+
+
+def solve_batch(
+    positions: np.ndarray,
+    distances: np.ndarray,
+    weights: np.ndarray,
+    mask: np.ndarray,
+    dims: np.ndarray,
+    x0: np.ndarray | None = None,
+    f_scale: float = DEFAULT_F_SCALE,
+    max_iter: int = DEFAULT_MAX_ITER,
+    tol: float = 1e-6,
+):
+    """
+    Пакетная взвешенная мультилатерация (Левенберг–Марквардт + Huber через IRLS) для B точек доступа сразу.
+    Все итерации — векторные операции NumPy по всему пакету, якобиан аналитический.
+
+    positions: [B, K, 3] — координаты снимков, дополненные нулями до K;
+    distances, weights, mask: [B, K] — оценки расстояний по RSSI, веса и маска реальных наблюдений;
+    dims: [B] — 2 или 3: для 2D-задач z не участвует ни в расстояниях, ни в решении (остаётся из x0);
+    x0: [B, 3] — начальное приближение (по умолчанию взвешенный центр снимков).
+
+    Возвращает (X[B, 3], converged[B]). Для AP с числом наблюдений меньше dims результат — NaN.
+    """
+    P = np.asarray(positions, dtype=float)
+    D = np.asarray(distances, dtype=float)
+    W = np.asarray(weights, dtype=float)
+    M = np.asarray(mask, dtype=bool)
+    dims = np.asarray(dims)
+    n = P.shape[0]
+    if n == 0:
+        return np.zeros((0, 3)), np.zeros(0, dtype=bool)
+
+    dim_mask = np.ones((n, 3))
+    dim_mask[dims == 2, 2] = 0.0
+    W = np.where(M, W, 0.0)
+    if x0 is None:
+        wsum = W.sum(axis=1, keepdims=True)
+        x0 = (W[:, :, None] * P).sum(axis=1) / np.where(wsum > 0, wsum, 1.0)
+    X = np.array(x0, dtype=float)
+
+    diff, dist, r = _residuals(X, P, D, W, M, dim_mask)
+    cost = _huber_cost(r, f_scale)
+    lam = np.full(n, 1e-3)
+    converged = np.zeros(n, dtype=bool)
+    active = M.sum(axis=1) >= dims
+    eye = np.eye(3)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        # Якобиан r по X: w * (X − p) / |X − p|; в совпадающих с точкой снимка координатах — 0
+        safe = np.where(dist > 1e-9, dist, np.inf)
+        J = (W / safe)[:, :, None] * diff
+        # IRLS-веса Huber: 1 внутри f_scale, f_scale/|r| снаружи
+        h = np.where(M, np.minimum(1.0, f_scale / np.maximum(np.abs(r), 1e-12)), 0.0)
+        JTh = J.transpose(0, 2, 1) * h[:, None, :]
+        A = JTh @ J
+        g = (JTh @ r[:, :, None])[:, :, 0]
+        diag = np.diagonal(A, axis1=1, axis2=2)
+        # Демпфирование LM; неиспользуемая ось z в 2D-задачах закреплена единицей на диагонали
+        A_damped = A + (lam[:, None] * np.maximum(diag, 1e-9) + (1.0 - dim_mask))[:, :, None] * eye
+        try:
+            step = -np.linalg.solve(A_damped, g[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            step = -(np.linalg.pinv(A_damped) @ g[:, :, None])[:, :, 0]
+        step *= dim_mask
+        step[~active] = 0.0
+
+        X_new = X + step
+        diff_new, dist_new, r_new = _residuals(X_new, P, D, W, M, dim_mask)
+        cost_new = _huber_cost(r_new, f_scale)
+        accept = active & np.isfinite(cost_new) & (cost_new <= cost)
+
+        X[accept] = X_new[accept]
+        diff[accept], dist[accept], r[accept] = diff_new[accept], dist_new[accept], r_new[accept]
+        step_norm = np.linalg.norm(step, axis=1)
+        small = step_norm <= tol * (np.linalg.norm(X, axis=1) + tol)
+        converged |= active & (small | (accept & (cost - cost_new <= tol * np.maximum(cost, tol))))
+        cost[accept] = cost_new[accept]
+        lam = np.where(accept, np.maximum(lam / 3.0, 1e-12), np.minimum(lam * 4.0, 1e12))
+        active &= ~converged
+
+    X[M.sum(axis=1) < dims] = np.nan
+    return X, converged
+
+
+def residual_accuracy(X: np.ndarray, positions: np.ndarray, distances: np.ndarray, mask: np.ndarray, dims: np.ndarray) -> np.ndarray:
+    """
+    Средняя абсолютная невязка |‖X − p‖ − d| по реальным наблюдениям каждой AP (оценка точности, м).
+    """
+    dim_mask = np.ones((X.shape[0], 3), dtype=bool)
+    dim_mask[np.asarray(dims) == 2, 2] = False
+    dist = np.linalg.norm(np.where(dim_mask[:, None, :], X[:, None, :] - positions, 0.0), axis=2)
+    err = np.where(mask, np.abs(dist - distances), 0.0)
+    count = mask.sum(axis=1)
+    return err.sum(axis=1) / np.where(count > 0, count, 1)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.building import Building
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "BuildingInfo",
+    "BuildingRegistry",
+    "building_registry",
+]
+
+
+class BuildingInfo:
+    """
+    Неизменяемый снимок здания для горячего пути загрузки сканов.
+    cos_lat — заранее посчитанный cos(широты) для перевода lat/lon в локальные метры.
+    """
+    __slots__ = ("id", "lat", "lon", "cos_lat", "osm_id")
+
+    def __init__(self, id: int, lat: float | None, lon: float | None, osm_id: int | None):
+        self.id = id
+        self.lat = lat
+        self.lon = lon
+        self.osm_id = osm_id
+        self.cos_lat = math.cos(math.radians(lat)) if lat is not None else None
+
+    @classmethod
+    def from_model(cls, building: Building) -> "BuildingInfo":
+        return cls(building.id, building.lat, building.lon, building.osm_id)
+
+    @property
+    def has_coords(self) -> bool:
+        return self.lat is not None and self.lon is not None
+
+    def local_xy(self, lat: float, lon: float) -> tuple[float, float]:
+        """
+        Перевод широты/долготы в локальные метры относительно центра здания.
+        """
+        return (lon - self.lon) * self.cos_lat * 111320, (lat - self.lat) * 110574
+
+
+class BuildingRegistry:
+    """
+    Кэш зданий в памяти процесса (id → BuildingInfo):
+    - полностью перечитывается из БД раз в ttl секунд (изменения из других процессов);
+    - неизвестные id дочитываются одним SELECT и кэшируются;
+    - invalidate() сбрасывает кэш при изменении зданий в этом процессе.
+    """
+
+    def __init__(self, ttl: float = settings.BUILDING_REGISTRY_TTL_SECONDS):
+        self.ttl = ttl
+        self._by_id: dict[int, BuildingInfo] = {}
+        self._loaded_at: float | None = None
+        self._lock: asyncio.Lock | None = None
+
+    def invalidate(self, building_id: int | None = None) -> None:
+        """
+        Сбрасывает одно здание (или весь кэш, если building_id не задан).
+        """
+        if building_id is None:
+            self._by_id.clear()
+            self._loaded_at = None
+        else:
+            self._by_id.pop(building_id, None)
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    async def _reload(self, db: AsyncSession) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._is_stale():
+                return
+            result = await db.execute(
+                select(Building.id, Building.lat, Building.lon, Building.osm_id)
+            )
+            self._by_id = {row.id: BuildingInfo(row.id, row.lat, row.lon, row.osm_id) for row in result.all()}
+            self._loaded_at = time.monotonic()
+            logger.debug(f"Реестр зданий перечитан: {len(self._by_id)} зданий")
+
+    async def get_many(self, db: AsyncSession, ids: Iterable[int]) -> dict[int, BuildingInfo]:
+        """
+        Возвращает {id: BuildingInfo} для найденных зданий; отсутствующие в БД id пропускаются.
+        В установившемся режиме запросов к БД нет.
+        """
+        if self._is_stale():
+            await self._reload(db)
+        ids = {i for i in ids if i is not None}
+        missing = ids - self._by_id.keys()
+        if missing:
+            result = await db.execute(
+                select(Building.id, Building.lat, Building.lon, Building.osm_id).where(Building.id.in_(missing))
+            )
+            for row in result.all():
+                self._by_id[row.id] = BuildingInfo(row.id, row.lat, row.lon, row.osm_id)
+        return {i: self._by_id[i] for i in ids if i in self._by_id}
+
+    async def get(self, db: AsyncSession, building_id: int) -> BuildingInfo | None:
+        return (await self.get_many(db, [building_id])).get(building_id)
+
+
+# Общий реестр на процесс
+building_registry = BuildingRegistry()
@@ -3,11 +3,28 @@ from sqlalchemy import select, update, delete
 from app.db.models.floor_polygon import FloorPolygon
 from app.schemas.map import FloorPolygonCreate, FloorPolygonUpdate
 from sqlalchemy.exc import NoResultFound
+from app.core.config import settings
+from app.services.map_sync import KIND_FLOOR_POLYGON, record_map_deletions, touch_map_entity
+from app.utils.geometry import build_polygon_lods, pack_points
 
 async def get_floor_polygon(db: AsyncSession, polygon_id: int) -> FloorPolygon | None:
     result = await db.execute(select(FloorPolygon).where(FloorPolygon.id == polygon_id))
     return result.scalars().first()
 
+async def get_floor_polygon_points(db: AsyncSession, polygon_id: int) -> bytes | None:
+    """
+    Упакованный контур (N×3 little-endian float64) — байты из БД как есть; для записей
+    старого формата упаковывается из JSON. None, если полигона нет.
+    """
+    result = await db.execute(
+        select(FloorPolygon.polygon_packed, FloorPolygon.polygon_json).where(FloorPolygon.id == polygon_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    packed, legacy = row
+    return packed if packed is not None else pack_points(legacy or [])
+
 async def list_floor_polygons(db: AsyncSession, building_id: int | None = None) -> list[FloorPolygon]:
     stmt = select(FloorPolygon)
     if building_id is not None:
@@ -15,8 +32,16 @@ async def list_floor_polygons(db: AsyncSession, building_id: int | None = None)
     result = await db.execute(stmt.order_by(FloorPolygon.floor))
     return result.scalars().all()
 
+def polygon_lods(polygon: list) -> list[dict]:
+    """
+    Упрощённые варианты контура по допускам MAP_POLYGON_LOD_TOLERANCES_M (хранятся рядом с исходным).
+    """
+    return build_polygon_lods(polygon, settings.MAP_POLYGON_LOD_TOLERANCES_M)
+
 async def create_floor_polygon(db: AsyncSession, data: FloorPolygonCreate) -> FloorPolygon:
     polygon = FloorPolygon(**data.dict())
+    polygon.polygon_lods = polygon_lods(polygon.polygon)
+    touch_map_entity(db, polygon)
     db.add(polygon)
     await db.commit()
     await db.refresh(polygon)
@@ -26,8 +51,10 @@ async def update_floor_polygon(db: AsyncSession, polygon_id: int, data: FloorPol
     polygon = await get_floor_polygon(db, polygon_id)
     if not polygon:
         raise NoResultFound(f"FloorPolygon id={polygon_id} not found")
+    touch_map_entity(db, polygon)
     for k, v in data.dict(exclude_unset=True).items():
         setattr(polygon, k, v)
+    polygon.polygon_lods = polygon_lods(polygon.polygon)
     await db.commit()
     await db.refresh(polygon)
     return polygon
@@ -36,5 +63,6 @@ async def delete_floor_polygon(db: AsyncSession, polygon_id: int) -> None:
     polygon = await get_floor_polygon(db, polygon_id)
     if not polygon:
         raise NoResultFound(f"FloorPolygon id={polygon_id} not found")
+    record_map_deletions(db, KIND_FLOOR_POLYGON, [(polygon.id, polygon.building_id)])
     await db.delete(polygon)
     await db.commit()
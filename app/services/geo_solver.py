@@ -1,6 +1,7 @@
 import math
 import logging
-from sqlalchemy import select, update, inspect as sqlalchemy_inspect
+import numpy as np
+from sqlalchemy import select, update, func, inspect as sqlalchemy_inspect
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, joinedload, contains_eager # Modified import
 import sqlalchemy.exc
@@ -9,6 +10,11 @@ import sqlalchemy.orm.attributes # Added import
 from app.db.models.access_point import AccessPoint
 from app.db.models.wifi_obs import WiFiObs
 from app.db.models.wifi_snapshot import WiFiSnapshot
+from app.db.models.ap_estimate import APEstimate
+from app.core.config import settings
+from app.services.observation_loader import load_latest_observations
+from app.services.access_point import AP_UPDATE_CHUNK_ROWS, update_access_point_coords_bulk
+from app.services.solver_executor import solver_executor
 
 logger = logging.getLogger(__name__)
 
@@ -72,136 +78,171 @@ def trilaterate_3d(positions, distances):
         logger.error(f"Ошибка при триангуляции 3D: {e}")
         raise ValueError("Ошибка при решении системы")
 
-async def update_access_point_positions(db: AsyncSession):
+async def update_access_point_positions(db: AsyncSession, full: bool = False, progress=None, recalc_log=None) -> dict:
     """
-    Пересчитывает координаты ВСЕХ стационарных точек доступа (глобальная периодическая триангуляция).
-    Формирует подробный лог по каждой AP: статус, причина, изменение точности и координат.
+    Пересчитывает координаты стационарных точек доступа (глобальная периодическая триангуляция).
+    Берутся только AP с новыми наблюдениями после прошлого решения (watermark solved_obs_id)
+    и без сошедшейся онлайн-оценки (ap_estimator); full=True — пересчитать все (ремонт/аудит).
+    Наблюдения загружаются одним запросом (observation_loader), затем задачи решаются
+    пакетами по GEO_SOLVER_BATCH_SIZE движком solver_engine (стратегия — по зданию AP);
+    каждый пакет коммитится отдельно, поэтому прерванный пересчёт не теряет сделанное.
+    progress — async-колбэк со сводкой {"total", "processed", "solved", "failed"} после каждого
+    пакета (может прервать пересчёт исключением); recalc_log — приёмник компактного лога по AP
+    (метод write(entries), формат записей — в _solve_and_update_batch).
+    Возвращает сводку: {"stationary", "skipped", "solved", "failed"}.
     """
-    logger.info("Начинаем обновление координат всех AP (3D)")
-    # Получаем все стационарные AP для массового пересчёта
-    result = await db.execute(
-        select(AccessPoint).where(AccessPoint.is_mobile == False)
-    )
+    logger.info("Начинаем обновление координат AP (3D)")
+    # Watermark фиксируем до чтения: всё, что придёт позже, попадёт в следующий запуск
+    watermark = (await db.execute(select(func.max(WiFiObs.id)))).scalar() or 0
+    stationary = AccessPoint.is_mobile == False
+    total_stationary = (await db.execute(select(func.count()).select_from(AccessPoint).where(stationary))).scalar_one()
+    candidates = select(AccessPoint.id).where(stationary)
+    if not full:
+        candidates = candidates.where(pending_recompute_condition())
+    result = await db.execute(select(AccessPoint).where(AccessPoint.id.in_(candidates)))
     aps_to_update = result.scalars().all()
-    total_aps = len(aps_to_update)
-    ap_recalc_log = []
-    for idx, ap in enumerate(aps_to_update, 1):
-        if total_aps > 0 and idx % max(1, total_aps // 100) == 0:
-            percent = int(idx / total_aps * 100)
-            logger.info(f"Прогресс: {percent}% ({idx}/{total_aps})")
-        ap_log = {
-            "bssid": ap.bssid,
-            "id": ap.id,
-            "old_coords": (ap.x, ap.y, ap.z),
-            "old_accuracy": ap.accuracy,
-            "status": None,
-            "reason": None,
-            "new_coords": None,
-            "new_accuracy": None,
-            "accuracy_delta": None
-        }
-        # logger.info(f"Анализ AP: {ap.bssid} для update_access_point_positions")
-
-        stmt = (
-            select(WiFiObs)
-            .join(WiFiSnapshot, WiFiObs.snapshot_id == WiFiSnapshot.id)
-            .where(WiFiObs.access_point_id == ap.id)
-            .where(
-                (WiFiSnapshot.building_id == ap.building_id) &
-                (WiFiSnapshot.x.is_not(None)) &
-                (WiFiSnapshot.y.is_not(None)) &
-                (WiFiSnapshot.z.is_not(None))
-            )
-            .order_by(WiFiSnapshot.timestamp.desc())
-            .limit(15)
-        )
-        result = await db.execute(stmt)
-        observations_list = result.scalars().all()
-        processed_observations_data = []
-        if observations_list:
-            for obs_item in observations_list:
-                try:
-                    if obs_item.snapshot is None:
-                        logger.warning(f"WiFiObs {obs_item.id} has None snapshot after access for AP {ap.bssid}.")
-                        continue
-                    if obs_item.snapshot.x is not None and obs_item.snapshot.y is not None and obs_item.snapshot.z is not None:
-                        distance = rssi_to_distance(obs_item.rssi)
-                        processed_observations_data.append(
-                            ((obs_item.snapshot.x, obs_item.snapshot.y, obs_item.snapshot.z), distance)
-                        )
-                    else:
-                        logger.debug(f"Snapshot ID {obs_item.snapshot.id} for Obs {obs_item.id} (AP {ap.bssid}) lacks full coordinates.")
-                except Exception as e:
-                    logger.error(f"Unexpected error for WiFiObs {obs_item.id} (AP {ap.bssid}) in update_access_point_positions: {e}")
-                    continue
-        positions = [data[0] for data in processed_observations_data]
-        distances = [data[1] for data in processed_observations_data]
-        filtered = filter_observations(positions, distances)
-        try:
-            if len(filtered) >= 4:
-                f_positions, f_distances = zip(*filtered)
-                new_coords = weighted_least_squares_3d(f_positions, f_distances)
-                old_coords = (ap.x, ap.y, ap.z)
-                x_new, y_new, z_new = smooth_coordinates(old_coords, new_coords, alpha=0.5)
-                import numpy as np
-                est_point = np.array([x_new, y_new, z_new])
-                pred_dists = [np.linalg.norm(est_point - np.array(pos)) for pos in f_positions]
-                accuracy = float(np.mean([abs(pd - dd) for pd, dd in zip(pred_dists, f_distances)]))
-                await db.execute(
-                    update(AccessPoint)
-                    .where(AccessPoint.id == ap.id)
-                    .values(x=x_new, y=y_new, z=z_new, accuracy=accuracy if accuracy is not None else 9999.0)
-                )
-                ap_log["status"] = "пересчитана"
-                ap_log["reason"] = "3D multilateration"
-                ap_log["new_coords"] = (x_new, y_new, z_new)
-                ap_log["new_accuracy"] = accuracy
-                ap_log["accuracy_delta"] = (ap.accuracy - accuracy) if (ap.accuracy is not None and accuracy is not None) else None
-                # logger.info(f"Обновляем координаты AP {ap.bssid} (3D): ({x_new:.2f}, {y_new:.2f}, {z_new:.2f}), accuracy={accuracy:.2f} м")
+    # Последние наблюдения выбранных AP — одним запросом с row_number() OVER (PARTITION BY ...)
+    observations = await load_latest_observations(db, ap_ids=candidates) if aps_to_update else {}
+
+    # Итоги копятся счётчиками, лог по каждой AP уходит в recalc_log пакетами
+    stats = {"total": len(aps_to_update), "processed": 0, "solved": 0, "failed": 0}
+    delta_sum, delta_count = 0.0, 0
+    max_old_accuracy = max((ap.accuracy for ap in aps_to_update if ap.accuracy), default=0.0)
+    if progress is not None:
+        await progress(dict(stats))
+    batch_size = max(1, settings.GEO_SOLVER_BATCH_SIZE)
+    for start in range(0, len(aps_to_update), batch_size):
+        batch = aps_to_update[start:start + batch_size]
+        entries = await recompute_batch(db, batch, observations, watermark)
+        for ap, entry in zip(batch, entries):
+            if entry[1] == SOLVED_ENTRY:
+                stats["solved"] += 1
+                if ap.accuracy is not None:
+                    delta_sum += ap.accuracy - entry[3]
+                    delta_count += 1
             else:
-                filtered_2d = [((x, y), d) for (x, y, z), d in filtered if x is not None and y is not None]
-                if len(filtered_2d) >= 3:
-                    f2d_positions, f2d_distances = zip(*filtered_2d)
-                    x_new, y_new = weighted_least_squares_2d(f2d_positions, f2d_distances)
-                    old_coords = (ap.x, ap.y)
-                    x_new, y_new = smooth_coordinates(old_coords, (x_new, y_new), alpha=0.5)
-                    est_point = np.array([x_new, y_new])
-                    pred_dists = [np.linalg.norm(est_point - np.array(pos)) for pos in f2d_positions]
-                    accuracy = float(np.mean([abs(pd - dd) for pd, dd in zip(pred_dists, f2d_distances)]))
-                    await db.execute(
-                        update(AccessPoint)
-                        .where(AccessPoint.id == ap.id)
-                        .values(x=x_new, y=y_new, accuracy=accuracy if accuracy is not None else 9999.0)
-                    )
-                    ap_log["status"] = "пересчитана"
-                    ap_log["reason"] = "2D multilateration"
-                    ap_log["new_coords"] = (x_new, y_new, ap.z)
-                    ap_log["new_accuracy"] = accuracy
-                    ap_log["accuracy_delta"] = (ap.accuracy - accuracy) if (ap.accuracy is not None and accuracy is not None) else None
-                    # logger.info(f"Обновляем координаты AP {ap.bssid} (2D): ({x_new:.2f}, {y_new:.2f}), accuracy={accuracy:.2f} м")
-                else:
-                    ap_log["status"] = "не пересчитана"
-                    ap_log["reason"] = f"Недостаточно валидных данных для 2D/3D оптимизации (есть {len(filtered)})"
-        except Exception as e:
-            ap_log["status"] = "не пересчитана"
-            ap_log["reason"] = f"Ошибка оптимизации: {e}"
-            logger.warning(f"Не удалось уточнить координаты AP {ap.bssid}: {e}")
-        ap_recalc_log.append(ap_log)
-    await db.commit()
-    logger.info("Обновление координат завершено (3D/2D, WLS)")
+                stats["failed"] += 1
+        stats["processed"] += len(batch)
+        if recalc_log is not None:
+            recalc_log.write(entries)
+        logger.info(f"Обработано AP: {stats['processed']}/{stats['total']}")
+        if progress is not None:
+            await progress(dict(stats))
+    logger.info("Обновление координат завершено (3D/2D)")
     # Итоговый summary-лог по массовому пересчёту AP
-    total = len(ap_recalc_log)
-    success = sum(1 for entry in ap_recalc_log if entry["status"] == "пересчитана")
-    failed = total - success
-    # Считаем среднее улучшение точности только для успешно пересчитанных
-    deltas = [entry["accuracy_delta"] for entry in ap_recalc_log if entry["status"] == "пересчитана" and entry["accuracy_delta"] is not None]
-    percent_improvement = (sum(deltas) / len(deltas) / max([entry["old_accuracy"] for entry in ap_recalc_log if entry["old_accuracy"]]) * 100) if deltas else 0.0
+    total, success, failed = stats["total"], stats["solved"], stats["failed"]
+    # Среднее улучшение точности — только по успешно пересчитанным
+    percent_improvement = (delta_sum / delta_count / max_old_accuracy * 100) if delta_count and max_old_accuracy else 0.0
     logger.info(f"Массовый пересчёт AP: успешно {success}/{total}, неуспешно {failed}/{total}, среднее улучшение точности: {percent_improvement:.2f}%")
+    summary = {"stationary": total_stationary, "skipped": total_stationary - total, "solved": success, "failed": failed}
+    logger.info(f"Пропущено AP без новых данных или со сошедшейся онлайн-оценкой: {summary['skipped']}/{total_stationary}")
+    return summary
+
+async def recompute_batch(db: AsyncSession, batch: list, observations: dict, watermark: int) -> list[list]:
+    """
+    Пересчитывает пакет AP, записывает координаты и watermark solved_obs_id одной транзакцией (коммитит).
+    Возвращает компактный лог по AP (см. _solve_and_update_batch).
+    """
+    entries = await _solve_and_update_batch(db, [(ap, observations.get(ap.id)) for ap in batch])
+    # Рассмотренные AP (в т.ч. с недостатком данных) ждут новых наблюдений после watermark
+    ids = [ap.id for ap in batch]
+    for start in range(0, len(ids), AP_UPDATE_CHUNK_ROWS):
+        await db.execute(
+            update(AccessPoint)
+            .where(AccessPoint.id.in_(ids[start:start + AP_UPDATE_CHUNK_ROWS]))
+            # last_update не трогаем: координаты AP не менялись
+            .values(solved_obs_id=watermark, last_update=AccessPoint.last_update)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    return entries
+
+def pending_recompute_condition():
+    """
+    AP ждёт пересчёта: есть наблюдения новее watermark и нет сошедшейся онлайн-оценки (ap_estimator).
+    """
+    condition = stale_access_points_condition()
+    if settings.AP_ESTIMATOR_ENABLED:
+        condition = condition & AccessPoint.id.not_in(
+            select(APEstimate.access_point_id).where(
+                (APEstimate.n_obs >= settings.AP_ESTIMATOR_MIN_OBS) &
+                (APEstimate.std_m <= settings.AP_ESTIMATOR_MAX_STD_M)
+            )
+        )
+    return condition
+
+def stale_access_points_condition():
+    """
+    Условие «у AP есть наблюдения новее watermark solved_obs_id» (EXISTS по индексу
+    wifi_observations(access_point_id, id)); AP без watermark считаются новыми.
+    """
+    return (
+        select(WiFiObs.id)
+        .where(WiFiObs.access_point_id == AccessPoint.id)
+        .where(WiFiObs.id > func.coalesce(AccessPoint.solved_obs_id, 0))
+        .exists()
+    )
+
+# Статусы в компактном логе пересчёта: [ap_id, статус, старая accuracy, новая accuracy, сдвиг, м]
+SOLVED_ENTRY = "s"
+SKIPPED_ENTRY = "n"
+FAILED_ENTRY = "f"
+
+async def _solve_and_update_batch(db: AsyncSession, problems: list) -> list[list]:
+    """
+    Решает пакет AP движком solver_engine (стратегия — по зданию AP) в пуле solver_executor и записывает результат
+    в БД одним запросом. problems: [(ap, наблюдения), ...].
+    Возвращает компактный лог по каждой AP: [ap_id, статус, старая accuracy, новая accuracy, сдвиг, м].
+    """
+    from app.services.solver_engine import solve_access_points
+
+    # Расчёт — в пуле решателя, чтобы не блокировать event loop
+    results = await solver_executor.run(
+        solve_access_points, [(ap.id, ap.building_id, (ap.x, ap.y, ap.z), obs) for ap, obs in problems]
+    )
+    rows = []
+    entries = []
+    for (ap, _), res in zip(problems, results):
+        if not res.solved:
+            if res.status == "failed":
+                logger.warning(f"Не удалось уточнить координаты AP {ap.bssid}: {res.reason}")
+            entries.append([ap.id, FAILED_ENTRY if res.status == "failed" else SKIPPED_ENTRY, ap.accuracy, None, None])
+            continue
+        x_new, y_new = res.coords[0], res.coords[1]
+        # z у 2D-задач не пересчитывается
+        z_new = res.coords[2] if res.dim == 3 else ap.z
+        rows.append({"id": ap.id, "x": x_new, "y": y_new, "z": z_new, "accuracy": res.accuracy})
+        moved = (
+            math.dist((ap.x, ap.y, ap.z or 0.0), (x_new, y_new, z_new or 0.0))
+            if ap.x is not None and ap.y is not None else None
+        )
+        entries.append([
+            ap.id, SOLVED_ENTRY, ap.accuracy, round(res.accuracy, 3),
+            round(moved, 3) if moved is not None else None,
+        ])
+    # Результаты пакета — одним UPDATE ... FROM (VALUES ...)
+    await update_access_point_coords_bulk(db, rows)
+    return entries
+
+async def _write_coords(db: AsyncSession, ap: AccessPoint, x: float, y: float, z: float, accuracy: float | None) -> None:
+    """
+    Записывает пересчитанные координаты одной AP (с тем же допуском AP_WRITE_TOLERANCE_M, что и массовый пересчёт).
+    """
+    await update_access_point_coords_bulk(db, [{
+        "id": ap.id,
+        "x": float(x),
+        "y": float(y),
+        "z": float(z) if z is not None else None,
+        "accuracy": accuracy if accuracy is not None else 9999.0,
+    }])
 
 async def recalculate_access_point_coords(bssid: str, db: AsyncSession):
     """
-    Пересчитывает координаты только одной точки доступа по bssid.
+    Пересчитывает координаты только одной точки доступа по bssid — тем же движком
+    (solver_engine) и с теми же наблюдениями, что и массовый пересчёт.
     """
+    from app.services.solver_engine import solve_access_points
+
     result = await db.execute(
         select(AccessPoint).where(AccessPoint.bssid == bssid)
     )
@@ -210,148 +251,23 @@ async def recalculate_access_point_coords(bssid: str, db: AsyncSession):
         logger.info(f"AP {bssid} не найден или является мобильной, пересчёт не требуется")
         return
 
-    logger.info(f"Начинаем пересчёт координат для AP: {ap.bssid}") # Added logging
-    stmt = (
-        select(WiFiObs)
-        .join(WiFiSnapshot, WiFiObs.snapshot_id == WiFiSnapshot.id)
-        .where(WiFiObs.access_point_id == ap.id)
-        .where(
-            (WiFiSnapshot.building_id == ap.building_id) &
-            (WiFiSnapshot.x.is_not(None)) & (WiFiSnapshot.y.is_not(None)) & (WiFiSnapshot.z.is_not(None))
-        )
-        .order_by(WiFiSnapshot.timestamp.desc())
-        .limit(15)
+    logger.info(f"Начинаем пересчёт координат для AP: {ap.bssid}")
+    observations = await load_latest_observations(db, ap_ids=[ap.id])
+    res, = await solver_executor.run(
+        solve_access_points, [(ap.id, ap.building_id, (ap.x, ap.y, ap.z), observations.get(ap.id))]
     )
-    result = await db.execute(stmt)
-    observations_list = result.scalars().all()
-    processed_observations_data = []
-    snapshot_accuracies = []
-    if observations_list:
-        for obs_item in observations_list:
-            try:
-                obs_accuracy = None
-                if hasattr(obs_item.snapshot, 'accuracy') and obs_item.snapshot.accuracy is not None:
-                    obs_accuracy = obs_item.snapshot.accuracy
-                    snapshot_accuracies.append(obs_accuracy)
-                if obs_item.snapshot.x is not None and obs_item.snapshot.y is not None and obs_item.snapshot.z is not None:
-                    distance = rssi_to_distance(obs_item.rssi)
-                    processed_observations_data.append(
-                        ((obs_item.snapshot.x, obs_item.snapshot.y, obs_item.snapshot.z), distance, obs_accuracy)
-                    )
-                else:
-                    logger.debug(f"Snapshot ID {obs_item.snapshot.id} for Obs {obs_item.id} (AP {bssid}) lacks full coordinates (x,y,z).")
-            except Exception as e:
-                logger.error(f"Unexpected error for WiFiObs {obs_item.id} (AP {bssid}) in recalculate_access_point_coords: {e}")
-                raise
-    
-    # Новый формат: позиции, расстояния, точности
-    positions = [data[0] for data in processed_observations_data]
-    distances = [data[1] for data in processed_observations_data]
-    accuracies = [data[2] if data[2] is not None else 10.0 for data in processed_observations_data]
-    import numpy as np
-    logger.info(f"AP {bssid}: used positions={positions}, distances={distances}, accuracies={accuracies}")
-    if len(positions) >= 4:
-        # Веса: чем хуже accuracy или больше distance, тем меньше вес
-        weights = []
-        for acc, dist in zip(accuracies, distances):
-            w_acc = 1.0 / max(acc, 1.0) if acc is not None else 0.1
-            w_dist = 1.0 / max(dist, 1.0) if dist < 200.0 else 0.01
-            weights.append(w_acc * w_dist)
-        logger.info(f"AP {bssid}: weights={weights}")
-        try:
-            # --- robust multilateration (RANSAC + NLS) ---
-            new_coords, inliers = robust_multilateration_3d(positions, distances, weights=weights, n_iter=50, min_inliers=4, threshold=5.0)
-            logger.info(f"AP {bssid}: robust multilateration inliers: {inliers}")
-            old_coords = (ap.x, ap.y, ap.z)
-            x_new, y_new, z_new = smooth_coordinates(old_coords, new_coords, alpha=0.5)
-            est_point = np.array([x_new, y_new, z_new])
-            pred_dists = [np.linalg.norm(est_point - np.array(positions[i])) for i in inliers]
-            inlier_distances = [distances[i] for i in inliers]
-            accuracy = float(np.mean([abs(pd - dd) for pd, dd in zip(pred_dists, inlier_distances)]))
-            valid_snapshot_accuracies = [accuracies[i] for i in inliers if accuracies[i] is not None and accuracies[i] < 100.0]
-            if (accuracy is None or accuracy > 1000.0) and valid_snapshot_accuracies:
-                accuracy = float(min(valid_snapshot_accuracies))
-                logger.info(f"Fallback: используем минимальную snapshot accuracy для AP {bssid}: {accuracy:.2f} м")
-            await db.execute(
-                update(AccessPoint)
-                .where(AccessPoint.id == ap.id)
-                .values(x=x_new, y=y_new, z=z_new, accuracy=accuracy if accuracy is not None else 9999.0)
-            )
-        except Exception as e:
-            logger.warning(f"Ошибка при robust уточнении координат AP {bssid} (3D): {e}")
-            # fallback на старый метод
-            try:
-                new_coords = weighted_least_squares_3d(positions, distances, weights=weights)
-                old_coords = (ap.x, ap.y, ap.z)
-                x_new, y_new, z_new = smooth_coordinates(old_coords, new_coords, alpha=0.5)
-                est_point = np.array([x_new, y_new, z_new])
-                pred_dists = [np.linalg.norm(est_point - np.array(pos)) for pos in positions]
-                accuracy = float(np.mean([abs(pd - dd) for pd, dd in zip(pred_dists, distances)]))
-                valid_snapshot_accuracies = [a for a in snapshot_accuracies if a is not None and a < 100.0]
-                if (accuracy is None or accuracy > 1000.0) and valid_snapshot_accuracies:
-                    accuracy = float(min(valid_snapshot_accuracies))
-                    logger.info(f"Fallback: используем минимальную snapshot accuracy для AP {bssid}: {accuracy:.2f} м")
-                await db.execute(
-                    update(AccessPoint)
-                    .where(AccessPoint.id == ap.id)
-                    .values(x=x_new, y=y_new, z=z_new, accuracy=accuracy if accuracy is not None else 9999.0)
-                )
-            except Exception as e2:
-                logger.warning(f"Ошибка при уточнении координат AP {bssid} (3D, fallback): {e2}")
-    else:
-        filtered_2d = [((x, y), d) for (x, y, z), d in zip(positions, distances) if x is not None and y is not None]
-        if len(filtered_2d) >= 3:
-            f2d_positions, f2d_distances = zip(*filtered_2d)
-            f2d_accuracies = [accuracies[i] for i, ((x, y), d) in enumerate(filtered_2d)]
-            weights2d = []
-            for acc, dist in zip(f2d_accuracies, f2d_distances):
-                w_acc = 1.0 / max(acc, 1.0) if acc is not None else 0.1
-                w_dist = 1.0 / max(dist, 1.0) if dist < 200.0 else 0.01
-                weights2d.append(w_acc * w_dist)
-            logger.info(f"AP {bssid}: weights2d={weights2d}")
-            try:
-                x_new, y_new = weighted_least_squares_2d(f2d_positions, f2d_distances, weights=weights2d)
-                old_coords = (ap.x, ap.y)
-                x_new, y_new = smooth_coordinates(old_coords, (x_new, y_new), alpha=0.5)
-                est_point = np.array([x_new, y_new])
-                pred_dists = [np.linalg.norm(est_point - np.array(pos)) for pos in f2d_positions]
-                accuracy = float(np.mean([abs(pd - dd) for pd, dd in zip(pred_dists, f2d_distances)]))
-                valid_snapshot_accuracies = [a for a in snapshot_accuracies if a is not None and a < 100.0]
-                if (accuracy is None or accuracy > 1000.0) and valid_snapshot_accuracies:
-                    accuracy = float(min(valid_snapshot_accuracies))
-                    logger.info(f"Fallback: используем минимальную snapshot accuracy для AP {bssid}: {accuracy:.2f} м")
-                await db.execute(
-                    update(AccessPoint)
-                    .where(AccessPoint.id == ap.id)
-                    .values(x=x_new, y=y_new, accuracy=accuracy if accuracy is not None else 9999.0)
-                )
-            except Exception as e:
-                logger.warning(f"Ошибка при уточнении координат AP {bssid} (2D): {e}")
-        else:
-            logger.info(f"Недостаточно валидных данных для 2D/3D оптимизации AP {bssid} (есть {len(filtered_2d)})")
-
-import httpx
-
-async def reverse_geocode_osm(lat: float, lon: float) -> dict:
-    """
-    Асинхронно получает информацию о здании по координатам через OSM Nominatim.
-    """
-    url = "https://nominatim.openstreetmap.org/reverse"
-    params = {
-        "format": "jsonv2",
-        "lat": lat,
-        "lon": lon,
-        "addressdetails": 1,
-        "extratags": 1,
-        "zoom": 18
-    }
-    headers = {
-        "User-Agent": "navigation-diploma/1.0"
-    }
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, params=params, headers=headers, timeout=10)
-        resp.raise_for_status()
-        return resp.json()
+    if not res.solved:
+        log = logger.warning if res.status == "failed" else logger.info
+        log(f"AP {bssid} не пересчитана ({res.strategy}): {res.reason}")
+        return
+    logger.info(
+        f"AP {bssid}: {res.dim}D {res.strategy}, наблюдений {res.n_obs}, inliers {res.inliers}, "
+        f"accuracy {res.accuracy:.2f} м, {res.elapsed_ms:.1f} мс"
+    )
+    z_new = res.coords[2] if res.dim == 3 else ap.z
+    await _write_coords(db, ap, res.coords[0], res.coords[1], z_new, res.accuracy)
+
+from app.utils.geo_utils import reverse_geocode_osm
 
 import numpy as np
 from numpy.linalg import lstsq
@@ -418,63 +334,96 @@ def smooth_coordinates(old_coords, new_coords, alpha=0.5):
         return new_coords
     return tuple(alpha * n + (1 - alpha) * o for o, n in zip(old_coords, new_coords))
 
-from random import sample
+# Размер минимальной выборки линейного решателя (3 разностных уравнения после вычитания первого)
+RANSAC_SAMPLE_SIZE = 4
+# Гипотез за одну векторную итерацию RANSAC
+RANSAC_BATCH = 16
+
+def _linear_minimal_solve(P: np.ndarray, D: np.ndarray) -> np.ndarray:
+    """
+    Линеаризованная мультилатерация (как trilaterate_3d) сразу для H выборок.
+    P: [H, m, 3], D: [H, m] → центры [H, 3]; вырожденные выборки дают NaN.
+    """
+    # |x − p_1|² − |x − p_i|² = d_1² − d_i²  ⇒  2(p_i − p_1)·x = d_1² − d_i² + |p_i|² − |p_1|²
+    A = 2 * (P[:, 1:, :] - P[:, :1, :])
+    b = (
+        D[:, :1] ** 2 - D[:, 1:] ** 2
+        + (P[:, 1:, :] ** 2).sum(axis=2) - (P[:, :1, :] ** 2).sum(axis=2)
+    )
+    # Псевдообратная по стопке: устойчива к вырожденным (например, плоским) выборкам
+    X = (np.linalg.pinv(A) @ b[:, :, None])[:, :, 0]
+    X[~np.isfinite(X).all(axis=1)] = np.nan
+    return X
 
-def robust_multilateration_3d(positions, distances, weights=None, n_iter=50, min_inliers=4, threshold=5.0):
+def robust_multilateration_3d(
+    positions,
+    distances,
+    weights=None,
+    n_iter=50,
+    min_inliers=4,
+    threshold=5.0,
+    confidence=0.99,
+    seed=0,
+):
     """
     RANSAC + NLS для устойчивого multilateration.
     positions: [(x, y, z), ...]
     distances: [d1, d2, ...]
     weights: [w1, w2, ...] (опционально)
     threshold: максимальное отклонение (м) для inlier
+    n_iter: верхняя граница числа гипотез; фактически RANSAC останавливается, как только
+        при текущей доле inliers достигнута вероятность confidence найти чистую выборку.
+    seed: зерно генератора выборок (одинаковые данные — одинаковый результат).
+    Гипотезы строятся линейным минимальным решателем по 4 точкам и оцениваются все сразу
+    одной матрицей невязок; нелинейная оптимизация — только финальная, по inliers.
     Возвращает: best_coords, best_inliers
     """
-    import numpy as np
-    from scipy.optimize import least_squares
-    n = len(positions)
-    if n < min_inliers:
+    P = np.asarray(positions, dtype=float)
+    D = np.asarray(distances, dtype=float)
+    n = len(P)
+    if n < min_inliers or n < RANSAC_SAMPLE_SIZE:
         raise ValueError("Недостаточно данных для robust multilateration")
-    best_inliers = []
-    best_coords = None
+    rng = np.random.default_rng(seed)
+    best_count = 0
     best_loss = float('inf')
-    idxs = list(range(n))
-    for _ in range(n_iter):
-        try:
-            subset = sample(idxs, min_inliers)
-            pos_sub = [positions[i] for i in subset]
-            dist_sub = [distances[i] for i in subset]
-            w_sub = [weights[i] for i in subset] if weights is not None else None
-            # NLS на подмножестве
-            def residuals(x):
-                dists = np.linalg.norm(np.array(pos_sub) - x, axis=1)
-                if w_sub is not None:
-                    return np.array(w_sub) * (dists - np.array(dist_sub))
-                return dists - np.array(dist_sub)
-            x0 = np.mean(pos_sub, axis=0)
-            res = least_squares(residuals, x0, loss='huber', f_scale=2.0)
-            candidate = res.x
-            # Проверяем inliers на всех данных
-            dists_all = np.linalg.norm(np.array(positions) - candidate, axis=1)
-            errors = np.abs(dists_all - np.array(distances))
-            inliers = [i for i, err in enumerate(errors) if err < threshold]
-            loss = np.mean(errors[inliers]) if inliers else float('inf')
-            if len(inliers) > len(best_inliers) or (len(inliers) == len(best_inliers) and loss < best_loss):
-                best_inliers = inliers
-                best_coords = candidate
-                best_loss = loss
-        except Exception as e:
-            continue
-    if not best_inliers:
+    best_coords = None
+    best_mask = None
+    required = n_iter
+    done = 0
+    while done < min(n_iter, required):
+        h = min(RANSAC_BATCH, n_iter - done)
+        # h случайных выборок по 4 различных индекса
+        subsets = np.argsort(rng.random((h, n)), axis=1)[:, :RANSAC_SAMPLE_SIZE]
+        candidates = _linear_minimal_solve(P[subsets], D[subsets])
+        done += h
+        # Матрица невязок [h, n]: все гипотезы против всех наблюдений
+        errors = np.abs(np.linalg.norm(P[None, :, :] - candidates[:, None, :], axis=2) - D[None, :])
+        inliers = errors < threshold  # NaN-гипотезы дают False
+        counts = inliers.sum(axis=1)
+        losses = np.where(counts > 0, np.where(inliers, errors, 0.0).sum(axis=1) / np.maximum(counts, 1), np.inf)
+        order = np.lexsort((losses, -counts))
+        k = order[0]
+        if counts[k] > best_count or (counts[k] == best_count and counts[k] > 0 and losses[k] < best_loss):
+            best_count, best_loss = int(counts[k]), float(losses[k])
+            best_coords, best_mask = candidates[k], inliers[k]
+            # Адаптивное число итераций: log(1 − conf) / log(1 − w⁴)
+            w = best_count / n
+            if w >= 1.0:
+                required = 0
+            else:
+                p_clean = w ** RANSAC_SAMPLE_SIZE
+                required = int(np.ceil(np.log(1 - confidence) / np.log(1 - p_clean))) if p_clean > 0 else n_iter
+    if best_count < min_inliers:
         raise ValueError("RANSAC не нашёл inliers для multilateration")
+    best_inliers = [int(i) for i in np.flatnonzero(best_mask)]
     # Финальная оптимизация по inliers
-    pos_in = [positions[i] for i in best_inliers]
-    dist_in = [distances[i] for i in best_inliers]
-    w_in = [weights[i] for i in best_inliers] if weights is not None else None
+    pos_in = P[best_mask]
+    dist_in = D[best_mask]
+    w_in = np.asarray(weights, dtype=float)[best_mask] if weights is not None else None
     def residuals(x):
-        dists = np.linalg.norm(np.array(pos_in) - x, axis=1)
+        dists = np.linalg.norm(pos_in - x, axis=1)
         if w_in is not None:
-            return np.array(w_in) * (dists - np.array(dist_in))
-        return dists - np.array(dist_in)
-    x0 = np.mean(pos_in, axis=0)
-    res = least_squares(residuals, x0, loss='huber', f_scale=2.0)
-    return tuple(res.x), best_inliers
\ No newline at end of file
+            return w_in * (dists - dist_in)
+        return dists - dist_in
+    res = least_squares(residuals, best_coords, loss='huber', f_scale=2.0)
+    return tuple(res.x), best_inliers
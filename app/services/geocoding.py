@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.geocode_cache import GeocodeCache
+from app.db.session import AsyncSessionLocal
+from app.utils.geo_utils import reverse_geocode_osm
+from app.utils.footprints import FootprintIndex, load_footprint_index
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "reverse_geocode",
+    "get_footprint_index",
+    "cell_key",
+    "purge_expired_geocode_cache",
+    "geocode_stats",
+]
+
+
+def cell_key(lat: float, lon: float, step: float | None = None) -> str:
+    """
+    Квантует координаты в ячейку сетки с шагом step градусов (по умолчанию GEOCODE_CELL_DEGREES).
+    Все точки одной ячейки (≈ одно здание) разделяют один результат геокодирования.
+    """
+    step = step or settings.GEOCODE_CELL_DEGREES
+    return f"{round(lat / step) * step:.6f},{round(lon / step) * step:.6f}"
+
+
+class _TTLCache:
+    """
+    LRU-кэш в памяти процесса с временем жизни записей.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    def get(self, key: str) -> dict | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: dict, ttl: float | None = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_lru = _TTLCache(settings.GEOCODE_LRU_SIZE, settings.GEOCODE_CACHE_TTL_SECONDS)
+_inflight: dict[str, asyncio.Task] = {}
+_stats = {"local_hits": 0, "lru_hits": 0, "db_hits": 0, "external_calls": 0, "joined": 0}
+
+# Локальный индекс контуров зданий (загружается один раз при первом обращении)
+_footprint_index: FootprintIndex | None = None
+_footprint_index_loaded = False
+_footprint_lock: asyncio.Lock | None = None
+
+
+async def get_footprint_index() -> FootprintIndex | None:
+    """
+    Возвращает локальный индекс контуров из GEOCODE_FOOTPRINTS_PATH (или None, если файл не задан
+    или не загрузился). Файл разбирается в отдельном потоке, чтобы не блокировать event loop.
+    """
+    global _footprint_index, _footprint_index_loaded, _footprint_lock
+    if _footprint_index_loaded or not settings.GEOCODE_FOOTPRINTS_PATH:
+        return _footprint_index
+    if _footprint_lock is None:
+        _footprint_lock = asyncio.Lock()
+    async with _footprint_lock:
+        if not _footprint_index_loaded:
+            try:
+                _footprint_index = await asyncio.to_thread(load_footprint_index, settings.GEOCODE_FOOTPRINTS_PATH)
+            except Exception as e:
+                logger.error(f"Не удалось загрузить контуры зданий из {settings.GEOCODE_FOOTPRINTS_PATH}: {e}")
+                _footprint_index = None
+            _footprint_index_loaded = True
+    return _footprint_index
+
+
+async def _load_from_db(key: str) -> dict | None:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(GeocodeCache.response, GeocodeCache.expires_at).where(GeocodeCache.cell == key)
+        )
+        row = result.first()
+    if row is None or row.expires_at <= datetime.now(timezone.utc):
+        return None
+    # Остаток TTL из БД переносим в LRU, чтобы запись не жила в памяти дольше, чем в таблице
+    remaining = (row.expires_at - datetime.now(timezone.utc)).total_seconds()
+    _lru.set(key, row.response, ttl=remaining)
+    return row.response
+
+
+async def _store_in_db(key: str, response: dict) -> None:
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=settings.GEOCODE_CACHE_TTL_SECONDS)
+    stmt = pg_insert(GeocodeCache).values(cell=key, response=response, expires_at=expires_at)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GeocodeCache.cell],
+        set_={"response": stmt.excluded.response, "expires_at": stmt.excluded.expires_at},
+    )
+    async with AsyncSessionLocal() as session:
+        await session.execute(stmt)
+        await session.commit()
+
+
+async def _resolve(key: str, lat: float, lon: float) -> dict:
+    """
+    Промах LRU: таблица geocode_cache, затем внешний запрос к Nominatim.
+    Выполняется одной задачей на ячейку, остальные запросы ждут её результат.
+    """
+    try:
+        cached = await _load_from_db(key)
+    except Exception as e:
+        logger.warning(f"Кэш геокодирования в БД недоступен ({key}): {e}")
+        cached = None
+    if cached is not None:
+        _stats["db_hits"] += 1
+        return cached
+    _stats["external_calls"] += 1
+    response = await reverse_geocode_osm(lat, lon)
+    _lru.set(key, response)
+    try:
+        await _store_in_db(key, response)
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить результат геокодирования {key} в БД: {e}")
+    return response
+
+
+async def reverse_geocode(lat: float, lon: float) -> dict:
+    """
+    Обратное геокодирование:
+    - сначала локальный индекс контуров зданий (GEOCODE_FOOTPRINTS_PATH), без сети;
+    - Nominatim — только как запасной вариант (GEOCODE_NOMINATIM_FALLBACK), через кэш:
+      LRU в памяти процесса → таблица geocode_cache → внешний запрос;
+    - ключ — квантованные координаты (cell_key), записи живут GEOCODE_CACHE_TTL_SECONDS;
+    - одновременные запросы одной ячейки схлопываются в один внешний вызов (single-flight).
+    Возвращает тот же словарь, что и reverse_geocode_osm (osm_id, name, display_name, …).
+    """
+    index = await get_footprint_index()
+    if index is not None:
+        local = index.lookup(lat, lon, max_distance_m=settings.GEOCODE_LOCAL_MAX_DISTANCE_M)
+        if local is not None:
+            _stats["local_hits"] += 1
+            return local
+    if not settings.GEOCODE_NOMINATIM_FALLBACK:
+        return {}
+
+    key = cell_key(lat, lon)
+    cached = _lru.get(key)
+    if cached is not None:
+        _stats["lru_hits"] += 1
+        return cached
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_resolve(key, lat, lon))
+        _inflight[key] = task
+        task.add_done_callback(lambda _t, k=key: _inflight.pop(k, None))
+    else:
+        _stats["joined"] += 1
+    # shield: отмена одного ожидающего запроса не должна отменять общий запрос для остальных
+    return await asyncio.shield(task)
+
+
+async def purge_expired_geocode_cache(db: AsyncSession) -> int:
+    """
+    Удаляет просроченные записи из таблицы geocode_cache. Возвращает число удалённых строк.
+    """
+    result = await db.execute(
+        delete(GeocodeCache).where(GeocodeCache.expires_at <= datetime.now(timezone.utc))
+    )
+    await db.commit()
+    logger.info(f"Кэш геокодирования: удалено просроченных записей {result.rowcount}")
+    return result.rowcount
+
+
+def geocode_stats() -> dict:
+    """
+    Счётчики кэша геокодирования (для мониторинга).
+    """
+    return {**_stats, "lru_size": len(_lru), "inflight": len(_inflight)}
@@ -0,0 +1,250 @@
+import logging
+from datetime import timedelta
+
+from sqlalchemy import select, update, delete, func, exists, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.db.models.recompute_job import RecomputeJob
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "JOB_RECALC_AP",
+    "enqueue_jobs",
+    "enqueue_ap_recalc",
+    "dequeue_jobs",
+    "complete_jobs",
+    "fail_job",
+    "requeue_stale_jobs",
+    "retry_delay",
+    "queue_stats",
+]
+
+# Типы заданий
+JOB_RECALC_AP = "recalc_ap"
+
+# Статусы; выполненные задания удаляются из таблицы
+PENDING = "pending"
+RUNNING = "running"
+FAILED = "failed"
+
+# Попыток вернуть зависшие задания, если параллельно по тому же ключу ставятся новые
+REQUEUE_ATTEMPTS = 3
+
+# 6 параметров на строку INSERT: 5000 строк — 30000 параметров, в пределах лимита asyncpg (32767)
+ENQUEUE_CHUNK_ROWS = 5000
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Экспоненциальный backoff перед повтором: base · 2^(attempts − 1), не больше JOB_QUEUE_RETRY_MAX_SECONDS.
+    """
+    delay = settings.JOB_QUEUE_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    return min(delay, settings.JOB_QUEUE_RETRY_MAX_SECONDS)
+
+
+async def enqueue_jobs(db: AsyncSession, kind: str, jobs: list[tuple[str | None, dict]], delay_seconds: float = 0.0) -> int:
+    """
+    Ставит задания в очередь одним INSERT ... ON CONFLICT DO NOTHING.
+    jobs: [(dedup_key | None, payload), ...]; задание с ключом, по которому уже есть ожидающее,
+    не создаётся (повторные попадания сливаются). Не коммитит — можно вызвать в транзакции
+    вместе с записью данных. Возвращает число созданных заданий.
+    """
+    if not jobs:
+        return 0
+    created = 0
+    for i in range(0, len(jobs), ENQUEUE_CHUNK_ROWS):
+        rows = [
+            {
+                "kind": kind,
+                "dedup_key": key,
+                "payload": payload,
+                "max_attempts": settings.JOB_QUEUE_MAX_ATTEMPTS,
+                "run_at": func.now() + timedelta(seconds=delay_seconds),
+            }
+            for key, payload in jobs[i:i + ENQUEUE_CHUNK_ROWS]
+        ]
+        stmt = (
+            pg_insert(RecomputeJob)
+            .values(rows)
+            .on_conflict_do_nothing(
+                index_elements=[RecomputeJob.dedup_key],
+                # Предикат частичного индекса — литералом: с параметром Postgres не сопоставит индекс
+                index_where=text(f"status = '{PENDING}'"),
+            )
+            .returning(RecomputeJob.id)
+        )
+        result = await db.execute(stmt)
+        created += len(result.all())
+    return created
+
+
+async def enqueue_ap_recalc(db: AsyncSession, bssids) -> int:
+    """
+    Пересчёт координат AP через общую очередь: одно ожидающее задание на AP (ключ ap:<bssid>).
+    """
+    return await enqueue_jobs(db, JOB_RECALC_AP, [(f"ap:{bssid}", {"bssid": bssid}) for bssid in sorted(set(bssids))])
+
+
+async def dequeue_jobs(db: AsyncSession, worker_id: str, limit: int) -> list:
+    """
+    Забирает до limit готовых заданий одним UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED):
+    параллельные воркеры не ждут друг друга и не получают одно задание дважды.
+    Задания переводятся в running, attempts увеличивается. Не коммитит.
+    Возвращает строки (id, kind, dedup_key, payload, attempts, max_attempts).
+    """
+    picked = (
+        select(RecomputeJob.id)
+        .where((RecomputeJob.status == PENDING) & (RecomputeJob.run_at <= func.now()))
+        .order_by(RecomputeJob.run_at, RecomputeJob.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(RecomputeJob)
+        .where(RecomputeJob.id.in_(picked))
+        .values(
+            status=RUNNING,
+            locked_by=worker_id,
+            locked_at=func.now(),
+            attempts=RecomputeJob.attempts + 1,
+        )
+        .returning(
+            RecomputeJob.id,
+            RecomputeJob.kind,
+            RecomputeJob.dedup_key,
+            RecomputeJob.payload,
+            RecomputeJob.attempts,
+            RecomputeJob.max_attempts,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return sorted(result.all(), key=lambda row: row.id)
+
+
+async def complete_jobs(db: AsyncSession, ids) -> None:
+    """
+    Удаляет выполненные задания. Не коммитит: вызывается в транзакции обработчика,
+    чтобы результат и снятие задания фиксировались вместе.
+    """
+    ids = list(ids)
+    if ids:
+        await db.execute(delete(RecomputeJob).where(RecomputeJob.id.in_(ids)))
+
+
+def _pending_duplicate():
+    other = aliased(RecomputeJob)
+    return exists().where(
+        (other.dedup_key == RecomputeJob.dedup_key) &
+        (other.status == PENDING) &
+        (other.id != RecomputeJob.id)
+    )
+
+
+async def fail_job(db: AsyncSession, job, error: str) -> bool:
+    """
+    Обрабатывает ошибку задания: повтор через retry_delay(attempts) или статус failed
+    после max_attempts попыток. Если за время выполнения по тому же ключу уже поставлено
+    новое ожидающее задание, это задание просто удаляется — работу сделает новое.
+    Не коммитит. Возвращает True, если запланирован повтор.
+    """
+    error = error[:2000]
+    if job.attempts >= job.max_attempts:
+        await db.execute(
+            update(RecomputeJob)
+            .where(RecomputeJob.id == job.id)
+            .values(status=FAILED, locked_by=None, last_error=error)
+        )
+        logger.warning(f"Задание {job.id} ({job.kind}) исчерпало попытки ({job.attempts}): {error}")
+        return False
+    delete_if_duplicate = delete(RecomputeJob).where((RecomputeJob.id == job.id) & _pending_duplicate())
+    if (await db.execute(delete_if_duplicate)).rowcount:
+        return True
+    delay = retry_delay(job.attempts)
+    try:
+        # Savepoint: ожидающее задание с тем же ключом могло появиться после DELETE выше
+        async with db.begin_nested():
+            await db.execute(
+                update(RecomputeJob)
+                .where(RecomputeJob.id == job.id)
+                .values(
+                    status=PENDING,
+                    locked_by=None,
+                    locked_at=None,
+                    last_error=error,
+                    run_at=func.now() + timedelta(seconds=delay),
+                )
+            )
+    except IntegrityError:
+        # Уже в очереди — работу сделает новое задание
+        await db.execute(delete_if_duplicate)
+        return True
+    logger.info(f"Задание {job.id} ({job.kind}) будет повторено через {delay:.0f} с (попытка {job.attempts}): {error}")
+    return True
+
+
+async def requeue_stale_jobs(db: AsyncSession, lease_seconds: float | None = None) -> int:
+    """
+    Возвращает в очередь задания, зависшие в running дольше lease_seconds (воркер упал
+    или был убит). Задания без попыток в запасе помечаются failed. По каждому dedup_key
+    в очередь возвращается не больше одного задания: зависшие дубликаты и задания, по ключу
+    которых уже есть ожидающее, удаляются. Не коммитит.
+    Возвращает число возвращённых в очередь заданий.
+    """
+    lease_seconds = lease_seconds or settings.JOB_QUEUE_LEASE_SECONDS
+    stale = (RecomputeJob.status == RUNNING) & (RecomputeJob.locked_at < func.now() - timedelta(seconds=lease_seconds))
+    await db.execute(
+        update(RecomputeJob)
+        .where(stale & (RecomputeJob.attempts >= RecomputeJob.max_attempts))
+        .values(status=FAILED, locked_by=None, last_error="lease expired")
+        .execution_options(synchronize_session=False)
+    )
+    # Из зависших с одним ключом остаётся самое раннее (DISTINCT ON (dedup_key))
+    keep = (
+        select(RecomputeJob.id)
+        .where(stale & RecomputeJob.dedup_key.is_not(None))
+        .distinct(RecomputeJob.dedup_key)
+        .order_by(RecomputeJob.dedup_key, RecomputeJob.id)
+    )
+    await db.execute(
+        delete(RecomputeJob)
+        .where(stale & RecomputeJob.dedup_key.is_not(None) & RecomputeJob.id.not_in(keep))
+        .execution_options(synchronize_session=False)
+    )
+    for attempt in range(REQUEUE_ATTEMPTS):
+        await db.execute(delete(RecomputeJob).where(stale & _pending_duplicate()).execution_options(synchronize_session=False))
+        try:
+            # Параллельный enqueue мог поставить ожидающее задание с тем же ключом —
+            # тогда нарушение уникальности откатывает только savepoint, и дубликаты удаляются заново
+            async with db.begin_nested():
+                result = await db.execute(
+                    update(RecomputeJob)
+                    .where(stale)
+                    .values(status=PENDING, locked_by=None, locked_at=None, run_at=func.now())
+                    .execution_options(synchronize_session=False)
+                )
+            break
+        except IntegrityError:
+            if attempt == REQUEUE_ATTEMPTS - 1:
+                raise
+            logger.info("Зависшее задание уже поставлено в очередь заново, повторяем возврат")
+    if result.rowcount:
+        logger.warning(f"Возвращено в очередь зависших заданий: {result.rowcount}")
+    return result.rowcount
+
+
+async def queue_stats(db: AsyncSession) -> dict:
+    """
+    Число заданий по статусам и число готовых к выполнению (для мониторинга).
+    """
+    result = await db.execute(select(RecomputeJob.status, func.count()).group_by(RecomputeJob.status))
+    stats = {PENDING: 0, RUNNING: 0, FAILED: 0, **dict(result.all())}
+    stats["ready"] = (await db.execute(
+        select(func.count()).select_from(RecomputeJob)
+        .where((RecomputeJob.status == PENDING) & (RecomputeJob.run_at <= func.now()))
+    )).scalar_one()
+    return stats
@@ -0,0 +1,260 @@
+import asyncio
+import gzip
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.access_point import AccessPoint
+from app.db.models.building import Building
+from app.db.models.floor_polygon import FloorPolygon
+from app.schemas.map import FloorSchema, MapResponse
+from app.utils.geometry import polygon_for_lod
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него отдаём gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "MapEntry",
+    "MapCache",
+    "map_cache",
+    "get_map_version",
+    "build_map_response",
+    "map_etag",
+    "etag_matches",
+    "choose_encoding",
+]
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+async def get_map_version(db: AsyncSession, building_id: int) -> int | None:
+    """
+    Текущая версия карты здания или None, если здания нет.
+    """
+    result = await db.execute(select(Building.map_version).where(Building.id == building_id))
+    return result.scalar_one_or_none()
+
+
+async def build_map_response(db: AsyncSession, building_id: int, lod: int = 0) -> MapResponse | None:
+    """
+    Собирает MapResponse: здание, полигоны этажей (уровня детализации lod) и AP всех этих
+    этажей одним запросом (группировка по этажу в памяти). None, если здания нет.
+    """
+    building = (await db.execute(select(Building).where(Building.id == building_id))).scalars().first()
+    if building is None:
+        return None
+    result = await db.execute(
+        select(FloorPolygon)
+        .where(FloorPolygon.building_id == building_id)
+        .order_by(FloorPolygon.floor)
+    )
+    polygons = result.scalars().all()
+
+    aps_by_floor: dict[int, list[AccessPoint]] = {poly.floor: [] for poly in polygons}
+    if aps_by_floor:
+        result = await db.execute(
+            select(AccessPoint)
+            .where(
+                AccessPoint.building_id == building_id,
+                AccessPoint.floor.in_(aps_by_floor.keys()),
+            )
+            .order_by(AccessPoint.floor, AccessPoint.id)
+        )
+        for ap in result.scalars().all():
+            aps_by_floor[ap.floor].append(ap)
+
+    return MapResponse(
+        building_id=building.id,
+        version=building.map_version,
+        building_name=building.name,
+        address=building.address or "",
+        lat=building.lat,
+        lon=building.lon,
+        floors=[
+            FloorSchema(
+                id=poly.id,
+                floor=poly.floor,
+                polygon=polygon_for_lod(poly.polygon, poly.polygon_lods, lod),
+                access_points=aps_by_floor[poly.floor],
+            )
+            for poly in polygons
+        ],
+    )
+
+
+class MapEntry:
+    """
+    Сериализованная карта одной версии и уровня детализации: JSON и заранее сжатые gzip/brotli варианты.
+    """
+    __slots__ = ("building_id", "version", "lod", "etag", "body", "gzip", "br")
+
+    def __init__(self, building_id: int, version: int, body: bytes, lod: int = 0):
+        self.building_id = building_id
+        self.version = version
+        self.lod = lod
+        self.etag = map_etag(building_id, version, lod)
+        self.body = body
+        self.gzip = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        self.br = brotli.compress(body, quality=BROTLI_QUALITY) if brotli is not None else None
+
+    def body_for(self, encoding: str) -> bytes:
+        if encoding == "br" and self.br is not None:
+            return self.br
+        if encoding == "gzip":
+            return self.gzip
+        return self.body
+
+
+class MapCache:
+    """
+    Кэш готовых ответов /v1/map в памяти процесса ((building_id, lod) → MapEntry):
+    - запись действительна, пока версия карты в БД совпадает с её version;
+    - одновременные промахи по одной (building_id, lod, version) объединяются: карту собирает
+      первый запрос, остальные ждут его результат;
+    - хранится не больше max_entries зданий (LRU).
+    """
+
+    def __init__(self, max_entries: int = settings.MAP_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[int, int], MapEntry] = OrderedDict()
+        self._inflight: dict[tuple[int, int, int], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, building_id: int | None = None) -> None:
+        """
+        Сбрасывает одно здание (или весь кэш, если building_id не задан).
+        """
+        if building_id is None:
+            self._entries.clear()
+        else:
+            for key in [key for key in self._entries if key[0] == building_id]:
+                del self._entries[key]
+
+    def _lookup(self, building_id: int, version: int, lod: int) -> MapEntry | None:
+        entry = self._entries.get((building_id, lod))
+        if entry is None or entry.version != version:
+            return None
+        self._entries.move_to_end((building_id, lod))
+        return entry
+
+    def _store(self, entry: MapEntry) -> None:
+        key = (entry.building_id, entry.lod)
+        current = self._entries.get(key)
+        # Параллельная сборка более старой версии не вытесняет новую
+        if current is not None and current.version > entry.version:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(
+        self,
+        building_id: int,
+        version: int,
+        build: Callable[[], Awaitable[bytes | None]],
+        lod: int = 0,
+    ) -> MapEntry | None:
+        """
+        Возвращает карту версии version и уровня детализации lod; при промахе вызывает
+        build() → JSON (None — здания нет).
+        Сжатие выполняется в пуле потоков, чтобы не держать event loop на больших картах.
+        """
+        key = (building_id, lod, version)
+        while True:
+            entry = self._lookup(building_id, version, lod)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Отменили собиравший запрос, а не нас — собираем сами
+                if future.cancelled():
+                    continue
+                raise
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            body = await build()
+            entry = await asyncio.to_thread(MapEntry, building_id, version, body, lod) if body is not None else None
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Ошибку получают ожидающие; без них не засоряем лог «exception was never retrieved»
+            future.exception()
+            raise
+        else:
+            if entry is not None:
+                self._store(entry)
+            future.set_result(entry)
+            return entry
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "in_flight": len(self._inflight)}
+
+
+def map_etag(building_id: int, version: int, lod: int = 0) -> str:
+    # Слабый ETag: один и тот же ответ отдаётся в разных Content-Encoding
+    return f'W/"map-{building_id}-{version}-lod{lod}"' if lod else f'W/"map-{building_id}-{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Совпадает ли заголовок If-None-Match с ETag (слабое сравнение, поддерживается «*»).
+    """
+    if not if_none_match:
+        return False
+    target = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == target:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding: str | None) -> str:
+    """
+    Выбирает кодировку ответа по Accept-Encoding: br (если доступен brotli), затем gzip, иначе identity.
+    """
+    if not accept_encoding:
+        return "identity"
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    for encoding in (("br",) if brotli is not None else ()) + ("gzip",):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return "identity"
+
+
+# Общий кэш карт на процесс
+map_cache = MapCache()
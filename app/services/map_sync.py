@@ -0,0 +1,264 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+from sqlalchemy import event, select, update, delete, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.db.models.access_point import AccessPoint
+from app.db.models.building import Building
+from app.db.models.floor_polygon import FloorPolygon
+from app.db.models.map_tombstone import MapTombstone
+from app.db.models.poi import POI
+from app.schemas.map import MapChangesResponse, MapDeletions
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "KIND_ACCESS_POINT",
+    "KIND_FLOOR_POLYGON",
+    "KIND_POI",
+    "bump_map_versions",
+    "touch_map_entity",
+    "touch_map_rows",
+    "record_map_deletions",
+    "load_map_changes",
+    "purge_map_tombstones",
+]
+
+# Типы записей карты в журнале удалений
+KIND_ACCESS_POINT = "access_point"
+KIND_FLOOR_POLYGON = "floor_polygon"
+KIND_POI = "poi"
+
+_KIND_FIELDS = {
+    KIND_ACCESS_POINT: "access_points",
+    KIND_FLOOR_POLYGON: "floor_polygons",
+    KIND_POI: "pois",
+}
+
+# Ключ Session.info с изменениями карты, накопленными в текущей транзакции
+_PENDING_KEY = "map_changes"
+
+
+class _PendingMapChanges:
+    """
+    Изменения карт, накопленные в транзакции: записываются одним проходом перед коммитом.
+    """
+    __slots__ = ("objects", "rows", "tombstones")
+
+    def __init__(self):
+        self.objects = []  # ORM-записи (id и building_id известны только после flush)
+        self.rows: dict = {}  # таблица → {id: building_id}
+        self.tombstones: list[tuple[str, int, int]] = []  # (kind, entity_id, building_id)
+
+
+def _pending(db: AsyncSession | Session) -> _PendingMapChanges:
+    # AsyncSession.info — тот же словарь, что и у синхронной сессии
+    pending = db.info.get(_PENDING_KEY)
+    if pending is None:
+        pending = db.info[_PENDING_KEY] = _PendingMapChanges()
+    return pending
+
+
+def bump_map_versions(session: Session, building_ids: Iterable[int | None]) -> dict[int, int]:
+    """
+    Увеличивает buildings.map_version у перечисленных зданий (синхронная сессия, без коммита):
+    закэшированные карты и ETag старой версии перестают совпадать. Строки зданий блокируются
+    одним запросом в порядке id (SELECT ... ORDER BY id FOR UPDATE), поэтому транзакции
+    не взаимоблокируются. Вызывается один раз на транзакцию непосредственно перед коммитом
+    (см. _apply_map_changes), так что блокировка держится только на время коммита.
+    Возвращает новые версии {building_id: map_version}.
+    """
+    ids = sorted({i for i in building_ids if i is not None})
+    if not ids:
+        return {}
+    buildings = Building.__table__
+    locked = (
+        select(buildings.c.id)
+        .where(buildings.c.id.in_(ids))
+        .order_by(buildings.c.id)
+        .with_for_update()
+        .subquery("locked")
+    )
+    result = session.execute(
+        update(buildings)
+        .where(buildings.c.id == locked.c.id)
+        # updated_at не трогаем: само здание не менялось
+        .values(map_version=buildings.c.map_version + 1, updated_at=buildings.c.updated_at)
+        .returning(buildings.c.id, buildings.c.map_version)
+    )
+    return {building_id: version for building_id, version in result.all()}
+
+
+def touch_map_entity(db: AsyncSession, obj) -> None:
+    """
+    Отмечает изменение одной ORM-записи карты (AP, полигон, POI). Версия её здания
+    увеличивается и проставляется записи при коммите транзакции.
+    """
+    _pending(db).objects.append(obj)
+
+
+def touch_map_rows(db: AsyncSession, model, rows: Iterable[tuple[int, int | None]]) -> None:
+    """
+    Отмечает массово изменённые записи карты (AP, полигоны, POI). rows: [(id, building_id), ...].
+    Версии их зданий увеличиваются, а записям проставляется map_version = новая версия здания
+    при коммите транзакции.
+    """
+    ids = _pending(db).rows.setdefault(model.__table__, {})
+    ids.update((row_id, building_id) for row_id, building_id in rows if building_id is not None)
+
+
+def record_map_deletions(db: AsyncSession, kind: str, rows: Iterable[tuple[int, int | None]]) -> None:
+    """
+    Отмечает удаление записей карты. rows: [(id, building_id), ...].
+    Tombstones пишутся, а версии зданий увеличиваются при коммите транзакции.
+    """
+    _pending(db).tombstones.extend(
+        (kind, row_id, building_id) for row_id, building_id in rows if building_id is not None
+    )
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_map_changes(session: Session) -> None:
+    """
+    Записывает накопленные изменения карт перед коммитом: одно увеличение версий всех
+    затронутых зданий (в порядке id), затем map_version изменённых записей и tombstones.
+    В asyncio-сессии выполняется внутри greenlet коммита, поэтому может выполнять запросы.
+    """
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending is None:
+        return
+    if pending.objects:
+        # id новых записей и актуальный building_id — после flush
+        session.flush()
+        for obj in pending.objects:
+            if obj.building_id is not None and obj.id is not None and obj not in session.deleted:
+                pending.rows.setdefault(obj.__table__, {})[obj.id] = obj.building_id
+    building_ids = {b for rows in pending.rows.values() for b in rows.values()}
+    building_ids.update(b for _, _, b in pending.tombstones)
+    versions = bump_map_versions(session, building_ids)
+    if not versions:
+        return
+
+    buildings = Building.__table__
+    for table, rows in pending.rows.items():
+        if rows:
+            session.execute(
+                update(table)
+                .where(table.c.id.in_(list(rows)))
+                .where(buildings.c.id == table.c.building_id)
+                .values(map_version=buildings.c.map_version)
+            )
+    for obj in pending.objects:
+        if obj.building_id in versions:
+            set_committed_value(obj, "map_version", versions[obj.building_id])
+    tombstones = [
+        {"building_id": building_id, "kind": kind, "entity_id": row_id, "map_version": versions[building_id]}
+        for kind, row_id, building_id in pending.tombstones
+        if building_id in versions
+    ]
+    if tombstones:
+        session.execute(insert(MapTombstone), tombstones)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_map_changes(session: Session, transaction) -> None:
+    # Откат (или закрытие сессии без коммита) — накопленные изменения не применяются
+    if transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+
+
+async def load_map_changes(db: AsyncSession, building_id: int, since: int) -> MapChangesResponse | None:
+    """
+    Изменения карты здания после версии since: записи с map_version > since и tombstones удалений.
+    Каждая таблица читается по индексу (building_id, map_version), поэтому работа и ответ
+    пропорциональны числу изменений. Если since старше вычищенного журнала удалений
+    (или новее текущей версии) — reset=True без данных: клиент загружает /v1/map заново.
+    None, если здания нет.
+    """
+    result = await db.execute(
+        select(Building.map_version, Building.map_compacted_version).where(Building.id == building_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    version, compacted = row
+    if since < compacted or since > version:
+        return MapChangesResponse(building_id=building_id, since=since, version=version, reset=True)
+    if since == version:
+        return MapChangesResponse(building_id=building_id, since=since, version=version)
+
+    async def changed(model):
+        result = await db.execute(
+            select(model)
+            .where(model.building_id == building_id, model.map_version > since)
+            .order_by(model.id)
+        )
+        return result.scalars().all()
+
+    access_points = await changed(AccessPoint)
+    floor_polygons = await changed(FloorPolygon)
+    pois = await changed(POI)
+
+    result = await db.execute(
+        select(MapTombstone.kind, MapTombstone.entity_id)
+        .where(MapTombstone.building_id == building_id, MapTombstone.map_version > since)
+    )
+    # Запись, удалённая и снова записанная после since, отдаётся только как изменение
+    present = {
+        KIND_ACCESS_POINT: {ap.id for ap in access_points},
+        KIND_FLOOR_POLYGON: {poly.id for poly in floor_polygons},
+        KIND_POI: {poi.id for poi in pois},
+    }
+    deleted = {field: set() for field in _KIND_FIELDS.values()}
+    for kind, entity_id in result.all():
+        if kind in _KIND_FIELDS and entity_id not in present[kind]:
+            deleted[_KIND_FIELDS[kind]].add(entity_id)
+    return MapChangesResponse(
+        building_id=building_id,
+        since=since,
+        version=version,
+        access_points=access_points,
+        floor_polygons=floor_polygons,
+        pois=pois,
+        deleted=MapDeletions(**{field: sorted(ids) for field, ids in deleted.items()}),
+    )
+
+
+async def purge_map_tombstones(db: AsyncSession, retention_days: float | None = None) -> int:
+    """
+    Удаляет tombstones старше retention_days (MAP_TOMBSTONE_RETENTION_DAYS) и поднимает
+    buildings.map_compacted_version до максимальной удалённой версии: клиенты, отставшие
+    сильнее, получат reset. Один запрос (DELETE ... RETURNING в CTE). Возвращает число удалённых строк.
+    """
+    retention_days = retention_days if retention_days is not None else settings.MAP_TOMBSTONE_RETENTION_DAYS
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    purged = (
+        delete(MapTombstone)
+        .where(MapTombstone.created_at < cutoff)
+        .returning(MapTombstone.building_id, MapTombstone.map_version)
+        .cte("purged")
+    )
+    per_building = (
+        select(purged.c.building_id, func.max(purged.c.map_version).label("map_version"), func.count().label("n"))
+        .group_by(purged.c.building_id)
+        .subquery()
+    )
+    buildings = Building.__table__
+    result = await db.execute(
+        update(buildings)
+        .where(buildings.c.id == per_building.c.building_id)
+        .values(
+            map_compacted_version=func.greatest(buildings.c.map_compacted_version, per_building.c.map_version),
+            updated_at=buildings.c.updated_at,
+        )
+        .returning(per_building.c.n)
+    )
+    count = sum(result.scalars().all())
+    await db.commit()
+    logger.info(f"Журнал удалений карт: удалено tombstones {count}")
+    return count
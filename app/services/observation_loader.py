@@ -0,0 +1,111 @@
+import logging
+
+import numpy as np
+from sqlalchemy import select, func, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.access_point import AccessPoint
+from app.db.models.wifi_obs import WiFiObs
+from app.db.models.wifi_snapshot import WiFiSnapshot
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "LATEST_OBSERVATIONS_PER_AP",
+    "OBS_COLUMNS",
+    "latest_observations_query",
+    "group_observation_rows",
+    "load_latest_observations",
+]
+
+# Сколько последних наблюдений каждой AP используется при пересчёте координат
+LATEST_OBSERVATIONS_PER_AP = 15
+
+# Порядок столбцов в массивах наблюдений; accuracy снимка = NaN, если не задана
+OBS_COLUMNS = ("x", "y", "z", "rssi", "accuracy")
+
+
+def latest_observations_query(per_ap: int = LATEST_OBSERVATIONS_PER_AP, ap_ids=None):
+    """
+    Один запрос вместо N+1: последние per_ap наблюдений каждой стационарной AP
+    (row_number() OVER (PARTITION BY access_point_id ORDER BY timestamp DESC) <= per_ap).
+    Берутся только снимки того же здания, что и AP, с заданными x, y, z.
+    ap_ids — ограничить набором id AP (список или подзапрос SELECT id).
+    Строки упорядочены по access_point_id, внутри AP — от новых к старым.
+    """
+    rn = func.row_number().over(
+        partition_by=WiFiObs.access_point_id,
+        order_by=(WiFiSnapshot.timestamp.desc(), WiFiObs.id.desc()),
+    )
+    ranked = (
+        select(
+            WiFiObs.access_point_id.label("ap_id"),
+            WiFiSnapshot.x,
+            WiFiSnapshot.y,
+            WiFiSnapshot.z,
+            WiFiObs.rssi,
+            WiFiSnapshot.accuracy,
+            rn.label("rn"),
+        )
+        .join(WiFiSnapshot, WiFiObs.snapshot_id == WiFiSnapshot.id)
+        .join(AccessPoint, AccessPoint.id == WiFiObs.access_point_id)
+        .where(
+            (AccessPoint.is_mobile == False) &
+            (WiFiSnapshot.building_id == AccessPoint.building_id) &
+            (WiFiSnapshot.x.is_not(None)) &
+            (WiFiSnapshot.y.is_not(None)) &
+            (WiFiSnapshot.z.is_not(None))
+        )
+    )
+    if ap_ids is not None:
+        if not isinstance(ap_ids, Select):
+            ap_ids = list(ap_ids)
+        ranked = ranked.where(WiFiObs.access_point_id.in_(ap_ids))
+    ranked = ranked.subquery()
+    return (
+        select(ranked.c.ap_id, ranked.c.x, ranked.c.y, ranked.c.z, ranked.c.rssi, ranked.c.accuracy)
+        .where(ranked.c.rn <= per_ap)
+        .order_by(ranked.c.ap_id, ranked.c.rn)
+    )
+
+
+def group_observation_rows(data: np.ndarray) -> dict[int, np.ndarray]:
+    """
+    Разбивает массив строк [ap_id, x, y, z, rssi, accuracy], упорядоченный по ap_id,
+    на {ap_id: массив [k, 5]} — срезы одного непрерывного массива, без копирования.
+    """
+    if len(data) == 0:
+        return {}
+    ids = data[:, 0].astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    ends = np.r_[starts[1:], len(ids)]
+    values = data[:, 1:]
+    return {int(ids[s]): values[s:e] for s, e in zip(starts, ends)}
+
+
+async def load_latest_observations(
+    db: AsyncSession,
+    per_ap: int = LATEST_OBSERVATIONS_PER_AP,
+    ap_ids=None,
+    chunk_rows: int | None = None,
+) -> dict[int, np.ndarray]:
+    """
+    Загружает последние наблюдения всех стационарных AP (или только ap_ids) одним запросом.
+    Результат читается серверным курсором кусками по chunk_rows строк (GEO_SOLVER_FETCH_CHUNK_ROWS)
+    прямо в NumPy, без ORM-объектов WiFiObs/WiFiSnapshot.
+    Возвращает {ap_id: массив [k, 5]} со столбцами OBS_COLUMNS, строки — от новых к старым.
+    """
+    chunk_rows = chunk_rows or settings.GEO_SOLVER_FETCH_CHUNK_ROWS
+    stmt = latest_observations_query(per_ap, ap_ids).execution_options(yield_per=chunk_rows)
+    chunks = []
+    total = 0
+    result = await db.stream(stmt)
+    async for partition in result.partitions(chunk_rows):
+        chunk = np.array(partition, dtype=float)  # None (accuracy) → NaN
+        chunks.append(chunk)
+        total += len(chunk)
+    logger.info(f"Загружено наблюдений для пересчёта: {total}")
+    if not chunks:
+        return {}
+    return group_observation_rows(np.concatenate(chunks))
@@ -3,6 +3,7 @@ from sqlalchemy import select
 from app.db.models.poi import POI
 from app.schemas.map import POICreate, POIUpdate
 from sqlalchemy.exc import NoResultFound
+from app.services.map_sync import KIND_POI, record_map_deletions, touch_map_entity
 
 async def get_poi(db: AsyncSession, poi_id: int) -> POI | None:
     result = await db.execute(select(POI).where(POI.id == poi_id))
@@ -19,6 +20,7 @@ async def list_pois(db: AsyncSession, building_id: int | None = None, floor: int
 
 async def create_poi(db: AsyncSession, data: POICreate) -> POI:
     poi = POI(**data.dict())
+    touch_map_entity(db, poi)
     db.add(poi)
     await db.commit()
     await db.refresh(poi)
@@ -28,6 +30,7 @@ async def update_poi(db: AsyncSession, poi_id: int, data: POIUpdate) -> POI:
     poi = await get_poi(db, poi_id)
     if not poi:
         raise NoResultFound(f"POI id={poi_id} not found")
+    touch_map_entity(db, poi)
     for k, v in data.dict(exclude_unset=True).items():
         setattr(poi, k, v)
     await db.commit()
@@ -38,5 +41,6 @@ async def delete_poi(db: AsyncSession, poi_id: int) -> None:
     poi = await get_poi(db, poi_id)
     if not poi:
         raise NoResultFound(f"POI id={poi_id} not found")
+    record_map_deletions(db, KIND_POI, [(poi.id, poi.building_id)])
     await db.delete(poi)
     await db.commit()
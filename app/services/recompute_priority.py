@@ -0,0 +1,142 @@
+import logging
+import time
+
+from sqlalchemy import select, func, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.access_point import AccessPoint
+from app.db.models.wifi_obs import WiFiObs
+from app.services.geo_solver import FAILED_ENTRY, SKIPPED_ENTRY, SOLVED_ENTRY, pending_recompute_condition, recompute_batch
+from app.services.observation_loader import load_latest_observations
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "priority_score",
+    "top_priority_access_points",
+    "recompute_by_priority",
+]
+
+# Новые наблюдения считаются до этого предела: дальше приоритет уже не растёт, а счёт дешевле
+NEW_OBS_CAP = 50
+# Веса слагаемых приоритета
+NEW_OBS_WEIGHT = 1.0
+ACCURACY_WEIGHT = 1.0
+STALENESS_WEIGHT_PER_DAY = 1.0
+# Давность учитывается не дольше недели; AP без accuracy считаются очень неточными
+STALENESS_CAP_DAYS = 7.0
+UNKNOWN_ACCURACY_M = 100.0
+# Время решения одной AP до первых замеров (с)
+INITIAL_SECONDS_PER_AP = 0.005
+# Ранжирование выполняется один раз за запуск: берётся не больше стольких пакетов AP
+MAX_BATCHES_PER_RUN = 20
+
+# Замеры прошлых запусков: время на AP (решение + доля ранжирования) и время ранжирования
+_cost = {"seconds_per_ap": INITIAL_SECONDS_PER_AP, "rank_seconds": 0.0}
+
+
+def _new_observations_count():
+    """
+    Число наблюдений AP новее watermark, но не больше NEW_OBS_CAP (LIMIT по индексу (access_point_id, id)).
+    """
+    recent = (
+        select(literal(1))
+        .where(WiFiObs.access_point_id == AccessPoint.id)
+        .where(WiFiObs.id > func.coalesce(AccessPoint.solved_obs_id, 0))
+        .limit(NEW_OBS_CAP)
+        .correlate(AccessPoint)
+        .subquery()
+    )
+    return select(func.count()).select_from(recent).scalar_subquery()
+
+
+def priority_score():
+    """
+    Приоритет пересчёта AP (больше — раньше):
+    ln(1 + новых наблюдений) + ln(1 + accuracy) + дни с последнего обновления (до недели).
+    """
+    staleness_days = func.extract("epoch", func.now() - func.coalesce(AccessPoint.last_update, AccessPoint.created_at)) / 86400
+    return (
+        NEW_OBS_WEIGHT * func.ln(1 + _new_observations_count())
+        + ACCURACY_WEIGHT * func.ln(1 + func.coalesce(AccessPoint.accuracy, UNKNOWN_ACCURACY_M))
+        + STALENESS_WEIGHT_PER_DAY * func.least(staleness_days, STALENESS_CAP_DAYS)
+    )
+
+
+async def top_priority_access_points(db: AsyncSession, limit: int) -> list:
+    """
+    До limit стационарных AP, ждущих пересчёта, в порядке убывания приоритета.
+    """
+    score = priority_score().label("score")
+    ranked = (
+        select(AccessPoint.id, score)
+        .where((AccessPoint.is_mobile == False) & pending_recompute_condition())
+        .order_by(score.desc(), AccessPoint.id)
+        .limit(limit)
+        .subquery()
+    )
+    result = await db.execute(
+        select(AccessPoint)
+        .join(ranked, ranked.c.id == AccessPoint.id)
+        .order_by(ranked.c.score.desc(), AccessPoint.id)
+    )
+    return result.scalars().all()
+
+
+async def recompute_by_priority(db: AsyncSession, budget_seconds: float | None = None, batch_size: int | None = None) -> dict:
+    """
+    Пересчитывает самые приоритетные AP, пока не исчерпан бюджет времени budget_seconds
+    (RECOMPUTE_BUDGET_SECONDS_PER_MINUTE). Очередь ранжируется один раз за запуск: берётся
+    столько AP, сколько по замерам прошлых запусков успеет решиться за бюджет за вычетом
+    ранжирования, и обрабатывается пакетами; размер пакета подбирается по замеренному
+    времени на AP, чтобы не выйти за бюджет. Время ранжирования входит в стоимость AP
+    для следующего запуска. Каждый пакет коммитится; обработанные AP получают watermark
+    и выпадают из очереди до новых наблюдений.
+    Возвращает сводку {"processed", "solved", "skipped", "failed", "batches", "seconds"};
+    skipped — AP с недостаточным числом наблюдений (ожидаемый исход, не ошибка решателя).
+    """
+    budget_seconds = budget_seconds if budget_seconds is not None else settings.RECOMPUTE_BUDGET_SECONDS_PER_MINUTE
+    batch_size = max(1, batch_size or settings.RECOMPUTE_PRIORITY_BATCH_SIZE)
+    started = time.perf_counter()
+    stats = {"processed": 0, "solved": 0, "skipped": 0, "failed": 0, "batches": 0}
+    seconds_per_ap = _cost["seconds_per_ap"]
+    # Хотя бы одна AP за запуск: иначе медленное ранжирование навсегда остановило бы пересчёт
+    limit = max(1, min(batch_size * MAX_BATCHES_PER_RUN, int((budget_seconds - _cost["rank_seconds"]) / seconds_per_ap)))
+    if budget_seconds > 0:
+        # Watermark фиксируем до чтения: наблюдения, пришедшие позже, попадут в следующий запуск
+        watermark = (await db.execute(select(func.max(WiFiObs.id)))).scalar() or 0
+        candidates = await top_priority_access_points(db, limit)
+        rank_seconds = time.perf_counter() - started
+        solve_seconds = 0.0
+        position = 0
+        while position < len(candidates):
+            remaining = budget_seconds - (time.perf_counter() - started)
+            size = min(batch_size, int(remaining / seconds_per_ap))
+            if size < 1:
+                if stats["batches"]:
+                    break
+                size = 1
+            batch = candidates[position:position + size]
+            position += len(batch)
+            batch_started = time.perf_counter()
+            observations = await load_latest_observations(db, ap_ids=[ap.id for ap in batch])
+            entries = await recompute_batch(db, batch, observations, watermark)
+            elapsed = time.perf_counter() - batch_started
+            solve_seconds += elapsed
+            seconds_per_ap = max(elapsed / len(batch), 1e-4)
+            stats["processed"] += len(batch)
+            stats["solved"] += sum(1 for entry in entries if entry[1] == SOLVED_ENTRY)
+            stats["skipped"] += sum(1 for entry in entries if entry[1] == SKIPPED_ENTRY)
+            stats["failed"] += sum(1 for entry in entries if entry[1] == FAILED_ENTRY)
+            stats["batches"] += 1
+        _cost["rank_seconds"] = rank_seconds
+        if stats["processed"]:
+            _cost["seconds_per_ap"] = max((solve_seconds + rank_seconds) / stats["processed"], 1e-4)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if stats["processed"]:
+        logger.info(
+            f"Приоритетный пересчёт AP: {stats['processed']} AP за {stats['seconds']} с "
+            f"(бюджет {budget_seconds} с), успешно {stats['solved']}, пропущено {stats['skipped']}, неуспешно {stats['failed']}"
+        )
+    return stats
@@ -0,0 +1,239 @@
+import logging
+
+import numpy as np
+from sqlalchemy import select, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.access_point import AccessPoint
+from app.db.models.building import Building
+from app.db.models.wifi_obs import WiFiObs
+from app.db.models.wifi_snapshot import WiFiSnapshot
+from app.schemas.scan import ScanUpload
+from app.core.config import settings
+from app.services import access_point as ap_service
+from app.services import ap_estimator
+from app.services.geocoding import reverse_geocode
+from app.services.building_registry import BuildingInfo, building_registry
+from app.services.map_sync import touch_map_rows
+from app.utils.math_utils import haversine_m
+
+logger = logging.getLogger(__name__)
+
+BUILDING_NOT_FOUND_DETAIL = "Здание не найдено и не может быть определено по координатам"
+
+# Строк в одном многострочном INSERT (asyncpg ограничивает запрос 32767 параметрами)
+INSERT_CHUNK_ROWS = 2000
+
+# Здания дальше этого расстояния (м) друг от друга — AP считается мобильной
+MOBILE_AP_DISTANCE_M = 500
+
+
+def _chunks(rows: list, size: int = INSERT_CHUNK_ROWS):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+async def resolve_building(db: AsyncSession, scan: ScanUpload) -> Building | None:
+    """
+    Определяет здание по координатам скана через OSM, если его нет в БД по building_id.
+    Находит существующее здание по osm_id/имени или создаёт новое.
+    None — геокодер не узнал здание (ни osm_id, ни имени: офлайн-режим без совпадения по контурам
+    или пустой ответ Nominatim). Заглушку по имени не создаём: все такие сканы слились бы в одно здание.
+    """
+    if scan.lat is None or scan.lon is None:
+        return None
+    osm = await reverse_geocode(scan.lat, scan.lon)
+    osm_id = osm.get("osm_id")
+    name = osm.get("name") or osm.get("address", {}).get("building")
+    if osm_id is None and not name:
+        return None
+    address = osm.get("display_name", "Unknown address")
+    name = name or f"Unknown building {osm_id}"
+    building = None
+    if osm_id is not None:
+        result = await db.execute(select(Building).where(Building.osm_id == osm_id))
+        building = result.scalars().first()
+    if not building:
+        # Здание с таким же именем уже может существовать
+        result = await db.execute(select(Building).where(Building.name == name))
+        building = result.scalars().first()
+    if not building:
+        building = Building(
+            name=name,
+            address=address,
+            osm_id=osm_id,
+            lat=scan.lat,
+            lon=scan.lon
+        )
+        db.add(building)
+        await db.flush()
+        building_registry.invalidate(building.id)
+    return building
+
+
+async def ingest_scans(db: AsyncSession, scans: list[ScanUpload]) -> list[dict]:
+    """
+    Записывает пачку сканов фиксированным числом запросов, не зависящим от числа наблюдений:
+    - здания — из реестра в памяти (building_registry), без запросов в установившемся режиме;
+      OSM-геокодирование только для неизвестных;
+    - снимки — многострочным INSERT ... RETURNING id;
+    - AP — одним SELECT bssid IN (...) и одним INSERT ... ON CONFLICT DO NOTHING;
+    - наблюдения — многострочными INSERT;
+    - онлайн-оценки AP (ap_estimator) — O(1) на наблюдение, одним SELECT и одним upsert.
+    Не коммитит. Возвращает по элементу на скан:
+    {"snapshot_id", "building_id", "bssids", "observations", "estimated"} либо {"error"}
+    (если здание не определено); estimated — bssid, координаты которых уже обновлены онлайн-оценкой.
+    """
+    results: list[dict] = [{} for _ in scans]
+
+    # 1. Здания
+    buildings = await building_registry.get_many(db, {scan.building_id for scan in scans})
+    scan_buildings: list[BuildingInfo | None] = []
+    for scan in scans:
+        building = buildings.get(scan.building_id)
+        if building is None:
+            resolved = await resolve_building(db, scan)
+            if resolved is not None:
+                building = BuildingInfo.from_model(resolved)
+                buildings[building.id] = building
+        scan_buildings.append(building)
+
+    accepted = []  # (индекс скана, скан, здание)
+    for i, (scan, building) in enumerate(zip(scans, scan_buildings)):
+        if building is None:
+            results[i] = {"error": BUILDING_NOT_FOUND_DETAIL}
+            continue
+        scan.building_id = building.id
+        # Вычисляем локальные x, y из lat/lon, если x и y не заданы
+        if scan.x is None or scan.y is None:
+            if scan.lat is not None and scan.lon is not None and building.has_coords:
+                scan.x, scan.y = building.local_xy(scan.lat, scan.lon)
+        accepted.append((i, scan, building))
+    if not accepted:
+        return results
+
+    # 2. Снимки (x, y уже могут быть вычислены)
+    snapshot_rows = [
+        {
+            "building_id": scan.building_id,
+            "floor": scan.floor,
+            "x": scan.x,
+            "y": scan.y,
+            "z": scan.z,
+            "yaw": scan.yaw,
+            "pitch": scan.pitch,
+            "roll": scan.roll,
+            "user_id": None,
+            "lat": scan.lat,
+            "lon": scan.lon,
+            "accuracy": scan.accuracy,
+        }
+        for _, scan, _ in accepted
+    ]
+    result = await db.execute(
+        insert(WiFiSnapshot).returning(WiFiSnapshot.id, sort_by_parameter_order=True),
+        snapshot_rows,
+    )
+    snapshot_ids = result.scalars().all()
+
+    # 3. AP: известные — одним запросом, новые — одним INSERT ... ON CONFLICT (bssid) DO NOTHING
+    known_aps = await ap_service.get_access_points_by_bssids(
+        db, (obs.bssid for _, scan, _ in accepted for obs in scan.observations)
+    )
+    ap_ids = {bssid: ap.id for bssid, ap in known_aps.items()}
+    ap_buildings = {bssid: ap.building_id for bssid, ap in known_aps.items()}
+    new_rows = {}
+    for _, scan, _ in accepted:
+        # Новая AP получает координаты первого скана, в котором она встретилась
+        if scan.x is None or scan.y is None or (scan.x == 0 and scan.y == 0):
+            continue
+        for obs in scan.observations:
+            if obs.bssid not in known_aps and obs.bssid not in new_rows:
+                new_rows[obs.bssid] = {
+                    "bssid": obs.bssid,
+                    "ssid": obs.ssid,
+                    "building_id": scan.building_id,
+                    "floor": scan.floor,
+                    "x": scan.x,
+                    "y": scan.y,
+                    "z": scan.z,
+                    "accuracy": 9999.0,
+                    "is_mobile": False,
+                }
+                ap_buildings[obs.bssid] = scan.building_id
+    ap_ids.update(await ap_service.insert_access_points_ignore_existing(db, list(new_rows.values())))
+
+    # 4. AP, замеченная в другом здании, — мобильная, если здания далеко друг от друга.
+    # Расстояния по всем парам (скан, AP) считаются одним векторным вызовом.
+    pairs = [
+        (ap_ids[obs.bssid], ap_buildings.get(obs.bssid), scan.building_id)
+        for _, scan, _ in accepted
+        for obs in scan.observations
+        if obs.bssid in ap_ids and ap_buildings.get(obs.bssid) != scan.building_id
+    ]
+    mobile_ids = set()
+    if pairs:
+        buildings.update(await building_registry.get_many(db, {b1 for _, b1, _ in pairs} - buildings.keys()))
+        coords = np.full((len(pairs), 4), np.nan)
+        for k, (_, b1_id, b2_id) in enumerate(pairs):
+            b1, b2 = buildings.get(b1_id), buildings.get(b2_id)
+            if b1 is not None and b2 is not None and b1.has_coords and b2.has_coords:
+                coords[k] = (b1.lat, b1.lon, b2.lat, b2.lon)
+        distances = haversine_m(coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3])
+        # Если координаты зданий неизвестны (NaN), по-прежнему помечаем мобильной
+        far = np.isnan(distances) | (distances > MOBILE_AP_DISTANCE_M)
+        mobile_ids = {pairs[k][0] for k in np.nonzero(far)[0]}
+    # Кусками, как и поиск по BSSID: один параметр на id
+    mobile_list = sorted(mobile_ids)
+    for i in range(0, len(mobile_list), ap_service.AP_LOOKUP_CHUNK_ROWS):
+        result = await db.execute(
+            update(AccessPoint)
+            .where(AccessPoint.id.in_(mobile_list[i:i + ap_service.AP_LOOKUP_CHUNK_ROWS]))
+            .values(is_mobile=True)
+            .returning(AccessPoint.id, AccessPoint.building_id)
+        )
+        touch_map_rows(db, AccessPoint, result.tuples().all())
+
+    # 5. Наблюдения всех сканов — многострочными INSERT
+    obs_rows = []
+    estimator_obs = []
+    for (i, scan, _), snapshot_id in zip(accepted, snapshot_ids):
+        bssids = set()
+        count = len(obs_rows)
+        for obs in scan.observations:
+            if obs.bssid not in ap_ids:
+                continue
+            obs_rows.append({
+                "snapshot_id": snapshot_id,
+                "access_point_id": ap_ids[obs.bssid],
+                "ssid": obs.ssid,
+                "bssid": obs.bssid,
+                "rssi": obs.rssi,
+                "frequency": obs.frequency,
+            })
+            bssids.add(obs.bssid)
+            ap_id = ap_ids[obs.bssid]
+            if (
+                ap_id not in mobile_ids
+                and not (obs.bssid in known_aps and known_aps[obs.bssid].is_mobile)
+                and ap_buildings.get(obs.bssid) == scan.building_id
+                and None not in (scan.x, scan.y, scan.z)
+            ):
+                estimator_obs.append((ap_id, (scan.x, scan.y, scan.z), obs.rssi, scan.accuracy))
+        results[i] = {
+            "snapshot_id": snapshot_id,
+            "building_id": scan.building_id,
+            "bssids": bssids,
+            "observations": len(obs_rows) - count,
+        }
+    for chunk in _chunks(obs_rows):
+        await db.execute(insert(WiFiObs).values(chunk))
+
+    # 6. Онлайн-оценки положения AP
+    estimated_ids = set()
+    if settings.AP_ESTIMATOR_ENABLED and estimator_obs:
+        estimated_ids = await ap_estimator.apply_observations(db, estimator_obs)
+    for result in results:
+        if "bssids" in result:
+            result["estimated"] = {bssid for bssid in result["bssids"] if ap_ids[bssid] in estimated_ids}
+    return results
@@ -0,0 +1,304 @@
+"""
+Единый движок пересчёта координат AP: подготовка наблюдений, веса, решение выбранной стратегией,
+сглаживание и оценка точности. Используется и пересчётом одной AP после загрузки,
+и ночным массовым пересчётом, и CLI app.tasks.recompute.
+
+Стратегии регистрируются в реестре (register_strategy) и выбираются по зданию:
+SOLVER_STRATEGY — по умолчанию, SOLVER_BUILDING_STRATEGIES — переопределения
+({"<building_id>": {"strategy": "ransac", "params": {"threshold": 4.0}}}).
+"""
+import logging
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.batch_solver import pack_observations, solve_batch, residual_accuracy
+from app.services.observation_loader import OBS_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "SolveResult",
+    "SolverStrategy",
+    "register_strategy",
+    "get_strategy",
+    "available_strategies",
+    "strategy_for_building",
+    "solve_access_points",
+]
+
+# Фильтр наблюдений — как в filter_observations
+MAX_DISTANCE_M = 50.0
+# Точность снимка по умолчанию (м), если клиент её не прислал; вес такого снимка — 1
+DEFAULT_SNAPSHOT_ACCURACY_M = 10.0
+# Сглаживание со старыми координатами
+SMOOTHING_ALPHA = 0.5
+# Точность хуже этого порога заменяется лучшей точностью снимков-inliers
+ACCURACY_FALLBACK_M = 1000.0
+
+SOLVED = "solved"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class SolveResult:
+    """
+    Результат пересчёта одной AP.
+    status: solved | skipped (мало данных) | failed (решатель не сошёлся);
+    coords: (x, y, z) после сглаживания (для 2D z = прежнее значение); accuracy — оценка, м;
+    inliers — индексы использованных наблюдений (после фильтра); elapsed_ms — время решения.
+    """
+    __slots__ = ("ap_id", "status", "strategy", "dim", "coords", "accuracy", "n_obs", "inliers", "reason", "elapsed_ms")
+
+    def __init__(self, ap_id, status, strategy, dim=None, coords=None, accuracy=None, n_obs=0, inliers=None, reason=None, elapsed_ms=0.0):
+        self.ap_id = ap_id
+        self.status = status
+        self.strategy = strategy
+        self.dim = dim
+        self.coords = coords
+        self.accuracy = accuracy
+        self.n_obs = n_obs
+        self.inliers = inliers
+        self.reason = reason
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def solved(self) -> bool:
+        return self.status == SOLVED
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _Problem:
+    """
+    Подготовленные наблюдения одной AP: позиции [k, 3], расстояния [k], точности снимков [k], веса [k].
+    """
+    __slots__ = ("ap_id", "old", "positions", "distances", "accuracies", "weights", "dim")
+
+    def __init__(self, ap_id, old, positions, distances, accuracies, weights, dim):
+        self.ap_id = ap_id
+        self.old = old
+        self.positions = positions
+        self.distances = distances
+        self.accuracies = accuracies
+        self.weights = weights
+        self.dim = dim
+
+
+def _prepare(ap_id: int, obs: np.ndarray | None, old_coords) -> tuple[_Problem | None, int]:
+    """
+    Фильтрует наблюдения AP (0 < d < 50 м, конечные координаты) и считает веса:
+    чем дальше и чем хуже точность снимка, тем меньше вес.
+    Возвращает (задача, число валидных): 3D при ≥4 наблюдениях, 2D при 3, иначе задачи нет.
+    """
+    from app.services.geo_solver import rssi_to_distance
+
+    if obs is None:
+        obs = np.empty((0, len(OBS_COLUMNS)))
+    positions = obs[:, :3]
+    distances = rssi_to_distance(obs[:, 3])
+    keep = (distances > 0) & (distances < MAX_DISTANCE_M) & np.isfinite(positions).all(axis=1)
+    valid = int(keep.sum())
+    if valid < 3:
+        return None, valid
+    accuracies = np.where(np.isnan(obs[keep, 4]), DEFAULT_SNAPSHOT_ACCURACY_M, obs[keep, 4])
+    weights = (1.0 / np.clip(distances[keep], 1.0, None)) * (DEFAULT_SNAPSHOT_ACCURACY_M / np.clip(accuracies, 1.0, None))
+    old = np.array([np.nan if c is None else c for c in old_coords], dtype=float)
+    dim = 3 if valid >= 4 else 2
+    return _Problem(ap_id, old, positions[keep], distances[keep], accuracies, weights, dim), valid
+
+
+def _finish(problem: _Problem, raw_coords, inliers, strategy: str, elapsed_ms: float) -> SolveResult:
+    """
+    Общий хвост для всех стратегий: сглаживание со старыми координатами и точность по невязкам inliers.
+    """
+    raw = np.asarray(raw_coords, dtype=float)
+    dim = problem.dim
+    if raw.shape[0] < dim or not np.isfinite(raw[:dim]).all():
+        return SolveResult(problem.ap_id, FAILED, strategy, dim, n_obs=len(problem.distances),
+                           reason="решение не найдено", elapsed_ms=elapsed_ms)
+    new = problem.old.copy()
+    new[:dim] = raw[:dim]
+    smoothed = np.where(np.isnan(problem.old), new, SMOOTHING_ALPHA * new + (1 - SMOOTHING_ALPHA) * problem.old)
+    inliers = np.arange(len(problem.distances)) if inliers is None else np.asarray(inliers, dtype=int)
+    diff = problem.positions[inliers, :dim] - smoothed[:dim]
+    accuracy = float(np.mean(np.abs(np.linalg.norm(diff, axis=1) - problem.distances[inliers])))
+    good = problem.accuracies[inliers][problem.accuracies[inliers] < 100.0]
+    if accuracy > ACCURACY_FALLBACK_M and len(good):
+        accuracy = float(good.min())
+    coords = tuple(float(c) for c in smoothed)
+    return SolveResult(problem.ap_id, SOLVED, strategy, dim, coords, accuracy, len(problem.distances),
+                       [int(i) for i in inliers], elapsed_ms=elapsed_ms)
+
+
+class SolverStrategy:
+    """
+    Базовая стратегия. Наследник реализует solve_one (одна AP) или переопределяет
+    solve_many (пакет AP за один вызов, например векторный решатель).
+    """
+    name = "base"
+
+    def __init__(self, **params):
+        self.params = params
+
+    def solve_one(self, problem: _Problem):
+        """
+        Возвращает (сырые координаты [dim], индексы inliers | None).
+        """
+        raise NotImplementedError
+
+    def solve_many(self, problems: list[_Problem]) -> list[SolveResult]:
+        results = []
+        for problem in problems:
+            started = time.perf_counter()
+            try:
+                raw, inliers = self.solve_one(problem)
+            except Exception as e:
+                results.append(SolveResult(problem.ap_id, FAILED, self.name, problem.dim, n_obs=len(problem.distances),
+                                           reason=f"Ошибка оптимизации: {e}",
+                                           elapsed_ms=(time.perf_counter() - started) * 1000))
+                continue
+            results.append(_finish(problem, raw, inliers, self.name, (time.perf_counter() - started) * 1000))
+        return results
+
+
+_STRATEGIES: dict[str, type[SolverStrategy]] = {}
+
+
+def register_strategy(cls: type[SolverStrategy]) -> type[SolverStrategy]:
+    """
+    Декоратор: регистрирует стратегию под cls.name.
+    """
+    _STRATEGIES[cls.name] = cls
+    return cls
+
+
+def available_strategies() -> list[str]:
+    return sorted(_STRATEGIES)
+
+
+def get_strategy(name: str, **params) -> SolverStrategy:
+    try:
+        return _STRATEGIES[name](**params)
+    except KeyError:
+        raise ValueError(f"Неизвестная стратегия решателя: {name} (доступны: {', '.join(available_strategies())})")
+
+
+@register_strategy
+class WLSStrategy(SolverStrategy):
+    """
+    Взвешенные наименьшие квадраты с Huber (2D/3D) — пакетный векторный LM (batch_solver) для всех AP сразу.
+    params: f_scale, max_iter.
+    """
+    name = "wls"
+
+    def solve_many(self, problems: list[_Problem]) -> list[SolveResult]:
+        if not problems:
+            return []
+        started = time.perf_counter()
+        P, D, W, M = pack_observations([
+            (p.positions[:, :p.dim], p.distances, p.weights) for p in problems
+        ])
+        dims = np.array([p.dim for p in problems])
+        X, _ = solve_batch(P, D, W, M, dims, **self.params)
+        per_ap_ms = (time.perf_counter() - started) * 1000 / len(problems)
+        return [_finish(p, X[i], None, self.name, per_ap_ms) for i, p in enumerate(problems)]
+
+
+@register_strategy
+class RansacStrategy(SolverStrategy):
+    """
+    RANSAC + NLS (robust_multilateration_3d) — устойчив к выбросам; при 3 наблюдениях — WLS 2D.
+    params: n_iter, threshold, confidence, seed.
+    """
+    name = "ransac"
+
+    def solve_one(self, problem: _Problem):
+        from app.services.geo_solver import robust_multilateration_3d, weighted_least_squares_2d, weighted_least_squares_3d
+
+        if problem.dim == 2:
+            return weighted_least_squares_2d(problem.positions[:, :2], problem.distances, weights=problem.weights), None
+        params = {"n_iter": 50, "threshold": 5.0, **self.params}
+        try:
+            return robust_multilateration_3d(
+                problem.positions, problem.distances, weights=problem.weights, min_inliers=4, **params
+            )
+        except Exception as e:
+            logger.warning(f"RANSAC не сошёлся для AP {problem.ap_id}, используем WLS 3D: {e}")
+            return weighted_least_squares_3d(problem.positions, problem.distances, weights=problem.weights), None
+
+
+@register_strategy
+class LinearStrategy(SolverStrategy):
+    """
+    Быстрый линейный решатель (линеаризация разностями, как trilaterate_3d) по всем наблюдениям
+    без итераций — дешёвый запасной вариант для плотных зданий.
+    """
+    name = "linear"
+
+    def solve_one(self, problem: _Problem):
+        dim = problem.dim
+        P = problem.positions[:, :dim]
+        D = problem.distances
+        w = np.sqrt(problem.weights[1:])
+        A = 2 * (P[1:] - P[0]) * w[:, None]
+        b = (D[0] ** 2 - D[1:] ** 2 + (P[1:] ** 2).sum(axis=1) - (P[0] ** 2).sum()) * w
+        x, *_ = np.linalg.lstsq(A, b, rcond=None)
+        return x, None
+
+
+@register_strategy
+class IncrementalStrategy(SolverStrategy):
+    """
+    Фильтр Калмана по дальностям (как онлайн-оценка ap_estimator): наблюдения проходят
+    от старых к новым начиная с текущих координат AP, O(1) на наблюдение.
+    """
+    name = "incremental"
+
+    def solve_one(self, problem: _Problem):
+        from app.services.ap_estimator import EstimatorState
+
+        start = np.where(np.isnan(problem.old), problem.positions.mean(axis=0), problem.old)
+        state = EstimatorState.initial(*start, accuracy=None)
+        # Строки наблюдений упорядочены от новых к старым
+        for position, distance, accuracy in zip(problem.positions[::-1], problem.distances[::-1], problem.accuracies[::-1]):
+            state.update(position, float(distance), float(accuracy))
+        return state.x, None
+
+
+def strategy_for_building(building_id: int | None) -> SolverStrategy:
+    """
+    Стратегия для здания: SOLVER_BUILDING_STRATEGIES[building_id] или SOLVER_STRATEGY.
+    """
+    config = settings.SOLVER_BUILDING_STRATEGIES.get(str(building_id)) if building_id is not None else None
+    if config:
+        return get_strategy(config.get("strategy", settings.SOLVER_STRATEGY), **config.get("params", {}))
+    return get_strategy(settings.SOLVER_STRATEGY)
+
+
+def solve_access_points(items: list[tuple], strategy: SolverStrategy | None = None) -> list[SolveResult]:
+    """
+    Пересчитывает пакет AP одной стратегией.
+    items: [(ap_id, building_id, (x, y, z) старые, массив наблюдений OBS_COLUMNS | None), ...].
+    Без явной strategy AP группируются по зданиям и решаются стратегией здания.
+    Возвращает SolveResult в порядке items. Чистая функция (без БД): пригодна для пула процессов.
+    """
+    results: dict[int, SolveResult] = {}
+    groups: dict[str, tuple[SolverStrategy, list[_Problem]]] = {}
+    for ap_id, building_id, old_coords, obs in items:
+        chosen = strategy or strategy_for_building(building_id)
+        problem, valid = _prepare(ap_id, obs, old_coords)
+        if problem is None:
+            results[ap_id] = SolveResult(ap_id, SKIPPED, chosen.name, n_obs=valid,
+                                         reason=f"Недостаточно валидных данных для 2D/3D оптимизации (есть {valid})")
+            continue
+        key = f"{chosen.name}:{sorted(chosen.params.items())}"
+        groups.setdefault(key, (chosen, []))[1].append(problem)
+    for chosen, problems in groups.values():
+        started = time.perf_counter()
+        for result in chosen.solve_many(problems):
+            results[result.ap_id] = result
+        logger.debug(f"Стратегия {chosen.name}: {len(problems)} AP за {(time.perf_counter() - started) * 1000:.1f} мс")
+    return [results[ap_id] for ap_id, *_ in items]
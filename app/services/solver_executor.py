@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "SolverExecutor",
+    "solver_executor",
+]
+
+THREAD = "thread"
+PROCESS = "process"
+
+
+class SolverExecutor:
+    """
+    Выделенный ограниченный пул для численных расчётов (solver_engine, scipy), чтобы
+    CPU-нагрузка не блокировала event loop и не задерживала остальные запросы.
+    - kind: thread (по умолчанию, без сериализации данных) или process (полная изоляция от GIL);
+    - в пул одновременно отдаётся не больше workers задач, остальные ждут своей очереди
+      в корутинах — их число и есть глубина очереди (queued) для мониторинга.
+    Пул создаётся лениво при первом вызове run.
+    """
+
+    def __init__(self, workers: int = settings.SOLVER_EXECUTOR_WORKERS, kind: str = settings.SOLVER_EXECUTOR_KIND):
+        if kind not in (THREAD, PROCESS):
+            raise ValueError(f"Неизвестный тип пула решателя: {kind} (thread или process)")
+        self.workers = max(1, workers)
+        self.kind = kind
+        self._pool: Executor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Семафор привязан к event loop (в тестах loop на каждый asyncio.run свой)
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.workers)
+        if self._pool is None:
+            pool_cls = ProcessPoolExecutor if self.kind == PROCESS else ThreadPoolExecutor
+            self._pool = pool_cls(max_workers=self.workers)
+            logger.info(f"Пул решателя запущен: {self.kind}, воркеров={self.workers}")
+
+    async def run(self, fn, *args):
+        """
+        Выполняет fn(*args) в пуле и возвращает результат. Для kind=process fn и аргументы
+        должны сериализоваться pickle (функции уровня модуля, массивы NumPy, кортежи).
+        """
+        self._ensure_started()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        started = time.perf_counter()
+        try:
+            result = await self._loop.run_in_executor(self._pool, fn, *args)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+            self.running -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        """
+        Состояние пула (для мониторинга): глубина очереди, занятые воркеры, счётчики.
+        """
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Общий пул на процесс
+solver_executor = SolverExecutor()
@@ -0,0 +1,286 @@
+"""
+Векторные тайлы (Mapbox Vector Tile) этажа здания: GET /v1/map/{building_id}/{floor}/tiles/{z}/{x}/{y}.
+
+Сетка тайлов задаётся в локальной метрической системе здания (те же x, y в метрах, что у
+FloorPolygon, AccessPoint и POI) и не зависит от данных:
+- тайл z=0 — квадрат со стороной MAP_TILE_ROOT_SIZE_M с центром в начале координат здания;
+- на уровне z сторона делится на 2^z тайлов; x растёт на восток, y — вниз (с севера на юг),
+  как в XYZ-схеме веб-карт.
+
+Слои тайла: floor (полигоны этажа), access_points, pois. Тайлы генерируются при первом
+запросе и кладутся на диск в MAP_TILE_CACHE_DIR/<building>/<map_version>/<floor>/<z>/<x>/<y>.mvt;
+новая версия карты здания (см. map_sync.bump_map_versions) даёт новый каталог, старые удаляются.
+На диск попадают только непустые тайлы существующих этажей: обход сетки вне этажа (или по
+несуществующим этажам) не раздувает кэш.
+"""
+import asyncio
+import logging
+import os
+import shutil
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.access_point import AccessPoint
+from app.db.models.floor_polygon import FloorPolygon
+from app.db.models.poi import POI
+from app.utils.geometry import pack_points, unpack_points
+from app.utils.mvt import DEFAULT_EXTENT, GEOM_POINT, GEOM_POLYGON, encode_tile, point_geometry, polygon_geometry
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "TILE_MEDIA_TYPE",
+    "FloorFeatures",
+    "TileStore",
+    "tile_store",
+    "tile_bounds",
+    "tile_in_range",
+    "render_tile",
+    "load_floor_features",
+    "get_tile",
+]
+
+TILE_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+# Запас вокруг тайла (в единицах extent), чтобы контуры не обрывались на стыках
+TILE_BUFFER = 64
+# Сколько этажей держать разобранными в памяти процесса для нарезки соседних тайлов
+FEATURES_CACHE_SIZE = 32
+
+
+class FloorFeatures:
+    """
+    Объекты одного этажа для нарезки: полигоны [(id, [(x, y), ...])], AP и POI [(id, x, y, свойства)].
+    """
+    __slots__ = ("polygons", "access_points", "pois")
+
+    def __init__(self, polygons: list, access_points: list, pois: list):
+        self.polygons = polygons
+        self.access_points = access_points
+        self.pois = pois
+
+    @property
+    def empty(self) -> bool:
+        return not (self.polygons or self.access_points or self.pois)
+
+
+def tile_in_range(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= settings.MAP_TILE_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_bounds(z: int, x: int, y: int, root_size: float | None = None) -> tuple[float, float, float, float]:
+    """
+    Границы тайла в локальных метрах: (min_x, min_y, max_x, max_y).
+    """
+    root_size = root_size or settings.MAP_TILE_ROOT_SIZE_M
+    size = root_size / 2 ** z
+    min_x = -root_size / 2 + x * size
+    max_y = root_size / 2 - y * size
+    return min_x, max_y - size, min_x + size, max_y
+
+
+def _clip_ring(ring: list[tuple[float, float]], min_x: float, min_y: float, max_x: float, max_y: float) -> list:
+    """
+    Отсечение кольца по прямоугольнику (Сазерленд — Ходжман).
+    """
+    edges = (
+        (lambda p: p[0] >= min_x, lambda a, b: (min_x, a[1] + (b[1] - a[1]) * (min_x - a[0]) / (b[0] - a[0]))),
+        (lambda p: p[0] <= max_x, lambda a, b: (max_x, a[1] + (b[1] - a[1]) * (max_x - a[0]) / (b[0] - a[0]))),
+        (lambda p: p[1] >= min_y, lambda a, b: (a[0] + (b[0] - a[0]) * (min_y - a[1]) / (b[1] - a[1]), min_y)),
+        (lambda p: p[1] <= max_y, lambda a, b: (a[0] + (b[0] - a[0]) * (max_y - a[1]) / (b[1] - a[1]), max_y)),
+    )
+    for inside, intersect in edges:
+        if not ring:
+            break
+        clipped = []
+        prev = ring[-1]
+        for point in ring:
+            if inside(point):
+                if not inside(prev):
+                    clipped.append(intersect(prev, point))
+                clipped.append(point)
+            elif inside(prev):
+                clipped.append(intersect(prev, point))
+            prev = point
+        ring = clipped
+    return ring
+
+
+def render_tile(features: FloorFeatures, z: int, x: int, y: int, extent: int = DEFAULT_EXTENT) -> bytes:
+    """
+    Нарезает тайл (z, x, y) из объектов этажа и кодирует его в MVT. Пустой тайл — пустые байты.
+    """
+    min_x, min_y, max_x, max_y = tile_bounds(z, x, y)
+    scale = extent / (max_x - min_x)
+    pad = TILE_BUFFER / scale
+    clip = (min_x - pad, min_y - pad, max_x + pad, max_y + pad)
+
+    def to_tile(px: float, py: float) -> tuple[int, int]:
+        return round((px - min_x) * scale), round((max_y - py) * scale)
+
+    def in_clip(px: float, py: float) -> bool:
+        return clip[0] <= px <= clip[2] and clip[1] <= py <= clip[3]
+
+    floor_features = []
+    for polygon_id, ring in features.polygons:
+        xs = [p[0] for p in ring]
+        ys = [p[1] for p in ring]
+        if max(xs) < clip[0] or min(xs) > clip[2] or max(ys) < clip[1] or min(ys) > clip[3]:
+            continue
+        tile_ring = []
+        for point in _clip_ring(ring, *clip):
+            point = to_tile(*point)
+            # Точки, совпавшие после квантования, не нужны
+            if not tile_ring or tile_ring[-1] != point:
+                tile_ring.append(point)
+        while len(tile_ring) > 1 and tile_ring[0] == tile_ring[-1]:
+            tile_ring.pop()
+        geometry = polygon_geometry(tile_ring)
+        if geometry:
+            floor_features.append({"id": polygon_id, "type": GEOM_POLYGON, "geometry": geometry, "properties": {}})
+
+    def point_features(items):
+        return [
+            {"id": item_id, "type": GEOM_POINT, "geometry": point_geometry([to_tile(px, py)]), "properties": properties}
+            for item_id, px, py, properties in items
+            if in_clip(px, py)
+        ]
+
+    return encode_tile(
+        [
+            ("floor", floor_features),
+            ("access_points", point_features(features.access_points)),
+            ("pois", point_features(features.pois)),
+        ],
+        extent,
+    )
+
+
+async def load_floor_features(db: AsyncSession, building_id: int, floor: int) -> FloorFeatures:
+    """
+    Полигоны, AP и POI этажа — по одному запросу на таблицу, только нужные колонки.
+    """
+    result = await db.execute(
+        select(FloorPolygon.id, FloorPolygon.polygon_packed, FloorPolygon.polygon_json)
+        .where(FloorPolygon.building_id == building_id, FloorPolygon.floor == floor)
+    )
+    polygons = []
+    for polygon_id, packed, legacy in result.all():
+        # Упакованный контур читается без разбора JSON: XY-срез массива поверх байтов
+        points = unpack_points(packed) if packed is not None else unpack_points(pack_points(legacy or []))
+        if len(points) >= 3:
+            polygons.append((polygon_id, [tuple(p) for p in points[:, :2].tolist()]))
+    result = await db.execute(
+        select(AccessPoint.id, AccessPoint.x, AccessPoint.y, AccessPoint.bssid, AccessPoint.ssid, AccessPoint.accuracy)
+        .where(AccessPoint.building_id == building_id, AccessPoint.floor == floor)
+    )
+    access_points = [
+        (row.id, row.x, row.y, {"bssid": row.bssid, "ssid": row.ssid, "accuracy": row.accuracy})
+        for row in result.all()
+    ]
+    result = await db.execute(
+        select(POI.id, POI.x, POI.y, POI.type, POI.name)
+        .where(POI.building_id == building_id, POI.floor == floor)
+    )
+    pois = [(row.id, row.x, row.y, {"type": row.type, "name": row.name}) for row in result.all()]
+    return FloorFeatures(polygons, access_points, pois)
+
+
+class TileStore:
+    """
+    Дисковый кэш тайлов: <root>/<building>/<version>/<floor>/<z>/<x>/<y>.mvt.
+    Файлы пишутся атомарно (временный файл + rename), поэтому параллельные генерации
+    одного тайла в разных процессах безопасны.
+    """
+
+    def __init__(self, root: str = settings.MAP_TILE_CACHE_DIR):
+        self.root = root
+
+    def path(self, building_id: int, version: int, floor: int, z: int, x: int, y: int) -> str:
+        return os.path.join(self.root, str(building_id), str(version), str(floor), str(z), str(x), f"{y}.mvt")
+
+    def read(self, path: str) -> bytes | None:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def prune(self, building_id: int, keep_version: int) -> None:
+        """
+        Удаляет тайлы прошлых версий карты здания.
+        """
+        building_dir = os.path.join(self.root, str(building_id))
+        try:
+            names = os.listdir(building_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.isdigit() and int(name) < keep_version:
+                shutil.rmtree(os.path.join(building_dir, name), ignore_errors=True)
+
+
+# Общий дисковый кэш тайлов
+tile_store = TileStore()
+
+_features: OrderedDict[tuple[int, int, int], FloorFeatures] = OrderedDict()
+_feature_locks: dict[tuple[int, int, int], asyncio.Lock] = {}
+
+
+async def _floor_features(db: AsyncSession, building_id: int, version: int, floor: int) -> FloorFeatures:
+    """
+    Объекты этажа версии version из памяти процесса; одновременные промахи (viewer запрашивает
+    десятки тайлов сразу) ждут одну загрузку.
+    """
+    key = (building_id, version, floor)
+    features = _features.get(key)
+    if features is not None:
+        _features.move_to_end(key)
+        return features
+    lock = _feature_locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            features = _features.get(key)
+            if features is None:
+                features = await load_floor_features(db, building_id, floor)
+                _features[key] = features
+                while len(_features) > FEATURES_CACHE_SIZE:
+                    _features.popitem(last=False)
+    finally:
+        # И после ошибки загрузки: иначе замок остался бы в словаре навсегда
+        if _feature_locks.get(key) is lock:
+            del _feature_locks[key]
+    return features
+
+
+async def get_tile(db: AsyncSession, building_id: int, version: int, floor: int, z: int, x: int, y: int) -> bytes | None:
+    """
+    Тайл версии карты version: с диска, иначе генерируется (нарезка и запись — в пуле потоков).
+    None — на этаже нет ни одного объекта; пустой тайл (b"") на диск не пишется.
+    """
+    path = tile_store.path(building_id, version, floor, z, x, y)
+    data = await asyncio.to_thread(tile_store.read, path)
+    if data is not None:
+        return data
+    features = await _floor_features(db, building_id, version, floor)
+    if features.empty:
+        return None
+    data = await asyncio.to_thread(render_tile, features, z, x, y)
+    if not data:
+        return data
+    version_dir = os.path.join(tile_store.root, str(building_id), str(version))
+    first_of_version = not os.path.isdir(version_dir)
+    await asyncio.to_thread(tile_store.write, path, data)
+    if first_of_version:
+        await asyncio.to_thread(tile_store.prune, building_id, version)
+        logger.info(f"Тайлы карты здания {building_id}: новая версия {version}, старые версии удалены")
+    return data
@@ -1,2 +1,3 @@
 # Пакет фоновых задач
 from .scheduler import start_scheduler
+from .recalc_queue import recalc_queue
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import settings
+from app.db.session import async_engine
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    """
+    Выбор лидера среди процессов (uvicorn-воркеров, хостов) через advisory lock Postgres.
+    - Лидер держит сессионную блокировку pg_try_advisory_lock(lock_key) на отдельном соединении
+      и периодически проверяет, что соединение живо.
+    - Остальные раз в check_seconds пытаются взять блокировку. Если лидер умер, Postgres
+      закрывает его сессию и снимает блокировку — следующий претендент становится лидером.
+    - Потеряв соединение, лидер сразу считает себя не лидером (блокировка уже у БД не держится).
+    - Соединение с блокировкой не возвращается в пул: reset-on-return делает только ROLLBACK,
+      и сессионная блокировка пережила бы его на «чужом» соединении пула. Поэтому при отказе
+      от лидерства соединение инвалидируется — Postgres закрывает сессию и снимает блокировку.
+    """
+
+    def __init__(
+        self,
+        lock_key: int = settings.SCHEDULER_LEADER_LOCK_KEY,
+        check_seconds: float = settings.SCHEDULER_LEADER_CHECK_SECONDS,
+        engine: AsyncEngine = async_engine,
+        on_change: Callable[[bool], Awaitable[None] | None] | None = None,
+    ):
+        self.lock_key = lock_key
+        self.check_seconds = check_seconds
+        self.engine = engine
+        self.on_change = on_change
+        self.is_leader = False
+        self._conn: AsyncConnection | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """
+        Запускает цикл выборов в текущем event loop (повторный вызов безопасен).
+        """
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._loop(), name="scheduler-leader-election")
+
+    async def stop(self) -> None:
+        """
+        Останавливает выборы и отпускает блокировку, чтобы другой процесс перехватил лидерство сразу.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._conn is not None:
+            try:
+                await self._conn.execute(select(func.pg_advisory_unlock(self.lock_key)))
+            except Exception as e:
+                logger.debug(f"Не удалось явно снять advisory lock {self.lock_key}: {e}")
+        await self._release()
+
+    async def _set_leader(self, value: bool) -> None:
+        if value == self.is_leader:
+            return
+        self.is_leader = value
+        logger.info(f"Лидерство планировщика {'получено' if value else 'потеряно'} (advisory lock {self.lock_key})")
+        if self.on_change is not None:
+            result = self.on_change(value)
+            if asyncio.iscoroutine(result):
+                await result
+
+    async def _release(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            await self._discard(conn)
+        await self._set_leader(False)
+
+    @staticmethod
+    async def _discard(conn: AsyncConnection) -> None:
+        """
+        Закрывает соединение, которое могло держать блокировку, мимо пула (invalidate).
+        """
+        try:
+            await conn.invalidate()
+        except Exception:
+            pass
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+    async def try_acquire(self) -> bool:
+        """
+        Одна попытка стать лидером (или проверка, что лидерство ещё держится).
+        """
+        try:
+            if self._conn is not None:
+                await self._conn.execute(select(1))
+                return True
+            # AUTOCOMMIT: соединение не висит в открытой транзакции, блокировка сессионная
+            conn = await (await self.engine.connect()).execution_options(isolation_level="AUTOCOMMIT")
+            try:
+                acquired = (await conn.execute(select(func.pg_try_advisory_lock(self.lock_key)))).scalar()
+            except Exception:
+                # Неизвестно, успел ли сервер выдать блокировку — в пул такое соединение не возвращаем
+                await self._discard(conn)
+                raise
+            if not acquired:
+                await conn.close()
+                return False
+            self._conn = conn
+            await self._set_leader(True)
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Ошибка выбора лидера планировщика: {e}")
+            await self._release()
+            return False
+
+    async def _loop(self) -> None:
+        while True:
+            await self.try_acquire()
+            await asyncio.sleep(self.check_seconds)
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from typing import Iterable
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.geo_solver import recalculate_access_point_coords
+
+logger = logging.getLogger(__name__)
+
+
+class RecalcQueue:
+    """
+    Внутрипроцессная очередь пересчёта координат AP.
+    - mark_dirty: помечает AP (по bssid) как «грязные»; повторные отметки одной AP
+      в пределах окна coalesce_seconds сливаются в один пересчёт;
+    - ограниченный пул воркеров (workers) разбирает готовые к пересчёту AP,
+      каждый воркер работает в своей сессии БД;
+    - одна AP никогда не пересчитывается двумя воркерами одновременно.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.RECALC_WORKERS,
+        coalesce_seconds: float = settings.RECALC_COALESCE_SECONDS,
+        max_pending: int = settings.RECALC_MAX_PENDING,
+    ):
+        self.workers = max(1, workers)
+        self.coalesce_seconds = coalesce_seconds
+        self.max_pending = max_pending
+        self._dirty: set[str] = set()
+        self._in_progress: set[str] = set()
+        self._waiters: dict[str, list[asyncio.Future]] = {}
+        self._ready: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.processed = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks) and self._loop is asyncio.get_running_loop()
+
+    def start(self) -> None:
+        """
+        Запускает воркеры в текущем event loop (повторный вызов безопасен).
+        """
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Queue()
+        self._dirty.clear()
+        self._in_progress.clear()
+        self._waiters.clear()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"ap-recalc-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Очередь пересчёта AP запущена: воркеров={self.workers}, окно={self.coalesce_seconds} с")
+
+    async def stop(self) -> None:
+        """
+        Останавливает воркеры; невыполненные ожидания отменяются.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for futures in self._waiters.values():
+            for fut in futures:
+                if not fut.done():
+                    fut.cancel()
+        self._waiters.clear()
+
+    def mark_dirty(self, bssids: Iterable[str], urgent: bool = False) -> dict[str, asyncio.Future]:
+        """
+        Помечает AP как требующие пересчёта.
+        urgent=True — пропустить окно слияния (клиент ждёт новые координаты).
+        Возвращает {bssid: Future}, который завершится после ближайшего пересчёта AP:
+        результат True — AP пересчитана, False — пересчёт не выполнен (очередь переполнена
+        или пересчёт завершился ошибкой).
+        """
+        self.start()
+        futures = {}
+        for bssid in set(bssids):
+            fut = self._loop.create_future()
+            if bssid in self._dirty:
+                self.coalesced += 1
+                self._waiters[bssid].append(fut)
+                if urgent:
+                    self._promote(bssid)
+            elif len(self._dirty) >= self.max_pending:
+                self.dropped += 1
+                logger.warning(f"Очередь пересчёта AP переполнена, AP {bssid} будет пересчитана плановым заданием")
+                fut.set_result(False)
+            else:
+                self._dirty.add(bssid)
+                self._waiters.setdefault(bssid, []).append(fut)
+                if urgent:
+                    self._promote(bssid)
+                else:
+                    self._loop.call_later(self.coalesce_seconds, self._promote, bssid)
+            futures[bssid] = fut
+        return futures
+
+    async def wait_for(self, futures: dict[str, asyncio.Future], timeout: float = settings.RECALC_WAIT_TIMEOUT) -> bool:
+        """
+        Ждёт завершения пересчёта переданных AP не дольше timeout секунд.
+        Возвращает True, если все AP успели пересчитаться (отброшенные при переполнении
+        и упавшие пересчёты дают False).
+        """
+        if not futures:
+            return True
+        done, pending = await asyncio.wait(list(futures.values()), timeout=timeout)
+        return not pending and all(not fut.cancelled() and fut.result() is True for fut in done)
+
+    def stats(self) -> dict:
+        """
+        Текущее состояние очереди (для мониторинга).
+        """
+        return {
+            "dirty": len(self._dirty),
+            "ready": self._ready.qsize() if self._ready is not None else 0,
+            "in_progress": len(self._in_progress),
+            "processed": self.processed,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+    def _promote(self, bssid: str) -> None:
+        if bssid not in self._dirty:
+            return
+        # AP уже пересчитывается другим воркером — ждём его завершения, чтобы не решать дважды параллельно
+        if bssid in self._in_progress:
+            self._loop.call_later(self.coalesce_seconds, self._promote, bssid)
+            return
+        self._dirty.discard(bssid)
+        self._in_progress.add(bssid)
+        self._ready.put_nowait((bssid, self._waiters.pop(bssid, [])))
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            bssid, waiters = await self._ready.get()
+            recalculated = False
+            try:
+                async with AsyncSessionLocal() as session:
+                    await recalculate_access_point_coords(bssid, session)
+                    await session.commit()
+                self.processed += 1
+                recalculated = True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Фоновый пересчёт AP {bssid} завершился ошибкой: {e}")
+            finally:
+                self._in_progress.discard(bssid)
+                self._ready.task_done()
+                for fut in waiters:
+                    if not fut.done():
+                        fut.set_result(recalculated)
+
+
+# Общий экземпляр очереди на процесс
+recalc_queue = RecalcQueue()
@@ -0,0 +1,221 @@
+"""
+Массовый пересчёт координат AP вне веб-процесса, на всех ядрах:
+
+    python -m app.tasks.recompute --workers 8 --chunk-size 5000 --shard building --building 12
+
+Конвейер: асинхронный producer читает из Postgres куски AP (шард — здание или диапазон id)
+вместе с их последними наблюдениями, ProcessPoolExecutor решает куски параллельно,
+результаты записываются в БД пакетами по мере готовности вместе с watermark solved_obs_id
+(как в geo_solver.recompute_batch), поэтому плановый пересчёт не повторяет уже решённые AP.
+В конце печатается сводка.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sqlalchemy import select, func, update
+
+from app.core.config import settings
+from app.db.models.access_point import AccessPoint
+from app.db.models.wifi_obs import WiFiObs
+from app.db.session import AsyncSessionLocal
+from app.services.access_point import AP_UPDATE_CHUNK_ROWS, update_access_point_coords_bulk
+from app.services.observation_loader import load_latest_observations
+from app.services.solver_engine import SKIPPED, solve_access_points
+
+logger = logging.getLogger(__name__)
+
+SHARD_BY_BUILDING = "building"
+SHARD_BY_RANGE = "range"
+
+
+def _solve_chunk(ap_ids: np.ndarray, building_ids: np.ndarray, old_coords: np.ndarray, observations: dict[int, np.ndarray]):
+    """
+    Решает кусок AP в процессе пула движком solver_engine (стратегия — по зданию AP).
+    building_ids — массив объектов: у AP без здания None (стратегия по умолчанию).
+    Возвращает (ap_ids, coords, accuracy, ok, skipped); для 2D-задач z остаётся прежним.
+    """
+    results = solve_access_points([
+        (int(ap_id), None if building_id is None else int(building_id), tuple(old), observations.get(int(ap_id)))
+        for ap_id, building_id, old in zip(ap_ids, building_ids, old_coords)
+    ])
+    index = np.array([i for i, res in enumerate(results) if res.status != SKIPPED], dtype=np.int64)
+    skipped = len(ap_ids) - len(index)
+    coords = np.array([results[i].coords or (np.nan,) * 3 for i in index], dtype=float).reshape(-1, 3)
+    accuracy = np.array([results[i].accuracy if results[i].solved else np.nan for i in index], dtype=float)
+    ok = np.array([results[i].solved for i in index], dtype=bool)
+    return ap_ids[index], coords, accuracy, ok, skipped
+
+
+async def _shard_ap_ids(session, shard_by: str, chunk_size: int, building_ids: list[int] | None):
+    """
+    Генерирует куски id стационарных AP: по зданиям (здание → куски до chunk_size)
+    или по диапазонам id шириной chunk_size.
+    """
+    stationary = AccessPoint.is_mobile == False
+    if building_ids:
+        stationary = stationary & AccessPoint.building_id.in_(building_ids)
+    if shard_by == SHARD_BY_BUILDING:
+        result = await session.execute(
+            select(AccessPoint.building_id).where(stationary).distinct().order_by(AccessPoint.building_id)
+        )
+        for building_id in result.scalars().all():
+            ids = (await session.execute(
+                select(AccessPoint.id)
+                .where(stationary & (AccessPoint.building_id == building_id))
+                .order_by(AccessPoint.id)
+            )).scalars().all()
+            for start in range(0, len(ids), chunk_size):
+                yield ids[start:start + chunk_size]
+    else:
+        lo, hi = (await session.execute(select(func.min(AccessPoint.id), func.max(AccessPoint.id)).where(stationary))).one()
+        if lo is None:
+            return
+        for start in range(lo, hi + 1, chunk_size):
+            ids = (await session.execute(
+                select(AccessPoint.id)
+                .where(stationary & AccessPoint.id.between(start, start + chunk_size - 1))
+                .order_by(AccessPoint.id)
+            )).scalars().all()
+            if ids:
+                yield ids
+
+
+async def _produce(queue: asyncio.Queue, shard_by: str, chunk_size: int, building_ids: list[int] | None) -> None:
+    """
+    Читает куски AP и их наблюдения и кладёт в очередь; очередь ограничена, поэтому чтение
+    идёт на шаг-два впереди решателя. В конце кладёт None, при ошибке — само исключение.
+    """
+    try:
+        async with AsyncSessionLocal() as session:
+            async for ids in _shard_ap_ids(session, shard_by, chunk_size, building_ids):
+                rows = (await session.execute(
+                    select(AccessPoint.id, AccessPoint.building_id, AccessPoint.x, AccessPoint.y, AccessPoint.z)
+                    .where(AccessPoint.id.in_(ids))
+                    .order_by(AccessPoint.id)
+                )).all()
+                ap_ids = np.array([row.id for row in rows], dtype=np.int64)
+                # building_id может быть NULL — объектный массив, None передаётся решателю как есть
+                building_ids_chunk = np.array([row.building_id for row in rows], dtype=object)
+                old_coords = np.array([(row.x, row.y, row.z) for row in rows], dtype=float).reshape(-1, 3)
+                observations = await load_latest_observations(session, ap_ids=ids)
+                await queue.put((ap_ids, building_ids_chunk, old_coords, observations))
+    except Exception as e:
+        await queue.put(e)
+        return
+    await queue.put(None)
+
+
+async def _write_back(chunk_ids: np.ndarray, result, watermark: int, stats: dict) -> None:
+    """
+    Записывает решённый кусок одной транзакцией: координаты (UPDATE ... FROM (VALUES ...),
+    update_access_point_coords_bulk) и watermark solved_obs_id всех AP куска,
+    в т.ч. пропущенных и нерешённых — они ждут новых наблюдений, как в geo_solver.recompute_batch.
+    """
+    ap_ids, coords, accuracy, ok, skipped = result
+    stats["skipped"] += skipped
+    stats["failed"] += int((~ok).sum())
+    rows = [
+        {"id": int(ap_id), "x": float(c[0]), "y": float(c[1]), "z": float(c[2]), "accuracy": float(acc)}
+        for ap_id, c, acc in zip(ap_ids[ok], coords[ok], accuracy[ok])
+    ]
+    ids = [int(ap_id) for ap_id in chunk_ids]
+    async with AsyncSessionLocal() as session:
+        if rows:
+            stats["written"] += await update_access_point_coords_bulk(session, rows)
+        for start in range(0, len(ids), AP_UPDATE_CHUNK_ROWS):
+            await session.execute(
+                update(AccessPoint)
+                .where(AccessPoint.id.in_(ids[start:start + AP_UPDATE_CHUNK_ROWS]))
+                # last_update не трогаем: координаты AP не менялись
+                .values(solved_obs_id=watermark, last_update=AccessPoint.last_update)
+                .execution_options(synchronize_session=False)
+            )
+        await session.commit()
+    stats["solved"] += len(rows)
+
+
+async def run_recompute(
+    workers: int | None = None,
+    chunk_size: int | None = None,
+    shard_by: str = SHARD_BY_RANGE,
+    building_ids: list[int] | None = None,
+) -> dict:
+    """
+    Пересчитывает координаты стационарных AP конвейером producer → ProcessPoolExecutor → запись.
+    Возвращает сводку: обработано/решено/пропущено/ошибок, время, AP в секунду.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or settings.GEO_SOLVER_BATCH_SIZE
+    stats = {"aps": 0, "solved": 0, "written": 0, "skipped": 0, "failed": 0, "chunks": 0}
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    # Watermark фиксируем до чтения: наблюдения, пришедшие позже, попадут в следующий пересчёт
+    async with AsyncSessionLocal() as session:
+        watermark = (await session.execute(select(func.max(WiFiObs.id)))).scalar() or 0
+    producer = asyncio.create_task(_produce(queue, shard_by, chunk_size, building_ids))
+    pending: set[asyncio.Future] = set()
+    chunk_ids: dict[asyncio.Future, np.ndarray] = {}
+
+    async def drain(return_when):
+        nonlocal pending
+        done, pending = await asyncio.wait(pending, return_when=return_when)
+        for fut in done:
+            await _write_back(chunk_ids.pop(fut), fut.result(), watermark, stats)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                stats["aps"] += len(item[0])
+                stats["chunks"] += 1
+                fut = loop.run_in_executor(pool, _solve_chunk, *item)
+                chunk_ids[fut] = item[0]
+                pending.add(fut)
+                if len(pending) >= workers:
+                    await drain(asyncio.FIRST_COMPLETED)
+            if pending:
+                await drain(asyncio.ALL_COMPLETED)
+        finally:
+            producer.cancel()
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["aps_per_second"] = round(stats["aps"] / elapsed, 1) if elapsed > 0 else 0.0
+    return stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.tasks.recompute",
+        description="Параллельный пересчёт координат стационарных точек доступа",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="число процессов-решателей")
+    parser.add_argument("--chunk-size", type=int, default=settings.GEO_SOLVER_BATCH_SIZE, help="AP в одном куске")
+    parser.add_argument(
+        "--shard", choices=(SHARD_BY_RANGE, SHARD_BY_BUILDING), default=SHARD_BY_RANGE,
+        help="разбиение: по диапазонам id AP или по зданиям",
+    )
+    parser.add_argument("--building", type=int, action="append", dest="building_ids", help="только это здание (можно несколько раз)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    stats = asyncio.run(run_recompute(args.workers, args.chunk_size, args.shard, args.building_ids))
+    print(
+        f"AP: {stats['aps']} (кусков {stats['chunks']}), решено {stats['solved']} (записано {stats['written']}), "
+        f"пропущено {stats['skipped']}, ошибок {stats['failed']}; "
+        f"{stats['seconds']:.1f} с, {stats['aps_per_second']:.0f} AP/с"
+    )
+
+
+if __name__ == "__main__":
+    main()
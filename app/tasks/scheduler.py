@@ -1,25 +1,57 @@
+import functools
 import logging
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
+from app.core.config import settings
 from app.db.session import AsyncSessionLocal
 from app.services.geo_solver import update_access_point_positions
 from app.services.map_builder import adjust_building_maps
+from app.services.geocoding import purge_expired_geocode_cache
+from app.services.map_sync import purge_map_tombstones
+from app.services.recompute_priority import recompute_by_priority
+from app.tasks.leader import LeaderElection
 
 logger = logging.getLogger(__name__)
 
 # Инициализируем планировщик
 scheduler = AsyncIOScheduler()
 
+# Планировщик запускается в каждом uvicorn-воркере, но задачи выполняет только лидер
+scheduler_leader = LeaderElection()
+
+def _leader_only(job):
+    """
+    Задача выполняется, только если процесс — лидер (держит advisory lock); остальные её пропускают.
+    """
+    @functools.wraps(job)
+    async def wrapper() -> None:
+        if not scheduler_leader.is_leader:
+            logger.info(f"Job '{job.__name__}' skipped: this process is not the scheduler leader")
+            return
+        await job()
+    return wrapper
+
+@_leader_only
 async def _run_update_job() -> None:
     """
     Обёртка для асинхронного запуска пересчёта координат AP.
     """
     logger.info("Job 'update_access_point_positions' started")
     async with AsyncSessionLocal() as session:
-        await update_access_point_positions(session)
-    logger.info("Job 'update_access_point_positions' finished")
+        summary = await update_access_point_positions(session)
+    logger.info(f"Job 'update_access_point_positions' finished: {summary}")
 
+@_leader_only
+async def _run_priority_recompute_job() -> None:
+    """
+    Обёртка для ежеминутного пересчёта самых приоритетных AP в пределах бюджета времени.
+    """
+    async with AsyncSessionLocal() as session:
+        await recompute_by_priority(session)
+
+@_leader_only
 async def _run_map_adjust_job() -> None:
     """
     Обёртка для запуска автокоррекции карт зданий.
@@ -29,39 +61,116 @@ async def _run_map_adjust_job() -> None:
         await adjust_building_maps(session)
     logger.info("Job 'adjust_building_maps' finished")
 
+@_leader_only
+async def _run_geocode_cache_purge_job() -> None:
+    """
+    Обёртка для очистки просроченных записей кэша геокодирования.
+    """
+    logger.info("Job 'purge_geocode_cache' started")
+    async with AsyncSessionLocal() as session:
+        await purge_expired_geocode_cache(session)
+    logger.info("Job 'purge_geocode_cache' finished")
+
+@_leader_only
+async def _run_map_tombstones_purge_job() -> None:
+    """
+    Обёртка для очистки старых tombstones дельта-синхронизации карт.
+    """
+    logger.info("Job 'purge_map_tombstones' started")
+    async with AsyncSessionLocal() as session:
+        await purge_map_tombstones(session)
+    logger.info("Job 'purge_map_tombstones' finished")
+
 def start_scheduler() -> None:
     """
     Запускает APScheduler и добавляет задачи:
-    - update_ap_positions: каждый день в 3:00 утра
+    - recompute_ap_priority: каждую минуту, в пределах RECOMPUTE_BUDGET_SECONDS_PER_MINUTE
+      (при RECOMPUTE_CONTINUOUS_ENABLED), иначе update_ap_positions: каждый день в 3:00 утра
     - adjust_building_maps: каждый день в 4:00 утра
+    - purge_geocode_cache: каждый день в 4:30 утра
+    - purge_map_tombstones: каждый день в 4:45 утра
+    Задачи выполняет только процесс-лидер (scheduler_leader); выборы запускаются здесь же.
     """
     # Удаляем старые задачи, если были, перед повторной регистрацией
     try:
         scheduler.remove_job('update_ap_positions')
     except Exception:
         pass
+    try:
+        scheduler.remove_job('recompute_ap_priority')
+    except Exception:
+        pass
     try:
         scheduler.remove_job('adjust_building_maps')
     except Exception:
         pass
+    try:
+        scheduler.remove_job('purge_geocode_cache')
+    except Exception:
+        pass
+    try:
+        scheduler.remove_job('purge_map_tombstones')
+    except Exception:
+        pass
 
-    # Добавляем задачу пересчёта координат AP (ежедневно в 03:00)
+    if settings.RECOMPUTE_CONTINUOUS_ENABLED:
+        # Непрерывный пересчёт: худшие AP первыми, нагрузка равномерно в течение суток
+        scheduler.add_job(
+            _run_priority_recompute_job,
+            trigger=IntervalTrigger(minutes=1),
+            id='recompute_ap_priority',
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1
+        )
+    else:
+        # Добавляем задачу пересчёта координат AP (ежедневно в 03:00)
+        scheduler.add_job(
+            _run_update_job,
+            trigger=CronTrigger(hour=3, minute=0),
+            id='update_ap_positions',
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1
+        )
+    # Добавляем задачу автокорректировки карт зданий (ежедневно в 04:00)
     scheduler.add_job(
-        _run_update_job,
-        trigger=CronTrigger(hour=3, minute=0),
-        id='update_ap_positions',
+        _run_map_adjust_job,
+        trigger=CronTrigger(hour=4, minute=0),
+        id='adjust_building_maps',
         replace_existing=True,
         coalesce=True,
         max_instances=1
     )
-    # Добавляем задачу автокорректировки карт зданий (ежедневно в 04:00)
+    # Добавляем задачу очистки кэша геокодирования (ежедневно в 04:30)
     scheduler.add_job(
-        _run_map_adjust_job,
-        trigger=CronTrigger(hour=4, minute=0),
-        id='adjust_building_maps',
+        _run_geocode_cache_purge_job,
+        trigger=CronTrigger(hour=4, minute=30),
+        id='purge_geocode_cache',
+        replace_existing=True,
+        coalesce=True,
+        max_instances=1
+    )
+    # Добавляем задачу очистки журнала удалений карт (ежедневно в 04:45)
+    scheduler.add_job(
+        _run_map_tombstones_purge_job,
+        trigger=CronTrigger(hour=4, minute=45),
+        id='purge_map_tombstones',
         replace_existing=True,
         coalesce=True,
         max_instances=1
     )
-    scheduler.start()
-    logger.info("Scheduler started: job 'update_ap_positions' scheduled at 03:00 and job 'adjust_building_maps' at 04:00 daily")
+    scheduler_leader.start()
+    if not scheduler.running:
+        scheduler.start()
+    recompute = "'recompute_ap_priority' every minute" if settings.RECOMPUTE_CONTINUOUS_ENABLED else "'update_ap_positions' at 03:00 daily"
+    logger.info(f"Scheduler started: {recompute}, 'adjust_building_maps' at 04:00 and 'purge_geocode_cache' at 04:30 daily")
+
+
+async def stop_scheduler() -> None:
+    """
+    Останавливает планировщик и отпускает лидерство, чтобы его сразу перехватил другой процесс.
+    """
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    await scheduler_leader.stop()
@@ -0,0 +1,148 @@
+"""
+Воркер общей очереди заданий пересчёта (таблица recompute_jobs):
+
+    python -m app.tasks.worker --batch-size 50
+
+Воркеров можно запускать сколько угодно на любых хостах с доступом к БД: задания
+разбираются через SELECT ... FOR UPDATE SKIP LOCKED, поэтому каждое выполняет ровно один
+воркер. Упавшее задание повторяется с экспоненциальной задержкой, зависшее (воркер убит)
+возвращается в очередь по истечении JOB_QUEUE_LEASE_SECONDS.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.geo_solver import recalculate_access_point_coords
+from app.services.job_queue import JOB_RECALC_AP, complete_jobs, dequeue_jobs, fail_job, requeue_stale_jobs
+
+logger = logging.getLogger(__name__)
+
+# Предел паузы между попытками после ошибок БД в цикле воркера
+WORKER_MAX_BACKOFF_SECONDS = 60.0
+
+
+async def _recalc_ap(session, payload: dict) -> None:
+    await recalculate_access_point_coords(payload["bssid"], session)
+
+
+# Обработчики по типу задания: async (session, payload) -> None, без коммита
+JOB_HANDLERS = {
+    JOB_RECALC_AP: _recalc_ap,
+}
+
+
+async def _run_job(job, stats: dict) -> None:
+    """
+    Выполняет задание в своей транзакции: результат обработчика и удаление задания
+    фиксируются одним коммитом; при ошибке — откат и повтор/failed отдельной транзакцией.
+    """
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"Нет обработчика для задания типа {job.kind}")
+        async with AsyncSessionLocal() as session:
+            await handler(session, job.payload)
+            await complete_jobs(session, [job.id])
+            await session.commit()
+        stats["done"] += 1
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"Задание {job.id} ({job.kind}) завершилось ошибкой: {e}")
+        try:
+            async with AsyncSessionLocal() as session:
+                retried = await fail_job(session, job, f"{type(e).__name__}: {e}")
+                await session.commit()
+        except Exception:
+            # Задание остаётся running и вернётся в очередь по истечении JOB_QUEUE_LEASE_SECONDS
+            logger.exception(f"Не удалось записать ошибку задания {job.id}")
+            return
+        stats["retried" if retried else "failed"] += 1
+
+
+async def run_worker(
+    worker_id: str | None = None,
+    batch_size: int | None = None,
+    poll_seconds: float | None = None,
+    once: bool = False,
+    stop: asyncio.Event | None = None,
+) -> dict:
+    """
+    Разбирает очередь, пока не установлен stop (или до первой пустой выборки при once=True).
+    Ошибки БД при выборке не останавливают воркер: пауза с экспоненциальным ростом
+    (до WORKER_MAX_BACKOFF_SECONDS) и новая попытка.
+    Возвращает счётчики: выполнено / повторов / failed / возвращено зависших.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    batch_size = batch_size or settings.JOB_QUEUE_BATCH_SIZE
+    poll_seconds = poll_seconds if poll_seconds is not None else settings.JOB_QUEUE_POLL_SECONDS
+    stop = stop or asyncio.Event()
+    stats = {"done": 0, "retried": 0, "failed": 0, "requeued": 0}
+    next_reap = 0.0
+    errors = 0
+    logger.info(f"Воркер очереди {worker_id} запущен: пакет {batch_size}")
+    while not stop.is_set():
+        try:
+            async with AsyncSessionLocal() as session:
+                if time.monotonic() >= next_reap:
+                    stats["requeued"] += await requeue_stale_jobs(session)
+                    next_reap = time.monotonic() + settings.JOB_QUEUE_LEASE_SECONDS / 2
+                jobs = await dequeue_jobs(session, worker_id, batch_size)
+                await session.commit()
+        except Exception:
+            errors += 1
+            delay = min(max(poll_seconds, 0.5) * 2 ** (errors - 1), WORKER_MAX_BACKOFF_SECONDS)
+            logger.exception(f"Воркер {worker_id}: ошибка выборки заданий, повтор через {delay:.1f} с")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        errors = 0
+        if not jobs:
+            if once:
+                break
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        for job in jobs:
+            await _run_job(job, stats)
+    logger.info(f"Воркер очереди {worker_id} остановлен: {stats}")
+    return stats
+
+
+async def _main(args) -> dict:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Текущий пакет дорабатывается, новые задания не берутся
+        loop.add_signal_handler(sig, stop.set)
+    return await run_worker(args.worker_id, args.batch_size, args.poll_seconds, args.once, stop)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.tasks.worker",
+        description="Воркер общей очереди заданий пересчёта координат AP",
+    )
+    parser.add_argument("--worker-id", default=None, help="имя воркера (по умолчанию host:pid)")
+    parser.add_argument("--batch-size", type=int, default=settings.JOB_QUEUE_BATCH_SIZE, help="заданий за одну выборку")
+    parser.add_argument("--poll-seconds", type=float, default=settings.JOB_QUEUE_POLL_SECONDS, help="пауза при пустой очереди")
+    parser.add_argument("--once", action="store_true", help="выйти, когда очередь опустеет")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    stats = asyncio.run(_main(args))
+    print(f"Выполнено {stats['done']}, повторов {stats['retried']}, failed {stats['failed']}, возвращено зависших {stats['requeued']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+import heapq
+import json
+import logging
+import math
+import xml.etree.ElementTree as ET
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Метры на градус (та же локальная метрика, что и при переводе lat/lon скана в x/y здания)
+M_PER_DEG_LAT = 110574
+M_PER_DEG_LON = 111320
+
+
+class Footprint:
+    """
+    Контур здания из OSM-выгрузки: кольца (lon, lat) и атрибуты для ответа геокодера.
+    """
+    __slots__ = ("osm_type", "osm_id", "name", "display_name", "address", "rings", "bbox")
+
+    def __init__(self, osm_type: str, osm_id: Optional[int], name: Optional[str],
+                 display_name: str, address: dict, rings: Sequence[Sequence[Sequence[float]]]):
+        self.osm_type = osm_type
+        self.osm_id = osm_id
+        self.name = name
+        self.display_name = display_name
+        self.address = address
+        self.rings = [[(float(x), float(y)) for x, y in ring] for ring in rings]
+        xs = [x for ring in self.rings for x, _ in ring]
+        ys = [y for ring in self.rings for _, y in ring]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+
+    def contains(self, lon: float, lat: float) -> bool:
+        return any(_point_in_ring(ring, lon, lat) for ring in self.rings)
+
+    def distance_m(self, lon: float, lat: float) -> float:
+        """
+        Расстояние (м) от точки до контура; 0 — точка внутри здания.
+        """
+        if self.contains(lon, lat):
+            return 0.0
+        kx = math.cos(math.radians(lat)) * M_PER_DEG_LON
+        return min(_distance_to_ring(ring, lon, lat, kx) for ring in self.rings)
+
+    def as_geocode_result(self, distance_m: float = 0.0) -> dict:
+        """
+        Ответ в форме Nominatim jsonv2 (osm_id / name / display_name / address).
+        """
+        return {
+            "osm_type": self.osm_type,
+            "osm_id": self.osm_id,
+            "name": self.name,
+            "display_name": self.display_name,
+            "address": self.address,
+            "category": "building",
+            "distance_m": distance_m,
+            "source": "local",
+        }
+
+
+def _point_in_ring(ring: Sequence[tuple], x: float, y: float) -> bool:
+    # Ray casting; у зданий единицы–десятки вершин, поэтому чистый Python быстрее NumPy
+    inside = False
+    xj, yj = ring[-1]
+    for xi, yi in ring:
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        xj, yj = xi, yi
+    return inside
+
+
+def _distance_to_ring(ring: Sequence[tuple], lon: float, lat: float, kx: float) -> float:
+    # Расстояние до ближайшего ребра в локальной метрике (м)
+    best = math.inf
+    ax, ay = (ring[-1][0] - lon) * kx, (ring[-1][1] - lat) * M_PER_DEG_LAT
+    for px, py in ring:
+        bx, by = (px - lon) * kx, (py - lat) * M_PER_DEG_LAT
+        dx, dy = bx - ax, by - ay
+        denom = dx * dx + dy * dy
+        t = 0.0 if denom == 0 else min(1.0, max(0.0, -(ax * dx + ay * dy) / denom))
+        cx, cy = ax + dx * t, ay + dy * t
+        best = min(best, cx * cx + cy * cy)
+        ax, ay = bx, by
+    return math.sqrt(best)
+
+
+class STRTree:
+    """
+    Статическое R-дерево, упакованное по алгоритму Sort-Tile-Recursive.
+    boxes: массив (n, 4) — minx, miny, maxx, maxy.
+    """
+
+    def __init__(self, boxes: np.ndarray, node_capacity: int = 16):
+        self.node_capacity = max(2, node_capacity)
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        self.size = len(boxes)
+        # levels[0] — листья (сами объекты), levels[-1] — корень.
+        # Каждый уровень: (bbox узлов, индекс первого ребёнка, индекс за последним ребёнком)
+        order = self._str_order(boxes, np.arange(self.size))
+        self.item_ids = order
+        level_boxes = boxes[order]
+        self.levels = [(level_boxes, None, None)]
+        while len(level_boxes) > 1:
+            starts = np.arange(0, len(level_boxes), self.node_capacity)
+            ends = np.minimum(starts + self.node_capacity, len(level_boxes))
+            parent = np.column_stack((
+                np.minimum.reduceat(level_boxes[:, 0], starts),
+                np.minimum.reduceat(level_boxes[:, 1], starts),
+                np.maximum.reduceat(level_boxes[:, 2], starts),
+                np.maximum.reduceat(level_boxes[:, 3], starts),
+            ))
+            self.levels.append((parent, starts, ends))
+            level_boxes = parent
+        # Обход дерева идёт по маленьким узлам — списки кортежей быстрее массивов NumPy
+        self.levels = [
+            ([tuple(b) for b in boxes_.tolist()],
+             starts.tolist() if starts is not None else None,
+             ends.tolist() if ends is not None else None)
+            for boxes_, starts, ends in self.levels
+        ]
+        self.item_ids = order.tolist()
+
+    def _str_order(self, boxes: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        # Sort-Tile-Recursive: вертикальные полосы по x, внутри полосы — сортировка по y
+        if len(ids) <= self.node_capacity:
+            return ids
+        cx = (boxes[ids, 0] + boxes[ids, 2]) / 2
+        cy = (boxes[ids, 1] + boxes[ids, 3]) / 2
+        n_leaves = math.ceil(len(ids) / self.node_capacity)
+        n_slices = math.ceil(math.sqrt(n_leaves))
+        by_x = ids[np.argsort(cx, kind="stable")]
+        slice_size = n_slices * self.node_capacity
+        out = []
+        for i in range(0, len(by_x), slice_size):
+            part = by_x[i:i + slice_size]
+            part_cy = (boxes[part, 1] + boxes[part, 3]) / 2
+            out.append(part[np.argsort(part_cy, kind="stable")])
+        return np.concatenate(out)
+
+    def _children(self, level: int, node: int) -> range:
+        _, starts, ends = self.levels[level]
+        return range(starts[node], ends[node])
+
+    def query_point(self, x: float, y: float) -> list[int]:
+        """
+        Индексы объектов, чей bbox содержит точку.
+        """
+        if self.size == 0:
+            return []
+        found = []
+        stack = [(len(self.levels) - 1, 0)]
+        while stack:
+            level, node = stack.pop()
+            if level == 0:
+                found.append(self.item_ids[node])
+                continue
+            child_boxes = self.levels[level - 1][0]
+            for child in self._children(level, node):
+                minx, miny, maxx, maxy = child_boxes[child]
+                if minx <= x <= maxx and miny <= y <= maxy:
+                    stack.append((level - 1, child))
+        return found
+
+    def nearest(self, x: float, y: float, distance_fn, kx: float = 1.0, ky: float = 1.0,
+                max_distance: float = math.inf) -> tuple[Optional[int], float]:
+        """
+        Ближайший объект (best-first поиск). distance_fn(item_id) — точное расстояние до объекта,
+        kx/ky — масштаб осей для нижней оценки расстояния до bbox.
+        Возвращает (индекс объекта, расстояние) или (None, inf).
+        """
+        if self.size == 0:
+            return None, math.inf
+        root = len(self.levels) - 1
+        heap = [(self._box_distance(self.levels[root][0][0], x, y, kx, ky), 0, root, 0)]
+        while heap:
+            dist, exact, level, node = heapq.heappop(heap)
+            if dist > max_distance:
+                break
+            if exact:
+                return node, dist
+            if level == 0:
+                item = self.item_ids[node]
+                heapq.heappush(heap, (distance_fn(item), 1, -1, item))
+                continue
+            child_boxes = self.levels[level - 1][0]
+            for child in self._children(level, node):
+                d = self._box_distance(child_boxes[child], x, y, kx, ky)
+                if d <= max_distance:
+                    heapq.heappush(heap, (d, 0, level - 1, child))
+        return None, math.inf
+
+    @staticmethod
+    def _box_distance(box, x: float, y: float, kx: float, ky: float) -> float:
+        dx = max(box[0] - x, 0.0, x - box[2]) * kx
+        dy = max(box[1] - y, 0.0, y - box[3]) * ky
+        return math.hypot(dx, dy)
+
+
+class FootprintIndex:
+    """
+    Локальный геокодер по контурам зданий: точка внутри контура, иначе ближайшее здание.
+    """
+
+    def __init__(self, footprints: Iterable[Footprint], node_capacity: int = 16):
+        self.footprints = list(footprints)
+        boxes = np.array([fp.bbox for fp in self.footprints], dtype=float).reshape(-1, 4)
+        self.tree = STRTree(boxes, node_capacity=node_capacity)
+
+    def __len__(self) -> int:
+        return len(self.footprints)
+
+    def lookup(self, lat: float, lon: float, max_distance_m: float = 0.0) -> Optional[dict]:
+        """
+        Здание, содержащее точку; если такого нет — ближайшее в пределах max_distance_m.
+        Возвращает словарь в форме ответа Nominatim или None.
+        """
+        for i in self.tree.query_point(lon, lat):
+            if self.footprints[i].contains(lon, lat):
+                return self.footprints[i].as_geocode_result()
+        if max_distance_m <= 0:
+            return None
+        kx = math.cos(math.radians(lat)) * M_PER_DEG_LON
+        i, dist = self.tree.nearest(
+            lon, lat,
+            lambda item: self.footprints[item].distance_m(lon, lat),
+            kx=kx, ky=M_PER_DEG_LAT, max_distance=max_distance_m,
+        )
+        if i is None:
+            return None
+        return self.footprints[i].as_geocode_result(distance_m=dist)
+
+
+def _display_name(name: Optional[str], tags: dict) -> str:
+    street = " ".join(p for p in (tags.get("addr:street"), tags.get("addr:housenumber")) if p)
+    parts = [p for p in (name, street, tags.get("addr:city")) if p]
+    return ", ".join(parts) or "Unknown address"
+
+
+def _make_footprint(osm_type: str, osm_id, tags: dict, rings) -> Optional[Footprint]:
+    rings = [[(p[0], p[1]) for p in r] for r in rings if len(r) >= 3]
+    if not rings:
+        return None
+    name = tags.get("name")
+    address = {k[5:]: v for k, v in tags.items() if k.startswith("addr:")}
+    if name:
+        address["building"] = name
+    try:
+        osm_id = int(osm_id) if osm_id is not None else None
+    except (TypeError, ValueError):
+        osm_id = None
+    return Footprint(osm_type, osm_id, name, _display_name(name, tags), address, rings)
+
+
+def load_geojson(path: str) -> list[Footprint]:
+    """
+    Загружает контуры из GeoJSON FeatureCollection (Polygon / MultiPolygon).
+    Идентификатор берётся из properties.osm_id, properties["@id"] или feature.id ("way/123").
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    footprints = []
+    for feature in data.get("features", []):
+        geom = feature.get("geometry") or {}
+        props = feature.get("properties") or {}
+        if geom.get("type") == "Polygon":
+            rings = [geom["coordinates"][0]]
+        elif geom.get("type") == "MultiPolygon":
+            rings = [poly[0] for poly in geom["coordinates"]]
+        else:
+            continue
+        raw_id = props.get("osm_id", props.get("@id", feature.get("id")))
+        osm_type = props.get("osm_type", "way")
+        if isinstance(raw_id, str) and "/" in raw_id:
+            osm_type, raw_id = raw_id.split("/", 1)
+        fp = _make_footprint(osm_type, raw_id, props, rings)
+        if fp is not None:
+            footprints.append(fp)
+    return footprints
+
+
+def load_osm_xml(path: str) -> list[Footprint]:
+    """
+    Загружает контуры зданий (way с тегом building) из OSM XML-выгрузки (.osm).
+    """
+    nodes: dict[str, tuple[float, float]] = {}
+    footprints = []
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "node":
+            nodes[elem.get("id")] = (float(elem.get("lon")), float(elem.get("lat")))
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+            if "building" in tags:
+                ring = [nodes[nd.get("ref")] for nd in elem.iter("nd") if nd.get("ref") in nodes]
+                fp = _make_footprint("way", elem.get("id"), tags, [ring])
+                if fp is not None:
+                    footprints.append(fp)
+            elem.clear()
+    return footprints
+
+
+def load_footprint_index(path: str) -> FootprintIndex:
+    """
+    Строит FootprintIndex из файла: .osm — OSM XML, иначе GeoJSON.
+    """
+    footprints = load_osm_xml(path) if path.endswith(".osm") else load_geojson(path)
+    logger.info(f"Загружено контуров зданий: {len(footprints)} из {path}")
+    return FootprintIndex(footprints)
@@ -182,11 +182,41 @@ async def recalculate_access_point_coords(bssid: str, db: AsyncSession):
 
 import httpx
 
+from app.core.config import settings
+
+# Общий HTTP-клиент с пулом соединений (создаётся при первом обращении)
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Возвращает общий httpx.AsyncClient (keep-alive, пул соединений) для внешних запросов.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=settings.GEOCODE_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            headers={"User-Agent": "navigation-diploma/1.0"},
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """
+    Закрывает общий HTTP-клиент (при остановке приложения).
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
 async def reverse_geocode_osm(lat: float, lon: float) -> dict:
     """
     Асинхронно получает информацию о здании по координатам через OSM Nominatim.
+    Без кэша — для кэшируемых запросов используйте app.services.geocoding.reverse_geocode.
     """
-    url = "https://nominatim.openstreetmap.org/reverse"
     params = {
         "format": "jsonv2",
         "lat": lat,
@@ -195,10 +225,6 @@ async def reverse_geocode_osm(lat: float, lon: float) -> dict:
         "extratags": 1,
         "zoom": 18
     }
-    headers = {
-        "User-Agent": "navigation-diploma/1.0"
-    }
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, params=params, headers=headers, timeout=10)
-        resp.raise_for_status()
-        return resp.json()
\ No newline at end of file
+    resp = await get_http_client().get(settings.NOMINATIM_URL, params=params)
+    resp.raise_for_status()
+    return resp.json()
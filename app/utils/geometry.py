@@ -0,0 +1,116 @@
+from typing import Sequence
+
+import numpy as np
+
+__all__ = [
+    "POINTS_DTYPE",
+    "pack_points",
+    "unpack_points",
+    "douglas_peucker_mask",
+    "simplify_ring",
+    "build_polygon_lods",
+    "polygon_for_lod",
+]
+
+# Упакованный контур: little-endian float64, по три числа (x, y, z) на точку
+POINTS_DTYPE = np.dtype("<f8")
+
+
+def pack_points(points: Sequence[Sequence[float]]) -> bytes:
+    """
+    Упаковывает [[x, y, z], …] в байты (N×3 little-endian float64). У точек [x, y] z = 0.
+    """
+    arr = np.asarray(points, dtype=POINTS_DTYPE)
+    if arr.size == 0:
+        return b""
+    if arr.ndim != 2 or arr.shape[1] not in (2, 3):
+        raise ValueError("Контур должен быть списком точек [x, y, z] или [x, y]")
+    if arr.shape[1] == 2:
+        arr = np.column_stack([arr, np.zeros(len(arr), dtype=POINTS_DTYPE)])
+    return np.ascontiguousarray(arr).tobytes()
+
+
+def unpack_points(data: bytes) -> np.ndarray:
+    """
+    Массив N×3 поверх байтов упакованного контура — без копирования (только для чтения).
+    """
+    return np.frombuffer(data, dtype=POINTS_DTYPE).reshape(-1, 3)
+
+
+def douglas_peucker_mask(xy: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Алгоритм Дугласа — Пекера для ломаной xy (N×2): маска вершин, которые нужно оставить.
+    Первая и последняя вершины остаются всегда. Итеративно (стек), без рекурсии.
+    """
+    n = len(xy)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a = xy[start]
+        seg = xy[end] - a
+        rel = xy[start + 1:end] - a
+        seg_len = np.hypot(seg[0], seg[1])
+        if seg_len == 0:
+            # Замкнутый участок (начало совпадает с концом): расстояние до точки
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / seg_len
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            idx = start + 1 + i
+            keep[idx] = True
+            stack.append((start, idx))
+            stack.append((idx, end))
+    return keep
+
+
+def simplify_ring(ring: Sequence[Sequence[float]], tolerance: float) -> list[list[float]] | None:
+    """
+    Упрощает контур [[x, y, z], …] с допуском tolerance (м) в плоскости XY; z сохраняется
+    у оставшихся вершин. Замкнутый контур (последняя точка равна первой) остаётся замкнутым.
+    None, если после упрощения остаётся меньше трёх вершин.
+    """
+    points = np.asarray(ring, dtype=float)
+    closed = len(points) > 1 and np.array_equal(points[0], points[-1])
+    body = points[:-1] if closed else points
+    if len(body) <= 3:
+        return [list(p) for p in ring]
+    # Кольцо обходится от первой вершины до неё же: самая дальняя от неё точка попадает в результат
+    xy = np.vstack([body[:, :2], body[:1, :2]])
+    simplified = body[douglas_peucker_mask(xy, tolerance)[:-1]]
+    if len(simplified) < 3:
+        return None
+    if closed:
+        simplified = np.vstack([simplified, simplified[:1]])
+    return simplified.tolist()
+
+
+def build_polygon_lods(polygon: Sequence[Sequence[float]], tolerances: Sequence[float]) -> list[dict]:
+    """
+    Уровни детализации контура этажа: [{"tolerance": t, "polygon": [[x, y, z], …]}, …]
+    по возрастанию допуска. Уровень, схлопнувшийся до отрезка, повторяет предыдущий.
+    """
+    lods = []
+    previous = [list(p) for p in polygon]
+    for tolerance in sorted(tolerances):
+        simplified = simplify_ring(polygon, tolerance)
+        if simplified is not None:
+            previous = simplified
+        lods.append({"tolerance": tolerance, "polygon": previous})
+    return lods
+
+
+def polygon_for_lod(polygon: list, lods: list | None, lod: int) -> list:
+    """
+    Контур для уровня детализации lod: 0 — исходный, 1..N — из lods (больше N — самый грубый).
+    Если уровни ещё не посчитаны, отдаётся исходный контур.
+    """
+    if lod <= 0 or not lods:
+        return polygon
+    return lods[min(lod, len(lods)) - 1]["polygon"]
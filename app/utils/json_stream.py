@@ -0,0 +1,144 @@
+import codecs
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Optional, Tuple
+
+
+class JSONStreamError(ValueError):
+    """
+    Поток нельзя разобрать дальше (битый JSON-массив или слишком большой элемент).
+    """
+    pass
+
+
+_WHITESPACE = " \t\r\n"
+# Ошибка разбора ближе этого к концу буфера может быть обрывом токена на границе чанка
+# (true, false, null, \uXXXX); дальше от конца — элемент битый, новые данные его не исправят
+_TOKEN_TAIL = 6
+
+# Что ожидается в JSON-массиве дальше
+_VALUE_OR_END = "value_or_end"  # сразу после '['
+_VALUE = "value"  # после ','
+_SEPARATOR = "separator"  # после элемента: ',' или ']'
+
+
+def _may_complete(e: json.JSONDecodeError) -> bool:
+    """
+    True, если элемент, на котором споткнулся разбор, может оказаться целым после следующих чанков.
+    """
+    return e.msg.startswith("Unterminated string") or e.pos >= len(e.doc) - _TOKEN_TAIL
+
+
+async def iter_json_items(
+    chunks: AsyncIterable[bytes],
+    ndjson: bool = False,
+    max_item_bytes: int = 1024 * 1024,
+) -> AsyncIterator[Tuple[Optional[Any], Optional[str]]]:
+    """
+    Инкрементально разбирает поток байтов на JSON-объекты, не держа в памяти всё тело.
+
+    Args:
+        chunks: асинхронный поток байтов (например, Request.stream()).
+        ndjson: True — NDJSON (по объекту в строке), False — JSON-массив [obj, obj, …].
+        max_item_bytes: максимальный размер одного элемента.
+
+    Yields:
+        (объект, None) для успешно разобранного элемента либо (None, ошибка) для битой
+        строки NDJSON — разбор продолжается со следующей строки.
+
+    Raises:
+        JSONStreamError: если JSON-массив повреждён или элемент больше max_item_bytes.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parser = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    started = False  # для JSON-массива: открывающая '[' уже прочитана
+    finished = False  # для JSON-массива: закрывающая ']' уже прочитана
+    expect = _VALUE_OR_END
+    # Сколько символов недоразобранного элемента было в буфере при последней попытке: повторяем
+    # разбор, только когда их стало вдвое больше, — длинный элемент не разбирается заново на каждом чанке
+    attempted = 0
+
+    stream = chunks.__aiter__()
+    eof = False
+    while not eof:
+        try:
+            chunk = await stream.__anext__()
+            buf = buf[pos:] + decoder.decode(chunk)
+        except StopAsyncIteration:
+            eof = True
+            buf = buf[pos:] + decoder.decode(b"", final=True)
+        pos = 0
+
+        if ndjson:
+            while True:
+                nl = buf.find("\n", pos)
+                if nl < 0:
+                    if eof:
+                        nl = len(buf)
+                    else:
+                        break
+                line = buf[pos:nl].strip()
+                pos = nl + 1
+                if line:
+                    try:
+                        yield json.loads(line), None
+                    except json.JSONDecodeError as e:
+                        yield None, f"Некорректный JSON: {e.msg}"
+                if pos > len(buf):
+                    break
+            if len(buf) - pos > max_item_bytes:
+                raise JSONStreamError("Слишком большой элемент NDJSON")
+            continue
+
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buf):
+                break
+            if finished:
+                raise JSONStreamError("Лишние данные после конца JSON-массива")
+            if not started:
+                if buf[pos] != "[":
+                    raise JSONStreamError("Ожидался JSON-массив")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                if expect == _VALUE:
+                    raise JSONStreamError("Лишняя запятая перед концом JSON-массива")
+                finished = True
+                pos += 1
+                continue
+            if buf[pos] == ",":
+                if expect != _SEPARATOR:
+                    raise JSONStreamError("Лишняя запятая в JSON-массиве")
+                expect = _VALUE
+                pos += 1
+                continue
+            if expect == _SEPARATOR:
+                raise JSONStreamError("Между элементами JSON-массива ожидалась запятая")
+            pending = len(buf) - pos
+            if not eof and pending < 2 * attempted and pending <= max_item_bytes:
+                break
+            try:
+                item, end = parser.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if eof or not _may_complete(e):
+                    raise JSONStreamError(f"Некорректный JSON: {e.msg}")
+                attempted = pending
+                break
+            if end == len(buf) and not eof:
+                # Элемент мог оборваться на границе чанка — дожидаемся разделителя
+                break
+            pos = end
+            attempted = 0
+            expect = _SEPARATOR
+            yield item, None
+        if len(buf) - pos > max_item_bytes:
+            raise JSONStreamError("Слишком большой элемент JSON-массива")
+
+    if not ndjson and started and not finished:
+        raise JSONStreamError("JSON-массив не закрыт")
+    if not ndjson and not started:
+        raise JSONStreamError("Пустое тело запроса")
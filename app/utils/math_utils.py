@@ -52,3 +52,24 @@ def mean(values: Sequence[float]) -> float:
     if not values:
         raise ValueError("Cannot compute mean of empty sequence")
     return sum(values) / len(values)
+
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    Расстояние по большому кругу (метры) между точками; векторизовано по NumPy-массивам.
+
+    Args:
+        lat1, lon1: широта/долгота первых точек (градусы), скаляры или массивы.
+        lat2, lon2: широта/долгота вторых точек (градусы), той же формы.
+
+    Returns:
+        Расстояния в метрах (скаляр или массив той же формы).
+    """
+    import numpy as np
+
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
@@ -0,0 +1,163 @@
+"""
+Минимальный кодировщик Mapbox Vector Tile 2.1 (protobuf) без внешних зависимостей.
+
+Геометрия передаётся уже в координатах тайла (целые 0..extent, ось y вниз).
+"""
+import struct
+from typing import Any, Iterable, Sequence
+
+__all__ = [
+    "GEOM_POINT",
+    "GEOM_LINESTRING",
+    "GEOM_POLYGON",
+    "DEFAULT_EXTENT",
+    "encode_tile",
+    "point_geometry",
+    "polygon_geometry",
+    "zigzag",
+]
+
+GEOM_POINT = 1
+GEOM_LINESTRING = 2
+GEOM_POLYGON = 3
+
+DEFAULT_EXTENT = 4096
+
+_CMD_MOVE_TO = 1
+_CMD_LINE_TO = 2
+_CMD_CLOSE_PATH = 7
+
+_WIRE_VARINT = 0
+_WIRE_64BIT = 1
+_WIRE_LENGTH = 2
+
+
+def zigzag(n: int) -> int:
+    return (n << 1) if n >= 0 else ((-n) << 1) - 1
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _tag(field: int, wire: int) -> bytes:
+    return _varint((field << 3) | wire)
+
+
+def _uint_field(field: int, value: int) -> bytes:
+    return _tag(field, _WIRE_VARINT) + _varint(value)
+
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+    return _tag(field, _WIRE_LENGTH) + _varint(len(payload)) + payload
+
+
+def _packed_field(field: int, values: Iterable[int]) -> bytes:
+    return _bytes_field(field, b"".join(_varint(v) for v in values))
+
+
+def _command(cmd: int, count: int) -> int:
+    return (cmd & 0x7) | (count << 3)
+
+
+def point_geometry(points: Sequence[tuple[int, int]]) -> list[int]:
+    """
+    Команды геометрии POINT/MULTIPOINT.
+    """
+    geometry = [_command(_CMD_MOVE_TO, len(points))]
+    cx = cy = 0
+    for x, y in points:
+        geometry += [zigzag(x - cx), zigzag(y - cy)]
+        cx, cy = x, y
+    return geometry
+
+
+def _ring_area2(ring: Sequence[tuple[int, int]]) -> int:
+    area = 0
+    for i in range(len(ring)):
+        x1, y1 = ring[i - 1]
+        x2, y2 = ring[i]
+        area += x1 * y2 - x2 * y1
+    return area
+
+
+def polygon_geometry(ring: Sequence[tuple[int, int]]) -> list[int]:
+    """
+    Команды геометрии POLYGON из одного внешнего кольца (без повторения первой точки в конце).
+    Кольцо разворачивается так, чтобы площадь в координатах тайла была положительной
+    (внешнее кольцо по часовой стрелке при оси y вниз, как требует спецификация).
+    Пустой список, если кольцо вырождено.
+    """
+    if len(ring) < 3:
+        return []
+    area2 = _ring_area2(ring)
+    if area2 == 0:
+        return []
+    if area2 < 0:
+        ring = list(reversed(ring))
+    x0, y0 = ring[0]
+    geometry = [_command(_CMD_MOVE_TO, 1), zigzag(x0), zigzag(y0), _command(_CMD_LINE_TO, len(ring) - 1)]
+    cx, cy = x0, y0
+    for x, y in ring[1:]:
+        geometry += [zigzag(x - cx), zigzag(y - cy)]
+        cx, cy = x, y
+    geometry.append(_command(_CMD_CLOSE_PATH, 1))
+    return geometry
+
+
+def _encode_value(value: Any) -> bytes:
+    if isinstance(value, bool):
+        return _uint_field(7, int(value))
+    if isinstance(value, int):
+        return _uint_field(5, value) if value >= 0 else _uint_field(6, zigzag(value))
+    if isinstance(value, float):
+        return _tag(3, _WIRE_64BIT) + struct.pack("<d", value)
+    return _bytes_field(1, str(value).encode())
+
+
+def _encode_layer(name: str, features: Sequence[dict], extent: int) -> bytes:
+    keys: dict[str, int] = {}
+    values: dict[tuple[type, Any], int] = {}
+    encoded_features = []
+    for feature in features:
+        tags = []
+        for key, value in feature.get("properties", {}).items():
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value), value), len(values)))
+        payload = b""
+        if feature.get("id") is not None:
+            payload += _uint_field(1, feature["id"])
+        if tags:
+            payload += _packed_field(2, tags)
+        payload += _uint_field(3, feature["type"])
+        payload += _packed_field(4, feature["geometry"])
+        encoded_features.append(_bytes_field(2, payload))
+    layer = _uint_field(15, 2) + _bytes_field(1, name.encode())
+    layer += b"".join(encoded_features)
+    layer += b"".join(_bytes_field(3, key.encode()) for key in keys)
+    layer += b"".join(_bytes_field(4, _encode_value(value)) for _, value in values)
+    layer += _uint_field(5, extent)
+    return layer
+
+
+def encode_tile(layers: Sequence[tuple[str, Sequence[dict]]], extent: int = DEFAULT_EXTENT) -> bytes:
+    """
+    Кодирует тайл: layers — [(имя слоя, [feature, ...]), ...], где
+    feature = {"id": int | None, "type": GEOM_*, "geometry": [команды], "properties": {...}}.
+    Пустые слои пропускаются; тайл без объектов — пустые байты.
+    """
+    return b"".join(
+        _bytes_field(3, _encode_layer(name, features, extent))
+        for name, features in layers
+        if features
+    )
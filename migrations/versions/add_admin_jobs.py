@@ -0,0 +1,39 @@
+"""
+Alembic migration: add admin_jobs table (background admin recompute jobs with progress)
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'add_admin_jobs'
+down_revision = 'add_recompute_jobs'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.create_table(
+        'admin_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(32), nullable=False, comment="Тип задания, например recompute_aps"),
+        sa.Column('status', sa.String(16), nullable=False, server_default='queued', comment="queued | running | done | failed | cancelled"),
+        sa.Column('params', sa.JSON(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=True, comment="Сколько AP нужно обработать (известно после выборки)"),
+        sa.Column('processed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('solved', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('failed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('summary', sa.JSON(), nullable=True, comment="Итоговая сводка задания"),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('log', sa.LargeBinary(), nullable=True),
+        sa.Column('created_by', sa.Integer(), sa.ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_admin_jobs_id', 'admin_jobs', ['id'])
+
+def downgrade():
+    op.drop_index('ix_admin_jobs_id', table_name='admin_jobs')
+    op.drop_table('admin_jobs')
@@ -0,0 +1,28 @@
+"""
+Alembic migration: add ap_estimates table (online per-AP position estimator state)
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'add_ap_estimates'
+down_revision = 'add_geocode_cache'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.create_table(
+        'ap_estimates',
+        sa.Column('access_point_id', sa.Integer(), sa.ForeignKey('access_points.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('x', sa.Float(), nullable=False),
+        sa.Column('y', sa.Float(), nullable=False),
+        sa.Column('z', sa.Float(), nullable=False),
+        sa.Column('cov', sa.JSON(), nullable=False, comment="Ковариация оценки: [xx, xy, xz, yy, yz, zz], м²"),
+        sa.Column('std_m', sa.Float(), nullable=False, comment="sqrt(trace(cov)) — неопределённость оценки, м"),
+        sa.Column('n_obs', sa.Integer(), nullable=False, server_default='0', comment="Число учтённых наблюдений"),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table('ap_estimates')
@@ -0,0 +1,20 @@
+"""
+Alembic migration: add access_points.solved_obs_id watermark and (access_point_id, id) index on wifi_observations
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'add_ap_solved_obs_id'
+down_revision = 'add_ap_estimates'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.add_column('access_points', sa.Column('solved_obs_id', sa.Integer(), nullable=True, comment="Watermark: max id наблюдения на момент последнего пересчёта"))
+    op.create_index('ix_wifi_observations_ap_id_id', 'wifi_observations', ['access_point_id', 'id'])
+
+def downgrade():
+    op.drop_index('ix_wifi_observations_ap_id_id', table_name='wifi_observations')
+    op.drop_column('access_points', 'solved_obs_id')
@@ -0,0 +1,18 @@
+"""
+Alembic migration: add buildings.map_version (version counter for cached /v1/map responses)
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'add_building_map_version'
+down_revision = 'add_admin_jobs'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.add_column('buildings', sa.Column('map_version', sa.BigInteger(), nullable=False, server_default='0', comment="Версия карты: растёт при любом изменении AP, полигонов и POI здания"))
+
+def downgrade():
+    op.drop_column('buildings', 'map_version')
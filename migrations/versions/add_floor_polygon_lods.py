@@ -0,0 +1,38 @@
+"""
+Alembic migration: add floor_polygons.polygon_lods (precomputed Douglas-Peucker levels of detail)
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'add_floor_polygon_lods'
+down_revision = 'add_map_change_log'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.utils.geometry import build_polygon_lods
+
+def upgrade():
+    op.add_column('floor_polygons', sa.Column('polygon_lods', sa.JSON(), nullable=True, comment="Упрощённые контуры [{tolerance, polygon}, …] по возрастанию допуска (Дуглас — Пекер)"))
+    # Заполняем уровни для существующих контуров
+    floor_polygons = sa.table(
+        'floor_polygons',
+        sa.column('id', sa.Integer()),
+        sa.column('polygon', sa.JSON()),
+        sa.column('polygon_lods', sa.JSON()),
+    )
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(floor_polygons.c.id, floor_polygons.c.polygon)).all()
+    for polygon_id, polygon in rows:
+        if not polygon:
+            continue
+        conn.execute(
+            floor_polygons.update()
+            .where(floor_polygons.c.id == polygon_id)
+            .values(polygon_lods=build_polygon_lods(polygon, settings.MAP_POLYGON_LOD_TOLERANCES_M))
+        )
+
+def downgrade():
+    op.drop_column('floor_polygons', 'polygon_lods')
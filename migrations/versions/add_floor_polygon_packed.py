@@ -0,0 +1,48 @@
+"""
+Alembic migration: store floor polygons packed (little-endian float64 N×3 in bytea) instead of JSON lists
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'add_floor_polygon_packed'
+down_revision = 'add_floor_polygon_lods'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.geometry import pack_points, unpack_points
+
+floor_polygons = sa.table(
+    'floor_polygons',
+    sa.column('id', sa.Integer()),
+    sa.column('polygon', sa.JSON()),
+    sa.column('polygon_packed', sa.LargeBinary()),
+)
+
+def upgrade():
+    op.add_column('floor_polygons', sa.Column('polygon_packed', sa.LargeBinary(), nullable=True, comment="Контур этажа: little-endian float64, N×3 (x, y, z)"))
+    op.alter_column('floor_polygons', 'polygon', existing_type=sa.JSON(), nullable=True)
+    # Переносим существующие контуры в упакованный вид
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(floor_polygons.c.id, floor_polygons.c.polygon)).all()
+    for polygon_id, polygon in rows:
+        conn.execute(
+            floor_polygons.update()
+            .where(floor_polygons.c.id == polygon_id)
+            .values(polygon_packed=pack_points(polygon or []), polygon=None)
+        )
+
+def downgrade():
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(floor_polygons.c.id, floor_polygons.c.polygon_packed).where(floor_polygons.c.polygon_packed.is_not(None))
+    ).all()
+    for polygon_id, packed in rows:
+        conn.execute(
+            floor_polygons.update()
+            .where(floor_polygons.c.id == polygon_id)
+            .values(polygon=unpack_points(packed).tolist())
+        )
+    op.alter_column('floor_polygons', 'polygon', existing_type=sa.JSON(), nullable=False)
+    op.drop_column('floor_polygons', 'polygon_packed')
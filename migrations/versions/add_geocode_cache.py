@@ -0,0 +1,26 @@
+"""
+Alembic migration: add geocode_cache table (persistent reverse-geocoding cache)
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'add_geocode_cache'
+down_revision = 'add_is_superuser_is_active'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.create_table(
+        'geocode_cache',
+        sa.Column('cell', sa.String(length=64), primary_key=True, comment="Квантованные координаты lat,lon ячейки"),
+        sa.Column('response', sa.JSON(), nullable=False, comment="Ответ геокодера (osm_id, name, display_name, …)"),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('ix_geocode_cache_expires_at', 'geocode_cache', ['expires_at'])
+
+def downgrade():
+    op.drop_index('ix_geocode_cache_expires_at', table_name='geocode_cache')
+    op.drop_table('geocode_cache')
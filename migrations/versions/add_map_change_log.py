@@ -0,0 +1,42 @@
+"""
+Alembic migration: map change log for delta sync (map_version on access_points/floor_polygons/pois,
+map_tombstones table, buildings.map_compacted_version)
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'add_map_change_log'
+down_revision = 'add_building_map_version'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+VERSIONED_TABLES = ('access_points', 'floor_polygons', 'pois')
+
+def upgrade():
+    for table in VERSIONED_TABLES:
+        op.add_column(table, sa.Column('map_version', sa.BigInteger(), nullable=False, server_default='0', comment="Версия карты здания, в которой запись менялась последний раз"))
+        op.create_index(f'ix_{table}_building_id_map_version', table, ['building_id', 'map_version'])
+    op.add_column('buildings', sa.Column('map_compacted_version', sa.BigInteger(), nullable=False, server_default='0', comment="Удаления до этой версии вычищены из map_tombstones: клиентам со since ниже нужна полная карта"))
+    # Существующие записи имеют версию 0, истории удалений нет: клиенты с since ниже новой версии
+    # получают reset и загружают карту целиком
+    op.execute("UPDATE buildings SET map_version = map_version + 1, map_compacted_version = map_version + 1")
+    op.create_table(
+        'map_tombstones',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('building_id', sa.Integer(), sa.ForeignKey('buildings.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('kind', sa.String(16), nullable=False, comment="access_point | floor_polygon | poi"),
+        sa.Column('entity_id', sa.Integer(), nullable=False, comment="ID удалённой записи"),
+        sa.Column('map_version', sa.BigInteger(), nullable=False, comment="Версия карты здания, в которой запись удалена"),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_map_tombstones_building_id_map_version', 'map_tombstones', ['building_id', 'map_version'])
+
+def downgrade():
+    op.drop_index('ix_map_tombstones_building_id_map_version', table_name='map_tombstones')
+    op.drop_table('map_tombstones')
+    op.drop_column('buildings', 'map_compacted_version')
+    for table in VERSIONED_TABLES:
+        op.drop_index(f'ix_{table}_building_id_map_version', table_name=table)
+        op.drop_column(table, 'map_version')
@@ -0,0 +1,39 @@
+"""
+Alembic migration: add recompute_jobs table (durable Postgres job queue for recompute work)
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'add_recompute_jobs'
+down_revision = 'add_ap_solved_obs_id'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    op.create_table(
+        'recompute_jobs',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('kind', sa.String(32), nullable=False, comment="Тип задания (обработчик в app.tasks.worker)"),
+        sa.Column('dedup_key', sa.String(128), nullable=True, comment="Ключ слияния одинаковых заданий, например ap:<bssid>"),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(16), nullable=False, server_default='pending', comment="pending | running | failed"),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='5'),
+        sa.Column('run_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False, comment="Не раньше этого времени (backoff)"),
+        sa.Column('locked_by', sa.String(128), nullable=True, comment="Воркер, взявший задание"),
+        sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_recompute_jobs_status_run_at', 'recompute_jobs', ['status', 'run_at'])
+    op.create_index(
+        'uq_recompute_jobs_pending_dedup_key', 'recompute_jobs', ['dedup_key'],
+        unique=True, postgresql_where=sa.text("status = 'pending'"),
+    )
+
+def downgrade():
+    op.drop_index('uq_recompute_jobs_pending_dedup_key', table_name='recompute_jobs')
+    op.drop_index('ix_recompute_jobs_status_run_at', table_name='recompute_jobs')
+    op.drop_table('recompute_jobs')
@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -79,3 +80,39 @@ def test_upload_scan_invalid_frequency():
     response = client.post("/v1/upload", json=scan)
     assert response.status_code == 422
     assert "Некорректная частота" in response.text
+
+
+def test_upload_batch_keeps_written_chunks_on_bad_tail(monkeypatch):
+    from app.api.routers import upload
+    from app.core.config import settings
+    from app.db.session import get_db
+    from app.schemas.scan import BatchItemResult
+
+    async def fake_ingest(db, chunk):
+        return [BatchItemResult(index=index, status="success") for index, _ in chunk]
+
+    async def fake_db():
+        yield None
+
+    monkeypatch.setattr(upload, "_ingest_chunk", fake_ingest)
+    monkeypatch.setattr(settings, "UPLOAD_BATCH_CHUNK_SIZE", 1)
+    monkeypatch.setattr(settings, "UPLOAD_BATCH_MAX_ITEMS", 2)
+    app.dependency_overrides[get_db] = fake_db
+    try:
+        line = json.dumps(make_valid_scan())
+        headers = {"Content-Type": "application/x-ndjson"}
+        response = client.post("/v1/upload/batch", content="\n".join([line] * 3), headers=headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["succeeded"] == 2 and body["failed"] == 1
+        assert body["items"][-1]["index"] == 2 and body["items"][-1]["status"] == "error"
+
+        response = client.post("/v1/upload/batch", content="[" + line + ", {", headers={"Content-Type": "application/json"})
+        assert response.status_code == 200
+        assert [item["status"] for item in response.json()["items"]] == ["success", "error"]
+
+        # Ошибка до записи первого куска — пакет отклоняется целиком
+        response = client.post("/v1/upload/batch", content="{", headers={"Content-Type": "application/json"})
+        assert response.status_code == 400
+    finally:
+        app.dependency_overrides.pop(get_db, None)
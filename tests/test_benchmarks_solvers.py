@@ -0,0 +1,37 @@
+import json
+
+import numpy as np
+
+from app.benchmarks.solvers import run_benchmark
+from app.benchmarks.synthetic import generate_building, generate_scans
+from app.services.geo_solver import rssi_to_distance
+
+
+def test_generate_scans_follow_path_loss_model():
+    truth = generate_building(20, floors=2, seed=1)
+    observations = generate_scans(truth, scans_per_ap=6, noise_db=0.0, outlier_rate=0.0, seed=1)
+    assert len(observations) == 20
+    obs = observations[3]
+    assert obs.shape == (6, 5)
+    np.testing.assert_allclose(rssi_to_distance(obs[:, 3]), np.linalg.norm(obs[:, :3] - truth[3], axis=1))
+
+
+def test_run_benchmark_reports_metrics():
+    report = run_benchmark(sizes=(40,), solvers=["weighted_least_squares_3d", "engine:linear"], scan_params={"outlier_rate": 0.0})
+    json.dumps(report)
+    assert [r["solver"] for r in report["results"]] == ["weighted_least_squares_3d", "engine:linear"]
+    for result in report["results"]:
+        assert result["n_aps"] == 40 and result["measured_aps"] == 40
+        assert result["solved"] > 30
+        assert result["aps_per_second"] > 0
+        assert result["latency_p50_ms"] <= result["latency_p99_ms"]
+        assert not result["batched"] and result["batch_ms"] is None
+        assert result["error_2d_p50_m"] < 5.0
+
+
+def test_batched_engine_reports_batch_time_instead_of_percentiles():
+    report = run_benchmark(sizes=(40,), solvers=["engine:wls"], scan_params={"outlier_rate": 0.0})
+    result = report["results"][0]
+    assert result["batched"]
+    assert result["latency_p50_ms"] is None and result["latency_p99_ms"] is None
+    assert result["batch_ms"] > 0
@@ -0,0 +1,90 @@
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from app.services.access_point import _coords_update_stmt
+
+
+def _sql(tolerance_m, accuracy_ratio=None):
+    rows = [
+        {"id": 1, "x": 1.0, "y": 2.0, "z": 3.0, "accuracy": 4.0},
+        {"id": 2, "x": 5.0, "y": 6.0, "z": 7.0, "accuracy": 8.0},
+    ]
+    return str(_coords_update_stmt(rows, tolerance_m, accuracy_ratio).compile(dialect=asyncpg.dialect()))
+
+
+def test_bulk_coords_update_is_single_update_from_values():
+    sql = _sql(0)
+    assert sql.startswith("UPDATE access_points SET")
+    assert "FROM (VALUES" in sql and "AS new_coords (id, x, y, z, accuracy)" in sql
+    assert "access_points.id = new_coords.id" in sql
+    assert "> $" not in sql
+
+
+def test_bulk_coords_update_skips_small_moves():
+    sql = _sql(0.5)
+    assert "(access_points.x - new_coords.x) * (access_points.x - new_coords.x)" in sql
+    assert "RETURNING access_points.id, access_points.building_id" in sql
+
+
+def test_tolerance_still_writes_changed_accuracy():
+    from sqlalchemy import Column, Float, Integer, MetaData, Table, create_engine, insert, select
+    from sqlalchemy.sql import visitors
+
+    from app.db.models.access_point import AccessPoint
+
+    rows = [
+        # Новая AP: координаты почти не сдвинулись, accuracy по умолчанию сменилась оценкой
+        {"id": 1, "x": 1.0, "y": 2.0, "z": 3.0, "accuracy": 4.0},
+        # Ни координаты, ни accuracy заметно не изменились — строка пропускается
+        {"id": 2, "x": 5.0, "y": 6.0, "z": 7.0, "accuracy": 8.0},
+    ]
+    stmt = _coords_update_stmt(rows, 0.5, 0.1)
+    # SQLite не умеет (VALUES ...) AS t (колонки): условие WHERE проверяем на обычной таблице
+    metadata = MetaData()
+    current = Table("access_points", metadata, *(Column(name, Float) for name in ("x", "y", "z", "accuracy")), Column("id", Integer))
+    new = Table("new_coords", metadata, *(Column(name, Float) for name in ("x", "y", "z", "accuracy")), Column("id", Integer))
+    table = AccessPoint.__table__
+
+    def replace(element):
+        table_of = getattr(element, "table", None)
+        if table_of is table and element.key in current.c:
+            return current.c[element.key]
+        if table_of is not None and getattr(table_of, "name", None) == "new_coords":
+            return new.c[element.key]
+        return None
+
+    where = visitors.replacement_traverse(stmt.whereclause, {}, replace)
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(current), [
+            {"id": 1, "x": 1.1, "y": 2.0, "z": 3.0, "accuracy": 9999.0},
+            {"id": 2, "x": 5.1, "y": 6.0, "z": 7.0, "accuracy": 8.2},
+        ])
+        conn.execute(insert(new), rows)
+        written = conn.execute(select(current.c.id).select_from(current.join(new, current.c.id == new.c.id)).where(where)).scalars().all()
+    assert written == [1]
+
+
+def test_bssid_lookup_is_chunked(monkeypatch):
+    import asyncio
+
+    from app.services import access_point
+
+    monkeypatch.setattr(access_point, "AP_LOOKUP_CHUNK_ROWS", 3)
+    sizes = []
+
+    class _Result:
+        def scalars(self):
+            return self
+
+        def all(self):
+            return []
+
+    class _FakeDB:
+        async def execute(self, stmt):
+            sizes.append(len(stmt.compile().params["bssid_1"]))
+            return _Result()
+
+    bssids = [f"aa:bb:cc:dd:ee:{i:02x}" for i in range(7)]
+    assert asyncio.run(access_point.get_access_points_by_bssids(_FakeDB(), bssids + bssids)) == {}
+    assert sizes == [3, 3, 1]
@@ -0,0 +1,62 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+from app.db.models.admin_job import AdminJob
+from app.services.admin_jobs import CompactLog, job_progress
+
+
+def test_compact_log_roundtrip():
+    log = CompactLog()
+    log.write([[1, "s", 12.0, 3.5, 0.8], [2, "n", None, None, None]])
+    log.write([[3, "f", 5.0, None, None]])
+    lines = gzip.decompress(log.getvalue()).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [[1, "s", 12.0, 3.5, 0.8], [2, "n", None, None, None], [3, "f", 5.0, None, None]]
+    assert log.entries == 3
+
+
+def test_job_progress_reports_rate_and_eta():
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    job = AdminJob(status="running", total=1000, processed=250, started_at=started)
+    progress = job_progress(job, now=started + timedelta(seconds=10))
+    assert progress == {"progress_percent": 25.0, "aps_per_second": 25.0, "eta_seconds": 30.0}
+    queued = AdminJob(status="queued", total=None, processed=0)
+    assert job_progress(queued) == {"progress_percent": None, "aps_per_second": None, "eta_seconds": None}
+
+
+def test_cancelled_job_gets_terminal_status(monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+
+    from app.services import admin_jobs
+
+    job = SimpleNamespace(id=1, kind="recompute_aps", status="queued", cancel_requested=False, params={"full": True})
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def get(self, model, job_id, **kwargs):
+            return job
+
+        async def commit(self):
+            pass
+
+    async def never_finishes(session, **kwargs):
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(admin_jobs, "AsyncSessionLocal", FakeSession)
+    monkeypatch.setattr(admin_jobs, "update_access_point_positions", never_finishes)
+
+    async def scenario():
+        admin_jobs.start_job(1)
+        await asyncio.sleep(0.01)
+        assert job.status == "running"
+        await admin_jobs.cancel_running_jobs()
+
+    asyncio.run(scenario())
+    assert job.status == "failed" and job.error == admin_jobs.SHUTDOWN_ERROR
+    assert job.finished_at is not None
@@ -0,0 +1,75 @@
+import numpy as np
+
+from app.services.ap_estimator import EstimatorState
+
+
+def test_online_estimate_converges_to_true_position():
+    rng = np.random.default_rng(3)
+    ap = np.array([12.0, 7.0, 2.5])
+    # AP создана в точке первого скана — далеко от истинного положения
+    state = EstimatorState.initial(2.0, 2.0, 1.0, accuracy=9999.0)
+    for _ in range(60):
+        position = np.array([rng.uniform(0, 25), rng.uniform(0, 15), rng.uniform(0, 4)])
+        distance = np.linalg.norm(position - ap) + rng.normal(0, 0.3)
+        state.update(position, max(distance, 0.1))
+    assert state.n_obs == 60
+    assert np.linalg.norm(state.x[:2] - ap[:2]) < 1.5
+    assert state.std_m < 3.0
+
+
+def test_state_round_trip_and_time_decay():
+    state = EstimatorState((1.0, 2.0, 3.0), np.diag([1.0, 2.0, 3.0]), n_obs=5, updated_at=0.0)
+    row = state.to_row(7)
+    assert row["access_point_id"] == 7 and len(row["cov"]) == 6
+
+    class _Row:
+        pass
+    model = _Row()
+    for key, value in row.items():
+        setattr(model, key, value)
+    restored = EstimatorState.from_model(model)
+    np.testing.assert_allclose(restored.P, state.P)
+    before = restored.std_m
+    restored.predict(restored.updated_at + 10 * 86400)
+    assert restored.std_m > before
+
+
+def test_missing_states_are_seeded_before_locking():
+    import asyncio
+    from datetime import datetime, timezone
+    from types import SimpleNamespace
+
+    from sqlalchemy.dialects import postgresql
+
+    from app.services.ap_estimator import apply_observations
+
+    statements = []
+    seeded = SimpleNamespace(
+        access_point_id=1, x=5.0, y=5.0, z=1.0, cov=[4.0, 0.0, 0.0, 4.0, 0.0, 4.0],
+        n_obs=0, updated_at=datetime.now(timezone.utc),
+    )
+
+    class _Result:
+        def __init__(self, rows):
+            self.rows = rows
+
+        def all(self):
+            return self.rows
+
+        def scalars(self):
+            return self
+
+    class _FakeDB:
+        async def execute(self, stmt):
+            sql = str(stmt.compile(dialect=postgresql.dialect()))
+            statements.append(sql)
+            if sql.startswith("SELECT access_points.id"):
+                return _Result([SimpleNamespace(id=1, x=5.0, y=5.0, z=1.0, accuracy=None)])
+            if "FOR UPDATE" in sql:
+                return _Result([seeded])
+            return _Result([])
+
+    # Снимок в точке текущей оценки неинформативен — до записи оценок дело не доходит
+    assert asyncio.run(apply_observations(_FakeDB(), [(1, (5.0, 5.0, 1.0), -40.0, None)])) == set()
+    assert statements[1].startswith("INSERT INTO ap_estimates") and "ON CONFLICT" in statements[1] and "DO NOTHING" in statements[1]
+    assert "FOR UPDATE" in statements[2]
@@ -0,0 +1,59 @@
+import numpy as np
+
+from app.services.batch_solver import pack_observations, solve_batch, residual_accuracy
+from app.services.geo_solver import weighted_least_squares_2d, weighted_least_squares_3d
+
+
+def _synthetic_groups(n, seed=0):
+    rng = np.random.default_rng(seed)
+    groups, dims = [], []
+    for i in range(n):
+        ap = np.array([rng.uniform(0, 50), rng.uniform(0, 50), rng.uniform(0, 6)])
+        k = int(rng.integers(4, 16))
+        pos = np.column_stack([rng.uniform(0, 50, k), rng.uniform(0, 50, k), rng.uniform(0, 6, k)])
+        dim = 2 if i % 4 == 0 else 3
+        if dim == 2:
+            pos = pos[:, :2]
+        dist = np.linalg.norm(pos - ap[:dim], axis=1) + rng.normal(0, 0.3, k)
+        groups.append((pos.tolist(), np.abs(dist).tolist(), None))
+        dims.append(dim)
+    return groups, np.array(dims)
+
+
+def test_batch_matches_per_ap_scipy_solution():
+    groups, dims = _synthetic_groups(200)
+    P, D, W, M = pack_observations(groups)
+    X, converged = solve_batch(P, D, W, M, dims)
+    assert converged.mean() > 0.9
+    errors = []
+    for i, ((positions, distances, _), dim) in enumerate(zip(groups, dims)):
+        solver = weighted_least_squares_3d if dim == 3 else weighted_least_squares_2d
+        reference = np.array(solver(positions, distances))
+        errors.append(np.linalg.norm(X[i, :dim] - reference))
+    # Та же целевая функция (взвешенный Huber) — решения практически совпадают
+    assert np.median(errors) < 1e-2
+
+
+def test_outlier_is_damped_by_huber_loss():
+    ap = np.array([10.0, 5.0, 2.0])
+    positions = [(0, 0, 0), (20, 0, 3), (0, 20, 1), (20, 20, 2), (10, -10, 0), (-5, 5, 3)]
+    distances = [float(np.linalg.norm(ap - p)) for p in positions]
+    distances[0] += 25.0
+    P, D, W, M = pack_observations([(positions, distances, [1.0] * len(positions))])
+    X, _ = solve_batch(P, D, W, M, np.array([3]))
+    # z слабо обусловлен (снимки почти в одной плоскости) — проверяем план
+    assert np.linalg.norm(X[0, :2] - ap[:2]) < 1.0
+
+
+def test_padding_and_underdetermined_rows():
+    positions = [(0, 0), (10, 0), (0, 10), (10, 10)]
+    ap = np.array([3.0, 4.0])
+    distances = [float(np.linalg.norm(ap - p)) for p in positions]
+    groups = [(positions, distances, None), (positions[:1], distances[:1], None)]
+    P, D, W, M = pack_observations(groups)
+    assert P.shape == (2, 4, 3) and M.sum() == 5
+    X, _ = solve_batch(P, D, W, M, np.array([2, 2]))
+    np.testing.assert_allclose(X[0, :2], ap, atol=1e-3)
+    assert np.isnan(X[1]).all()
+    accuracy = residual_accuracy(X[:1], P[:1], D[:1], M[:1], np.array([2]))
+    assert accuracy[0] < 1e-3
@@ -0,0 +1,60 @@
+import asyncio
+import math
+
+from app.services.building_registry import BuildingRegistry
+from app.utils.math_utils import haversine_m
+
+
+class _Row:
+    def __init__(self, id, lat, lon, osm_id=None):
+        self.id, self.lat, self.lon, self.osm_id = id, lat, lon, osm_id
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        return _Result(self.rows)
+
+
+def test_hot_lookups_do_not_query_db():
+    db = _FakeSession([_Row(1, 55.75, 37.61), _Row(2, 55.76, 37.62)])
+    registry = BuildingRegistry(ttl=60)
+
+    async def scenario():
+        first = await registry.get_many(db, [1, 2])
+        for _ in range(100):
+            await registry.get(db, 1)
+        return first
+
+    first = asyncio.run(scenario())
+    assert db.queries == 1
+    assert first[1].cos_lat == math.cos(math.radians(55.75))
+    x, y = first[1].local_xy(55.75, 37.62)
+    assert x > 0 and y == 0
+
+
+def test_invalidate_forces_reload():
+    db = _FakeSession([_Row(1, 55.75, 37.61)])
+    registry = BuildingRegistry(ttl=60)
+    asyncio.run(registry.get(db, 1))
+    registry.invalidate()
+    asyncio.run(registry.get(db, 1))
+    assert db.queries == 2
+
+
+def test_haversine_vectorized_matches_known_distance():
+    d = haversine_m([55.75, 55.75], [37.61, 37.61], [55.76, 55.75], [37.61, 37.61])
+    assert abs(d[0] - 1111.95) < 1.0
+    assert d[1] == 0.0
@@ -68,3 +68,18 @@ def test_recalculate_access_point_coords_smoke(monkeypatch):
     assert coords["x"] != 0.0 or coords["y"] != 0.0
     # Проверяем, что не возникло исключений
     assert "building_id" in coords and "floor" in coords
+
+def test_robust_multilateration_rejects_outliers_reproducibly():
+    from app.services.geo_solver import robust_multilateration_3d
+    import numpy as np
+
+    rng = np.random.default_rng(7)
+    ap = np.array([12.0, 8.0, 2.0])
+    positions = np.column_stack([rng.uniform(0, 25, 12), rng.uniform(0, 25, 12), rng.uniform(0, 5, 12)])
+    distances = np.linalg.norm(positions - ap, axis=1)
+    distances[[1, 5]] += 20.0
+    coords, inliers = robust_multilateration_3d(positions.tolist(), distances.tolist(), seed=1)
+    assert 1 not in inliers and 5 not in inliers
+    assert np.linalg.norm(np.array(coords) - ap) < 0.5
+    # Одинаковое зерно — одинаковый результат
+    assert robust_multilateration_3d(positions.tolist(), distances.tolist(), seed=1) == (coords, inliers)
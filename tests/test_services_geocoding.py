@@ -0,0 +1,40 @@
+import asyncio
+
+from app.services import geocoding
+
+
+def test_cell_key_groups_nearby_points():
+    assert geocoding.cell_key(55.75121, 37.61711) == geocoding.cell_key(55.75124, 37.61714)
+    assert geocoding.cell_key(55.75120, 37.61750) != geocoding.cell_key(55.76120, 37.61750)
+
+
+def test_concurrent_lookups_of_one_cell_make_one_external_call(monkeypatch):
+    calls = []
+
+    async def fake_osm(lat, lon):
+        calls.append((lat, lon))
+        await asyncio.sleep(0.05)
+        return {"osm_id": 42, "name": "Корпус А", "display_name": "ул. Тестовая, 1"}
+
+    async def no_db(key):
+        return None
+
+    async def skip_store(key, response):
+        pass
+
+    monkeypatch.setattr(geocoding, "reverse_geocode_osm", fake_osm)
+    monkeypatch.setattr(geocoding, "_load_from_db", no_db)
+    monkeypatch.setattr(geocoding, "_store_in_db", skip_store)
+    geocoding._lru.clear()
+
+    async def burst():
+        return await asyncio.gather(*[
+            geocoding.reverse_geocode(55.7512 + i * 1e-6, 37.6175) for i in range(50)
+        ])
+
+    results = asyncio.run(burst())
+    assert len(calls) == 1
+    assert all(r["osm_id"] == 42 for r in results)
+    # Повторный запрос обслуживается из LRU
+    asyncio.run(geocoding.reverse_geocode(55.7512, 37.6175))
+    assert len(calls) == 1
@@ -0,0 +1,86 @@
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services.job_queue import JOB_RECALC_AP, retry_delay
+
+worker = importlib.import_module("app.tasks.worker")
+
+
+class _DummySession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+
+def test_retry_delay_backs_off_exponentially(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_QUEUE_RETRY_BASE_SECONDS", 5.0)
+    monkeypatch.setattr(settings, "JOB_QUEUE_RETRY_MAX_SECONDS", 60.0)
+    assert [retry_delay(n) for n in (1, 2, 3, 4, 5)] == [5.0, 10.0, 20.0, 40.0, 60.0]
+
+
+def test_worker_completes_or_retries_jobs(monkeypatch):
+    solved, completed, failed = [], [], []
+    batches = [[
+        SimpleNamespace(id=1, kind=JOB_RECALC_AP, payload={"bssid": "aa"}, attempts=1, max_attempts=5),
+        SimpleNamespace(id=2, kind=JOB_RECALC_AP, payload={"bssid": "bad"}, attempts=1, max_attempts=5),
+        SimpleNamespace(id=3, kind="unknown", payload={}, attempts=5, max_attempts=5),
+    ]]
+
+    async def fake_recalculate(bssid, db):
+        if bssid == "bad":
+            raise RuntimeError("solver failed")
+        solved.append(bssid)
+
+    async def fake_dequeue(db, worker_id, limit):
+        return batches.pop() if batches else []
+
+    async def fake_requeue(db):
+        return 0
+
+    async def fake_complete(db, ids):
+        completed.extend(ids)
+
+    async def fake_fail(db, job, error):
+        failed.append((job.id, error))
+        return job.attempts < job.max_attempts
+
+    monkeypatch.setattr(worker, "AsyncSessionLocal", _DummySession)
+    monkeypatch.setattr(worker, "recalculate_access_point_coords", fake_recalculate)
+    monkeypatch.setattr(worker, "dequeue_jobs", fake_dequeue)
+    monkeypatch.setattr(worker, "requeue_stale_jobs", fake_requeue)
+    monkeypatch.setattr(worker, "complete_jobs", fake_complete)
+    monkeypatch.setattr(worker, "fail_job", fake_fail)
+
+    stats = asyncio.run(worker.run_worker("test", batch_size=10, once=True))
+    assert solved == ["aa"] and completed == [1]
+    assert [job_id for job_id, _ in failed] == [2, 3]
+    assert stats == {"done": 1, "retried": 1, "failed": 1, "requeued": 0}
+
+
+def test_worker_survives_dequeue_errors(monkeypatch):
+    calls = []
+
+    async def flaky_dequeue(db, worker_id, limit):
+        calls.append(limit)
+        if len(calls) == 1:
+            raise ConnectionError("connection reset")
+        return []
+
+    async def fake_requeue(db):
+        return 0
+
+    monkeypatch.setattr(worker, "AsyncSessionLocal", _DummySession)
+    monkeypatch.setattr(worker, "dequeue_jobs", flaky_dequeue)
+    monkeypatch.setattr(worker, "requeue_stale_jobs", fake_requeue)
+    monkeypatch.setattr(worker, "WORKER_MAX_BACKOFF_SECONDS", 0.01)
+
+    stats = asyncio.run(worker.run_worker("test", batch_size=10, once=True))
+    assert len(calls) == 2
+    assert stats == {"done": 0, "retried": 0, "failed": 0, "requeued": 0}
@@ -0,0 +1,35 @@
+import asyncio
+import gzip
+
+from app.services.map_cache import MapCache, choose_encoding, etag_matches, map_etag
+
+
+def test_concurrent_misses_share_one_build():
+    calls = []
+
+    async def build():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b'{"building_id": 1}'
+
+    async def run():
+        cache = MapCache(max_entries=2)
+        entries = await asyncio.gather(*(cache.get(1, 3, build) for _ in range(5)))
+        again = await cache.get(1, 3, build)
+        newer = await cache.get(1, 4, build)
+        return entries, again, newer
+
+    entries, again, newer = asyncio.run(run())
+    assert len(calls) == 2
+    assert all(entry is entries[0] for entry in entries) and again is entries[0]
+    assert newer.version == 4 and gzip.decompress(newer.gzip) == b'{"building_id": 1}'
+
+
+def test_etag_and_encoding_negotiation():
+    etag = map_etag(7, 2)
+    assert etag_matches(etag, etag)
+    assert etag_matches('"other", "map-7-2"', etag)
+    assert not etag_matches(map_etag(7, 1), etag)
+    assert choose_encoding(None) == "identity"
+    assert choose_encoding("gzip;q=0, identity") == "identity"
+    assert choose_encoding("deflate, gzip;q=0.5") == "gzip"
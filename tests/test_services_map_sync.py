@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from app.services.map_sync import KIND_ACCESS_POINT, KIND_POI, load_map_changes
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return self
+
+
+class _FakeDB:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        return _Result(self.results.pop(0))
+
+
+def _ap(ap_id):
+    return SimpleNamespace(
+        id=ap_id, bssid=f"aa:bb:cc:dd:ee:{ap_id:02x}", ssid=None, building_id=1, floor=2,
+        x=1.0, y=2.0, z=3.0, created_at=datetime.now(timezone.utc),
+    )
+
+
+def test_changes_since_version_with_tombstones():
+    db = _FakeDB(
+        [(9, 3)],
+        [_ap(5), _ap(7)],
+        [],
+        [],
+        [(KIND_ACCESS_POINT, 6), (KIND_ACCESS_POINT, 7), (KIND_POI, 11)],
+    )
+    changes = asyncio.run(load_map_changes(db, 1, since=4))
+    assert changes.version == 9 and not changes.reset
+    assert [ap.id for ap in changes.access_points] == [5, 7]
+    # AP 7 есть и среди изменений, и среди удалений — отдаётся только как изменение
+    assert changes.deleted.access_points == [6]
+    assert changes.deleted.pois == [11]
+
+
+def test_changes_reset_and_up_to_date():
+    behind = asyncio.run(load_map_changes(_FakeDB([(9, 3)]), 1, since=2))
+    assert behind.reset and behind.access_points == []
+    db = _FakeDB([(9, 3)])
+    current = asyncio.run(load_map_changes(db, 1, since=9))
+    assert not current.reset and db.queries == 1
+    assert asyncio.run(load_map_changes(_FakeDB([]), 1, since=0)) is None
+
+
+def test_map_changes_applied_once_at_commit():
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import Session
+
+    from app.db.models.building import Building
+    from app.db.models.poi import POI
+    from app.services.map_sync import touch_map_entity, touch_map_rows
+
+    engine = create_engine("sqlite://")
+    Building.metadata.create_all(engine, tables=[Building.__table__, POI.__table__])
+    with Session(engine, expire_on_commit=False) as session:
+        session.add_all([Building(name="a"), Building(name="b")])
+        session.commit()
+        poi = POI(building_id=1, floor=1, x=0.0, y=0.0, type="room", name="p")
+        touch_map_entity(session, poi)
+        session.add(poi)
+        touch_map_rows(session, POI, [(1, 1)])
+        # До коммита здания не блокируются и версии не меняются
+        assert session.execute(select(Building.map_version)).scalars().all() == [0, 0]
+        session.commit()
+        assert session.execute(select(Building.map_version).order_by(Building.id)).scalars().all() == [1, 0]
+        assert poi.map_version == 1
+
+        touch_map_entity(session, poi)
+        session.rollback()
+        session.commit()
+        assert session.execute(select(Building.map_version).order_by(Building.id)).scalars().all() == [1, 0]
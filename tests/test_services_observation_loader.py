@@ -0,0 +1,33 @@
+import numpy as np
+from sqlalchemy.dialects import postgresql
+
+from app.services.observation_loader import group_observation_rows, latest_observations_query
+
+
+def test_query_uses_window_function_limit():
+    sql = str(latest_observations_query(per_ap=15).compile(dialect=postgresql.dialect()))
+    assert "row_number() OVER (PARTITION BY wifi_observations.access_point_id" in sql
+    assert "ORDER BY wifi_snapshots.timestamp DESC" in sql
+    assert "rn <=" in sql
+
+
+def test_group_rows_by_ap_id():
+    rows = np.array([
+        [1, 0.0, 0.0, 1.0, -50, 5.0],
+        [1, 1.0, 0.0, 1.0, -60, np.nan],
+        [4, 2.0, 2.0, 2.0, -70, 3.0],
+    ])
+    groups = group_observation_rows(rows)
+    assert set(groups) == {1, 4}
+    assert groups[1].shape == (2, 5)
+    np.testing.assert_array_equal(groups[4][0], [2.0, 2.0, 2.0, -70, 3.0])
+    assert group_observation_rows(np.empty((0, 6))) == {}
+
+
+def test_stale_access_points_condition_uses_watermark():
+    from app.services.geo_solver import stale_access_points_condition
+
+    sql = str(stale_access_points_condition().compile(dialect=postgresql.dialect()))
+    assert sql.startswith("EXISTS (SELECT wifi_observations.id")
+    assert "wifi_observations.access_point_id = access_points.id" in sql
+    assert "wifi_observations.id > coalesce(access_points.solved_obs_id" in sql
@@ -0,0 +1,71 @@
+import asyncio
+import importlib
+import time
+from types import SimpleNamespace
+
+rp = importlib.import_module("app.services.recompute_priority")
+
+
+class _FakeDB:
+    async def execute(self, stmt):
+        return SimpleNamespace(scalar=lambda: 100)
+
+
+def test_recompute_by_priority_stops_at_budget(monkeypatch):
+    queue = [SimpleNamespace(id=i) for i in range(1000)]
+    limits, batches = [], []
+
+    async def fake_top(db, limit):
+        limits.append(limit)
+        return queue[:limit]
+
+    async def fake_load(db, ap_ids):
+        return {}
+
+    async def fake_recompute(db, batch, observations, watermark):
+        batches.append(len(batch))
+        time.sleep(0.002 * len(batch))
+        del queue[:len(batch)]
+        return [[ap.id, "s" if ap.id % 2 else ("n" if ap.id % 4 else "f"), None, None, None] for ap in batch]
+
+    monkeypatch.setattr(rp, "top_priority_access_points", fake_top)
+    monkeypatch.setattr(rp, "load_latest_observations", fake_load)
+    monkeypatch.setattr(rp, "recompute_batch", fake_recompute)
+    monkeypatch.setattr(rp, "_cost", {"seconds_per_ap": rp.INITIAL_SECONDS_PER_AP, "rank_seconds": 0.0})
+
+    stats = asyncio.run(rp.recompute_by_priority(_FakeDB(), budget_seconds=0.3, batch_size=40))
+    # Бюджет не превышен больше чем на один пакет, очередь обработана частично
+    assert stats["seconds"] < 0.3 + 40 * 0.002 + 0.05
+    assert 0 < stats["processed"] < 1000
+    assert stats["solved"] + stats["skipped"] + stats["failed"] == stats["processed"]
+    # Пропущенные из-за нехватки наблюдений не считаются ошибками
+    assert stats["skipped"] > 0 and stats["failed"] > 0
+    # Очередь ранжируется один раз за запуск, пакеты не больше batch_size
+    assert len(limits) == 1 and limits[0] <= 40 * rp.MAX_BATCHES_PER_RUN
+    assert max(batches) <= 40
+
+
+def test_recompute_by_priority_counts_ranking_in_cost(monkeypatch):
+    limits = []
+
+    async def slow_top(db, limit):
+        limits.append(limit)
+        time.sleep(0.05)
+        return [SimpleNamespace(id=i) for i in range(limit)]
+
+    async def fake_load(db, ap_ids):
+        return {}
+
+    async def fake_recompute(db, batch, observations, watermark):
+        return [[ap.id, "s", None, None, None] for ap in batch]
+
+    monkeypatch.setattr(rp, "top_priority_access_points", slow_top)
+    monkeypatch.setattr(rp, "load_latest_observations", fake_load)
+    monkeypatch.setattr(rp, "recompute_batch", fake_recompute)
+    monkeypatch.setattr(rp, "_cost", {"seconds_per_ap": rp.INITIAL_SECONDS_PER_AP, "rank_seconds": 0.0})
+
+    asyncio.run(rp.recompute_by_priority(_FakeDB(), budget_seconds=0.06, batch_size=1000))
+    # Ранжирование заняло почти весь бюджет — следующий запуск берёт меньше AP
+    assert rp._cost["rank_seconds"] >= 0.05
+    asyncio.run(rp.recompute_by_priority(_FakeDB(), budget_seconds=0.06, batch_size=1000))
+    assert limits[1] < limits[0]
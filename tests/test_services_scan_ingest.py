@@ -0,0 +1,23 @@
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+scan_ingest = importlib.import_module("app.services.scan_ingest")
+
+
+class _NoDB:
+    async def execute(self, stmt):
+        raise AssertionError("здание не должно искаться по имени-заглушке")
+
+    def add(self, obj):
+        raise AssertionError("здание-заглушка не должно создаваться")
+
+
+def test_unrecognized_location_does_not_create_placeholder_building(monkeypatch):
+    async def offline_geocode(lat, lon):
+        # Офлайн-режим (GEOCODE_NOMINATIM_FALLBACK=False) без совпадения по контурам
+        return {}
+
+    monkeypatch.setattr(scan_ingest, "reverse_geocode", offline_geocode)
+    scan = SimpleNamespace(lat=55.75, lon=37.61)
+    assert asyncio.run(scan_ingest.resolve_building(_NoDB(), scan)) is None
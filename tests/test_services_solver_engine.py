@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.solver_engine import available_strategies, get_strategy, solve_access_points, strategy_for_building
+
+
+def _observations(ap, count, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = np.column_stack([rng.uniform(0, 20, count), rng.uniform(0, 20, count), rng.uniform(0, 4, count)])
+    distances = np.linalg.norm(positions - ap, axis=1)
+    rssi = -50 - 20 * np.log10(distances)
+    return np.column_stack([positions, rssi, np.full(count, 5.0)])
+
+
+@pytest.mark.parametrize("name", ["wls", "ransac", "linear", "incremental"])
+def test_strategies_recover_position(name):
+    ap = np.array([8.0, 6.0, 2.0])
+    items = [(1, 7, (None, None, None), _observations(ap, 12)), (2, 7, (1.0, 1.0, 1.0), _observations(ap, 2))]
+    solved, skipped = solve_access_points(items, get_strategy(name))
+    assert solved.solved and solved.strategy == name and solved.dim == 3
+    np.testing.assert_allclose(solved.coords[:2], ap[:2], atol=1.0)
+    assert solved.elapsed_ms >= 0
+    assert skipped.status == "skipped" and skipped.n_obs == 2
+
+
+def test_strategy_per_building(monkeypatch):
+    monkeypatch.setattr(settings, "SOLVER_BUILDING_STRATEGIES", {"12": {"strategy": "ransac", "params": {"threshold": 4.0}}})
+    assert strategy_for_building(12).name == "ransac"
+    assert strategy_for_building(12).params == {"threshold": 4.0}
+    assert strategy_for_building(13).name == settings.SOLVER_STRATEGY
+    assert set(available_strategies()) >= {"wls", "ransac", "linear", "incremental"}
+    with pytest.raises(ValueError):
+        get_strategy("nope")
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.solver_executor import SolverExecutor
+
+
+def _busy(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_solves_run_off_loop_and_are_bounded():
+    executor = SolverExecutor(workers=1, kind="thread")
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick_task = asyncio.create_task(ticker())
+        jobs = [asyncio.create_task(executor.run(_busy, 0.1)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        depth = executor.stats()
+        results = await asyncio.gather(*jobs)
+        tick_task.cancel()
+        return ticks, depth, results
+
+    try:
+        ticks, depth, results = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert results == [0.1, 0.1, 0.1]
+    # Event loop не блокировался, пока шли расчёты
+    assert ticks >= 10
+    assert depth["running"] == 1 and depth["queued"] == 2
+    stats = executor.stats()
+    assert stats["completed"] == 3 and stats["queued"] == 0 and stats["max_queued"] == 2
+
+
+def test_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        SolverExecutor(kind="gpu")
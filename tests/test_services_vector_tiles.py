@@ -0,0 +1,72 @@
+import asyncio
+
+from app.services import vector_tiles
+from app.services.vector_tiles import FloorFeatures, TileStore, render_tile, tile_bounds
+from app.utils.mvt import point_geometry, polygon_geometry, zigzag
+
+
+def test_tile_grid_is_centered_on_building_origin():
+    assert tile_bounds(0, 0, 0, root_size=100) == (-50, -50, 50, 50)
+    # y растёт вниз: тайл (1, 0, 0) — северо-западная четверть
+    assert tile_bounds(1, 0, 0, root_size=100) == (-50, 0, 0, 50)
+
+
+def test_mvt_geometry_commands():
+    assert zigzag(0) == 0 and zigzag(-1) == 1 and zigzag(1) == 2
+    assert point_geometry([(25, 17)]) == [9, 50, 34]
+    # Кольцо против часовой стрелки разворачивается; замыкающая команда ClosePath
+    ccw = polygon_geometry([(0, 0), (0, 10), (10, 10), (10, 0)][::-1])
+    assert ccw[:4] == [9, 20, 0, 26] and ccw[-1] == 15
+    assert polygon_geometry([(0, 0), (5, 5), (10, 10)]) == []
+
+
+def test_render_tile_clips_to_view(monkeypatch):
+    monkeypatch.setattr(vector_tiles.settings, "MAP_TILE_ROOT_SIZE_M", 100.0)
+    features = FloorFeatures(
+        polygons=[(1, [(-40.0, -40.0), (40.0, -40.0), (40.0, 40.0), (-40.0, 40.0)])],
+        access_points=[(7, 10.0, 10.0, {"bssid": "aa:bb:cc:dd:ee:ff", "accuracy": 2.5})],
+        pois=[(3, -30.0, -30.0, {"type": "lift", "name": None})],
+    )
+    whole = render_tile(features, 0, 0, 0)
+    assert b"floor" in whole and b"access_points" in whole and b"pois" in whole
+    north_east = render_tile(features, 1, 1, 0)
+    assert b"access_points" in north_east and b"pois" not in north_east
+    assert render_tile(FloorFeatures([], [], []), 3, 1, 1) == b""
+
+
+def test_tile_store_writes_atomically_and_prunes(tmp_path):
+    store = TileStore(str(tmp_path))
+    old = store.path(1, 4, 2, 0, 0, 0)
+    new = store.path(1, 5, 2, 0, 0, 0)
+    store.write(old, b"old")
+    store.write(new, b"new")
+    store.prune(1, keep_version=5)
+    assert store.read(old) is None and store.read(new) == b"new"
+
+
+def test_get_tile_writes_only_non_empty_tiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_tiles.settings, "MAP_TILE_ROOT_SIZE_M", 100.0)
+    monkeypatch.setattr(vector_tiles, "tile_store", TileStore(str(tmp_path)))
+    floors = {2: FloorFeatures([], [(7, 10.0, 10.0, {"bssid": "aa:bb:cc:dd:ee:ff"})], [])}
+
+    async def fake_load(db, building_id, floor):
+        if floor == 5:
+            raise ConnectionError("db down")
+        return floors.get(floor, FloorFeatures([], [], []))
+
+    monkeypatch.setattr(vector_tiles, "load_floor_features", fake_load)
+
+    async def scenario():
+        # Этажа нет — None, пустой тайл — b"", на диск ни то ни другое не пишется
+        assert await vector_tiles.get_tile(None, 1, 1, 9, 0, 0, 0) is None
+        assert await vector_tiles.get_tile(None, 1, 1, 2, 3, 0, 7) == b""
+        assert await vector_tiles.get_tile(None, 1, 1, 2, 1, 1, 0)
+        try:
+            await vector_tiles.get_tile(None, 1, 1, 5, 0, 0, 0)
+        except ConnectionError:
+            pass
+
+    asyncio.run(scenario())
+    written = [p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*.mvt")]
+    assert written == ["1/1/2/1/1/0.mvt"]
+    assert (1, 1, 5) not in vector_tiles._feature_locks
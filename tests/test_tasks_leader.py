@@ -0,0 +1,85 @@
+import asyncio
+
+from app.tasks.leader import LeaderElection
+
+
+class _FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.alive = True
+
+    async def execution_options(self, **options):
+        return self
+
+    async def execute(self, stmt):
+        if not self.alive:
+            raise ConnectionError("connection lost")
+        sql = str(stmt)
+        server = self.server
+
+        class _Result:
+            def scalar(self):
+                if "pg_try_advisory_lock" in sql:
+                    if server.holder is None:
+                        server.holder = conn
+                    return server.holder is conn
+                return True
+        conn = self
+        return _Result()
+
+    async def close(self):
+        # Соединение возвращается в пул: ROLLBACK не снимает сессионные advisory lock
+        self.alive = False
+
+    async def invalidate(self):
+        # Соединение закрыто мимо пула: Postgres завершает сессию и снимает блокировку
+        self.alive = False
+        if self.server.holder is self:
+            self.server.holder = None
+
+
+class _FakeEngine:
+    def __init__(self):
+        self.holder = None
+
+    async def connect(self):
+        return _FakeConnection(self)
+
+
+def test_single_leader_and_takeover():
+    engine = _FakeEngine()
+    changes = []
+    first = LeaderElection(lock_key=1, engine=engine, on_change=lambda value: changes.append(("first", value)))
+    second = LeaderElection(lock_key=1, engine=engine, on_change=lambda value: changes.append(("second", value)))
+
+    async def scenario():
+        assert await first.try_acquire()
+        assert not await second.try_acquire()
+        assert first.is_leader and not second.is_leader
+        # Лидер умер: соединение оборвалось, блокировка снята сервером
+        first._conn.alive = False
+        engine.holder = None
+        assert not await first.try_acquire()
+        assert await second.try_acquire()
+        assert second.is_leader and not first.is_leader
+        await second.stop()
+        assert not second.is_leader and engine.holder is None
+
+    asyncio.run(scenario())
+    assert changes == [("first", True), ("first", False), ("second", True), ("second", False)]
+
+
+def test_lock_released_when_leader_check_fails():
+    engine = _FakeEngine()
+    first = LeaderElection(lock_key=1, engine=engine)
+    second = LeaderElection(lock_key=1, engine=engine)
+
+    async def scenario():
+        assert await first.try_acquire()
+        # Проверка лидерства упала, но сессия на сервере жива и держит блокировку
+        first._conn.alive = False
+        assert not await first.try_acquire()
+        assert engine.holder is None
+        assert await second.try_acquire()
+
+    asyncio.run(scenario())
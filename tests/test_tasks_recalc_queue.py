@@ -0,0 +1,82 @@
+import asyncio
+import importlib
+
+from app.tasks.recalc_queue import RecalcQueue
+
+# app.tasks реэкспортирует экземпляр recalc_queue, поэтому модуль берём явно
+rq_module = importlib.import_module("app.tasks.recalc_queue")
+
+
+class _DummySession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+
+def test_repeated_hits_coalesce_into_one_solve(monkeypatch):
+    solved = []
+
+    async def fake_recalculate(bssid, db):
+        solved.append(bssid)
+
+    monkeypatch.setattr(rq_module, "recalculate_access_point_coords", fake_recalculate)
+    monkeypatch.setattr(rq_module, "AsyncSessionLocal", _DummySession)
+
+    async def scenario():
+        queue = RecalcQueue(workers=2, coalesce_seconds=0.05)
+        futures = {}
+        for _ in range(5):
+            futures.update(queue.mark_dirty(["AA:BB:CC:DD:EE:01", "AA:BB:CC:DD:EE:02"]))
+        assert await queue.wait_for(futures, timeout=2.0)
+        stats = queue.stats()
+        await queue.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert sorted(solved) == ["AA:BB:CC:DD:EE:01", "AA:BB:CC:DD:EE:02"]
+    assert stats["coalesced"] == 8
+    assert stats["dirty"] == 0
+
+
+def test_urgent_mark_skips_coalesce_window(monkeypatch):
+    async def fake_recalculate(bssid, db):
+        pass
+
+    monkeypatch.setattr(rq_module, "recalculate_access_point_coords", fake_recalculate)
+    monkeypatch.setattr(rq_module, "AsyncSessionLocal", _DummySession)
+
+    async def scenario():
+        queue = RecalcQueue(workers=1, coalesce_seconds=60.0)
+        futures = queue.mark_dirty(["AA:BB:CC:DD:EE:03"], urgent=True)
+        done = await queue.wait_for(futures, timeout=1.0)
+        await queue.stop()
+        return done
+
+    assert asyncio.run(scenario())
+
+
+def test_dropped_aps_are_not_reported_as_recalculated(monkeypatch):
+    async def fake_recalculate(bssid, db):
+        pass
+
+    monkeypatch.setattr(rq_module, "recalculate_access_point_coords", fake_recalculate)
+    monkeypatch.setattr(rq_module, "AsyncSessionLocal", _DummySession)
+
+    async def scenario():
+        queue = RecalcQueue(workers=1, coalesce_seconds=60.0, max_pending=1)
+        futures = queue.mark_dirty(["AA:BB:CC:DD:EE:04"])
+        futures.update(queue.mark_dirty(["AA:BB:CC:DD:EE:05"], urgent=True))
+        dropped = futures["AA:BB:CC:DD:EE:05"]
+        done = await queue.wait_for({"AA:BB:CC:DD:EE:05": dropped}, timeout=1.0)
+        stats = queue.stats()
+        await queue.stop()
+        return done, stats
+
+    done, stats = asyncio.run(scenario())
+    assert not done
+    assert stats["dropped"] == 1
@@ -0,0 +1,33 @@
+import numpy as np
+
+from app.tasks.recompute import _solve_chunk
+
+
+def _observations(ap, count, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = np.column_stack([rng.uniform(0, 20, count), rng.uniform(0, 20, count), rng.uniform(0, 4, count)])
+    distances = np.linalg.norm(positions - ap, axis=1)
+    # Обратное преобразование rssi_to_distance при tx_power=-50, n=2
+    rssi = -50 - 20 * np.log10(distances)
+    return np.column_stack([positions, rssi, np.full(count, np.nan)])
+
+
+def test_solve_chunk_solves_and_skips():
+    ap = np.array([8.0, 6.0, 2.0])
+    observations = {1: _observations(ap, 10), 2: _observations(ap, 2)}
+    ap_ids = np.array([1, 2, 3])
+    old_coords = np.full((3, 3), np.nan)
+    ids, coords, accuracy, ok, skipped = _solve_chunk(ap_ids, np.array([1, 1, 1]), old_coords, observations)
+    assert ids.tolist() == [1]
+    assert skipped == 2
+    assert ok.all()
+    np.testing.assert_allclose(coords[0, :2], ap[:2], atol=0.5)
+    assert accuracy[0] < 0.5
+
+
+def test_solve_chunk_accepts_ap_without_building():
+    ap = np.array([8.0, 6.0, 2.0])
+    ids, coords, _, ok, skipped = _solve_chunk(
+        np.array([5]), np.array([None], dtype=object), np.full((1, 3), np.nan), {5: _observations(ap, 10)}
+    )
+    assert ids.tolist() == [5] and ok.all() and skipped == 0
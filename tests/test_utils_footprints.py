@@ -0,0 +1,68 @@
+import json
+import random
+
+from app.utils.footprints import load_footprint_index, load_geojson
+
+
+def _square(lon, lat, size=0.0002):
+    return [[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]
+
+
+def _write_grid(tmp_path, n=30):
+    features = []
+    for i in range(n):
+        for j in range(n):
+            lon, lat = 37.60 + i * 0.0005, 55.75 + j * 0.0005
+            features.append({
+                "type": "Feature",
+                "id": f"way/{i * n + j + 1}",
+                "properties": {"name": f"Корпус {i}-{j}", "addr:street": "Тестовая", "addr:housenumber": str(j)},
+                "geometry": {"type": "Polygon", "coordinates": [_square(lon, lat)]},
+            })
+    path = tmp_path / "buildings.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}), encoding="utf-8")
+    return str(path)
+
+
+def test_point_inside_footprint_returns_building(tmp_path):
+    index = load_footprint_index(_write_grid(tmp_path))
+    result = index.lookup(55.75 + 3 * 0.0005 + 0.0001, 37.60 + 2 * 0.0005 + 0.0001)
+    assert result["osm_id"] == 2 * 30 + 3 + 1
+    assert result["name"] == "Корпус 2-3"
+    assert result["display_name"] == "Корпус 2-3, Тестовая 3"
+    assert result["distance_m"] == 0.0
+
+
+def test_nearest_matches_brute_force(tmp_path):
+    path = _write_grid(tmp_path)
+    index = load_footprint_index(path)
+    footprints = load_geojson(path)
+    rng = random.Random(1)
+    for _ in range(200):
+        lat = 55.75 + rng.uniform(-0.001, 0.016)
+        lon = 37.60 + rng.uniform(-0.001, 0.016)
+        expected = min(fp.distance_m(lon, lat) for fp in footprints)
+        result = index.lookup(lat, lon, max_distance_m=1000.0)
+        assert abs(result["distance_m"] - expected) < 1e-6
+
+
+def test_far_point_has_no_match(tmp_path):
+    index = load_footprint_index(_write_grid(tmp_path, n=3))
+    assert index.lookup(56.0, 38.0, max_distance_m=30.0) is None
+
+
+def test_osm_xml_building_ways(tmp_path):
+    path = tmp_path / "extract.osm"
+    path.write_text(
+        '<osm>'
+        '<node id="1" lat="55.0" lon="37.0"/><node id="2" lat="55.0" lon="37.001"/>'
+        '<node id="3" lat="55.001" lon="37.001"/><node id="4" lat="55.001" lon="37.0"/>'
+        '<way id="77"><nd ref="1"/><nd ref="2"/><nd ref="3"/><nd ref="4"/><nd ref="1"/>'
+        '<tag k="building" v="yes"/><tag k="name" v="Главный корпус"/></way>'
+        '<way id="78"><nd ref="1"/><nd ref="2"/><nd ref="3"/><tag k="highway" v="service"/></way>'
+        '</osm>',
+        encoding="utf-8",
+    )
+    index = load_footprint_index(str(path))
+    assert len(index) == 1
+    assert index.lookup(55.0005, 37.0005)["osm_id"] == 77
@@ -0,0 +1,68 @@
+import numpy as np
+
+from app.db.models.floor_polygon import FloorPolygon
+from app.utils.geometry import (
+    build_polygon_lods,
+    douglas_peucker_mask,
+    pack_points,
+    polygon_for_lod,
+    simplify_ring,
+    unpack_points,
+)
+
+
+def _noisy_square(n_per_side=50, noise=0.02, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 10, n_per_side, endpoint=False)
+    sides = [
+        np.column_stack([t, np.zeros_like(t)]),
+        np.column_stack([np.full_like(t, 10), t]),
+        np.column_stack([10 - t, np.full_like(t, 10)]),
+        np.column_stack([np.zeros_like(t), 10 - t]),
+    ]
+    xy = np.vstack(sides) + rng.normal(0, noise, (4 * n_per_side, 2))
+    ring = np.column_stack([xy, np.full(len(xy), 3.0)]).tolist()
+    return ring + [ring[0]]
+
+
+def test_douglas_peucker_keeps_corners():
+    xy = np.array([[0, 0], [1, 0.01], [2, 0], [2, 1], [2, 2]], dtype=float)
+    assert douglas_peucker_mask(xy, 0.1).tolist() == [True, False, True, False, True]
+
+
+def test_simplify_ring_stays_closed_and_keeps_z():
+    ring = _noisy_square()
+    simplified = simplify_ring(ring, 0.5)
+    assert 4 <= len(simplified) - 1 <= 8
+    assert simplified[0] == simplified[-1]
+    assert all(p[2] == 3.0 for p in simplified)
+    assert simplify_ring([[0, 0, 0], [5, 0, 0], [10, 0.01, 0], [5, 0.02, 0]], 1.0) is None
+
+
+def test_lods_coarsen_and_select():
+    ring = _noisy_square()
+    lods = build_polygon_lods(ring, [2.0, 0.01, 0.5])
+    sizes = [len(level["polygon"]) for level in lods]
+    assert [level["tolerance"] for level in lods] == [0.01, 0.5, 2.0]
+    assert sizes == sorted(sizes, reverse=True) and sizes[-1] < len(ring)
+    assert polygon_for_lod(ring, lods, 0) is ring
+    assert polygon_for_lod(ring, lods, 99) == lods[-1]["polygon"]
+    assert polygon_for_lod(ring, None, 2) is ring
+
+
+def test_packed_points_roundtrip_without_copy():
+    data = pack_points([[1.5, -2.0, 3.0], [4.0, 5.0, 6.0]])
+    assert len(data) == 2 * 3 * 8
+    points = unpack_points(data)
+    assert points.base is not None and not points.flags.writeable
+    assert points.tolist() == [[1.5, -2.0, 3.0], [4.0, 5.0, 6.0]]
+    # Плоские точки [x, y] получают z = 0
+    assert unpack_points(pack_points([[4.0, 5.0]])).tolist() == [[4.0, 5.0, 0.0]]
+
+
+def test_floor_polygon_keeps_json_shape_with_packed_storage():
+    polygon = FloorPolygon(building_id=1, floor=2, polygon=[[0, 0, 1], [4, 0, 1], [4, 3, 1]])
+    assert polygon.polygon_json is None and len(polygon.polygon_packed) == 72
+    assert polygon.polygon == [[0.0, 0.0, 1.0], [4.0, 0.0, 1.0], [4.0, 3.0, 1.0]]
+    legacy = FloorPolygon(building_id=1, floor=2, polygon_json=[[0, 0, 0], [1, 0, 0], [1, 1, 0]])
+    assert legacy.polygon == [[0, 0, 0], [1, 0, 0], [1, 1, 0]] and legacy.points.shape == (3, 3)
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import pytest
+
+from app.utils.json_stream import iter_json_items, JSONStreamError
+
+
+async def _stream(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _collect(data: bytes, size: int, ndjson: bool):
+    async def run():
+        return [item async for item in iter_json_items(_stream(data, size), ndjson=ndjson)]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1024])
+def test_json_array_parsed_across_chunk_boundaries(size):
+    items = [{"building_id": i, "name": "Корпус №" + str(i), "rssi": -40 - i} for i in range(5)]
+    data = json.dumps(items).encode("utf-8")
+    assert _collect(data, size, ndjson=False) == [(item, None) for item in items]
+
+
+@pytest.mark.parametrize("size", [1, 5, 1024])
+def test_ndjson_reports_bad_line_and_continues(size):
+    data = b'{"a": 1}\n{broken\n\n{"a": 2}'
+    result = _collect(data, size, ndjson=True)
+    assert result[0] == ({"a": 1}, None)
+    assert result[1][0] is None and result[1][1]
+    assert result[2] == ({"a": 2}, None)
+
+
+def test_unclosed_json_array_raises():
+    with pytest.raises(JSONStreamError):
+        _collect(b'[{"a": 1}, {"a": 2}', 4, ndjson=False)
+
+
+def test_malformed_array_element_fails_before_end_of_body():
+    consumed = []
+
+    async def stream():
+        yield b'[{"a": 1}, {"a": ]x, '
+        for i in range(1000):
+            consumed.append(i)
+            yield b'{"a": 2}, ' * 100
+
+    async def run():
+        return [item async for item in iter_json_items(stream(), ndjson=False)]
+
+    with pytest.raises(JSONStreamError, match="Некорректный JSON"):
+        asyncio.run(run())
+    assert len(consumed) <= 1
+
+
+@pytest.mark.parametrize("data", [b'[{"a": 1}{"a": 2}]', b'[,,{"a": 1}]', b'[{"a": 1},,{"a": 2}]', b'[{"a": 1},]'])
+def test_array_requires_single_comma_between_elements(data):
+    with pytest.raises(JSONStreamError):
+        _collect(data, 3, ndjson=False)